@@ -1,14 +1,17 @@
 """Run synthetic experiments comparing MIC-like score and R² across relationship types and noise levels.
 
-Outputs saved to `../outputs/` as PNGs and a CSV summary.
+Outputs saved to `../outputs/` as PNGs and a CSV summary. `run_sweep` runs larger, repeated sweeps on a
+process pool with an append-only results store, and `plot_sweep` draws them in a separate pass.
 """
+import csv
 import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 
-from mic_utils import compute_mic
+from mic_utils import _resolve_n_jobs, compute_mic, compute_pairwise_mic
 from sklearn.metrics import r2_score
 
 
@@ -38,6 +41,15 @@ def make_relationship(kind, x, noise_scale=0.0, rng=None):
     return y
 
 
+def linear_r2(x, y):
+    # R² from linear fit (as in paper comparison) - compute best-fit regression R²
+    try:
+        return r2_score(y, np.poly1d(np.polyfit(x, y, deg=1))(x))
+    except Exception:
+        r = np.corrcoef(x, y)[0, 1]
+        return float(np.nan_to_num(r) ** 2)
+
+
 def run_experiment(output_dir: str = "../outputs", n=500, noise_levels=None, kinds=None, seed=0):
     out = Path(output_dir)
     out.mkdir(parents=True, exist_ok=True)
@@ -60,12 +72,7 @@ def run_experiment(output_dir: str = "../outputs", n=500, noise_levels=None, kin
                 mic = compute_mic(x, y)
             except Exception as e:
                 mic = float('nan')
-            # R² from linear fit (as in paper comparison) - compute best-fit regression R²
-            try:
-                r2 = r2_score(y, np.poly1d(np.polyfit(x, y, deg=1))(x))
-            except Exception:
-                r = np.corrcoef(x, y)[0, 1]
-                r2 = float(np.nan_to_num(r) ** 2)
+            r2 = linear_r2(x, y)
 
             mic_vals.append(mic)
             r2_vals.append(max(0.0, min(1.0, float(np.nan_to_num(r2)))))
@@ -110,5 +117,147 @@ def run_experiment(output_dir: str = "../outputs", n=500, noise_levels=None, kin
     print(f"Saved figures to {out.resolve()} and CSV to {csv_path.resolve()}")
 
 
+def screening_recall(n=300, kinds=None, noise_levels=(0.0, 0.5, 1.0), n_random=20, screen="mi",
+                     top_k=None, mic_cutoff=0.3, seed=0):
+    """Recall of `compute_pairwise_mic(screen=...)` against the exhaustive MIC matrix.
+
+    Builds one (x, y) column pair per relationship kind and noise level, each with its own x, plus
+    `n_random` unrelated uniform columns. A pair is relevant when its exhaustive MIC is at least
+    `mic_cutoff`; recall is the share of relevant pairs that survive the prefilter. `top_k`
+    defaults to twice the number of planted pairs.
+    """
+    if kinds is None:
+        kinds = ["linear", "quadratic", "sin", "exponential", "cubic", "step", "circular"]
+    rng = np.random.RandomState(seed)
+    cols = {}
+    for kind in kinds:
+        for noise in noise_levels:
+            x = rng.rand(n)
+            cols[f"{kind}@{noise:g}:x"] = x
+            cols[f"{kind}@{noise:g}:y"] = make_relationship(kind, x, noise_scale=noise, rng=rng)
+    for i in range(n_random):
+        cols[f"random{i}"] = rng.rand(n)
+    df = pd.DataFrame(cols)
+    if top_k is None:
+        top_k = 2 * len(kinds) * len(noise_levels)
+
+    full = compute_pairwise_mic(df).to_numpy()
+    iu, ju = np.triu_indices(len(df.columns), 1)
+    relevant = {(df.columns[i], df.columns[j]) for i, j in zip(iu, ju) if full[i, j] >= mic_cutoff}
+    screened = compute_pairwise_mic(df, screen=screen, top_k=top_k)
+    kept = set(zip(screened["var1"], screened["var2"]))
+    recall = len(relevant & kept) / len(relevant) if relevant else 1.0
+    return {"screen": screen, "pairs": len(iu), "scored": len(kept), "relevant": len(relevant),
+            "recall": recall}
+
+
+SWEEP_FIELDS = ["kind", "noise", "n", "rep", "mic", "r2"]
+DEFAULT_KINDS = ["linear", "quadratic", "sin", "exponential", "cubic", "step", "circular", "random"]
+
+
+def _sweep_task(task):
+    """Score one (kind, noise, n, rep) cell with its own RandomState, independent of scheduling order."""
+    kind, noise, n, rep, seed = task
+    rng = np.random.RandomState(seed)
+    x = np.linspace(0, 1, n)
+    y = make_relationship(kind, x, noise_scale=noise, rng=rng)
+    try:
+        mic = compute_mic(x, y)
+    except Exception:
+        mic = float('nan')
+    return {"kind": kind, "noise": float(noise), "n": int(n), "rep": int(rep), "mic": float(mic),
+            "r2": max(0.0, min(1.0, float(np.nan_to_num(linear_r2(x, y)))))}
+
+
+def _task_seed(seed, kind_idx, noise_idx, n, rep):
+    return int(np.random.SeedSequence([seed, kind_idx, noise_idx, n, rep]).generate_state(1)[0])
+
+
+def run_sweep(output_dir: str = "../outputs/sweep", ns=(500,), noise_levels=None, kinds=None, reps=1,
+              n_jobs=None, seed=0):
+    """Run kinds x noise levels x n x repetitions as independent, seeded tasks on a process pool.
+
+    Every finished task is appended to `sweep_results.csv`, so an interrupted sweep picks up where it
+    stopped: cells already in the store are skipped. Each task's seed is derived from (seed, kind,
+    noise level, n, rep), so results do not depend on task order or worker count. `n_jobs` workers
+    (None or -1 for all cores, negative counts back from them); 1 runs the tasks inline. When all tasks
+    are done, `sweep_summary.csv` holds the mean and standard deviation over repetitions of every
+    requested (kind, noise, n) cell, leaving out rows of other grids kept in the same store.
+    Plotting is a separate pass, see `plot_sweep`.
+    """
+    out = Path(output_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    if noise_levels is None:
+        noise_levels = np.linspace(0.0, 1.0, 11)
+    if kinds is None:
+        kinds = DEFAULT_KINDS
+
+    store = out / "sweep_results.csv"
+    done = set()
+    if store.exists() and store.stat().st_size > 0:
+        # drop a row half-written by an interrupted run before appending to the store again
+        prev = pd.read_csv(store, on_bad_lines="skip").dropna(subset=["kind", "noise", "n", "rep", "r2"])
+        prev = prev.astype({"n": int, "rep": int})
+        prev.to_csv(store, index=False)
+        done = {(k, round(float(z), 12), int(m), int(r)) for k, z, m, r in
+                zip(prev["kind"], prev["noise"], prev["n"], prev["rep"])}
+    else:
+        with open(store, "w", newline="") as fh:
+            csv.DictWriter(fh, fieldnames=SWEEP_FIELDS).writeheader()
+
+    tasks = [(kind, float(noise), int(n), rep, _task_seed(seed, ki, zi, int(n), rep))
+             for ki, kind in enumerate(kinds)
+             for zi, noise in enumerate(noise_levels)
+             for n in ns
+             for rep in range(reps)
+             if (kind, round(float(noise), 12), int(n), rep) not in done]
+    print(f"{len(tasks)} sweep tasks to run ({len(done)} already in {store})")
+
+    n_jobs = _resolve_n_jobs(-1 if n_jobs is None else n_jobs)
+    with open(store, "a", newline="") as fh:
+        writer = csv.DictWriter(fh, fieldnames=SWEEP_FIELDS)
+        if n_jobs == 1:
+            for task in tasks:
+                writer.writerow(_sweep_task(task))
+                fh.flush()
+        else:
+            with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+                for fut in as_completed([pool.submit(_sweep_task, task) for task in tasks]):
+                    writer.writerow(fut.result())
+                    fh.flush()
+
+    df = pd.read_csv(store)
+    cells = {(kind, round(float(noise), 12), int(n)) for kind in kinds for noise in noise_levels for n in ns}
+    requested = [(k, round(float(z), 12), int(m)) in cells and r < reps
+                 for k, z, m, r in zip(df["kind"], df["noise"], df["n"], df["rep"])]
+    summary = df[requested].groupby(["kind", "noise", "n"]).agg(
+        mic_mean=("mic", "mean"), mic_std=("mic", "std"), r2_mean=("r2", "mean"), r2_std=("r2", "std"),
+        reps=("rep", "count")).reset_index()
+    summary.to_csv(out / "sweep_summary.csv", index=False)
+    print(f"Saved sweep results to {store.resolve()}")
+    return summary
+
+
+def plot_sweep(output_dir: str = "../outputs/sweep"):
+    """Draw MIC and R² vs noise (mean ± std over repetitions) per kind and n from `sweep_summary.csv`."""
+    out = Path(output_dir)
+    summary = pd.read_csv(out / "sweep_summary.csv")
+    for (kind, n), sub in summary.groupby(["kind", "n"]):
+        sub = sub.sort_values("noise")
+        fig, ax = plt.subplots(figsize=(6, 4))
+        ax.errorbar(sub["noise"], sub["mic_mean"], yerr=sub["mic_std"].fillna(0), marker='o', label='MIC-like')
+        ax.errorbar(sub["noise"], sub["r2_mean"], yerr=sub["r2_std"].fillna(0), marker='s', label='R² (linear)')
+        ax.set_xlabel('Noise scale (rel)')
+        ax.set_ylabel('Score')
+        ax.set_title(f"Scores vs noise — {kind} (n={n})")
+        ax.set_ylim(-0.05, 1.05)
+        ax.grid(True)
+        ax.legend()
+        fig.tight_layout()
+        fig.savefig(out / f"sweep_{kind}_n{n}.png")
+        plt.close(fig)
+    print(f"Saved sweep figures to {out.resolve()}")
+
+
 if __name__ == '__main__':
     run_experiment()
@@ -6,7 +6,7 @@ Run with:
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
-from mic_utils import compute_mic, compute_pairwise_mic
+from mic_utils import compute_mic_against, compute_pairwise_mic
 
 
 def make_toy_data(n=300, noise=0.05, seed=0):
@@ -26,13 +26,9 @@ def main():
     mic_df = compute_pairwise_mic(df)
     print(mic_df.round(3))
 
-    # Print MIC between x and each target column
-    print("\nMIC-like between 'x' and each variable:")
-    for c in df.columns:
-        if c == "x":
-            continue
-        s = compute_mic(df["x"].values, df[c].values)
-        print(f"x vs {c}: {s:.3f}")
+    # Rank every other column by its association with x
+    print("\nMINE statistics between 'x' and each variable:")
+    print(compute_mic_against("x", df).round(3))
 
     # Quick scatter plot for visual check
     pairs = [("x", "linear"), ("x", "sin"), ("x", "rnd")]
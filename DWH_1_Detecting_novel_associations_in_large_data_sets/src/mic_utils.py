@@ -1,14 +1,23 @@
 """
-Utility functions to compute an MIC-like score between two 1D arrays.
+Utility functions to compute the Maximal Information Coefficient (MIC) between two 1D arrays.
 
 Behavior:
 - If `minepy.MINE` is importable, use it to compute MIC.
-- Otherwise, fall back to a fast R²-based approximation using scikit-learn's r2_score.
+- Otherwise, use the built-in NumPy port of the ApproxMaxMI grid search from Reshef et al. (2011),
+  which follows minepy's `mic_approx` estimator step by step (equipartition of one axis, clumps and
+  superclumps on the other, dynamic-programming optimal partition) and accepts the same
+  `alpha` / `c` parameters.
 
-The fallback is intentionally simple and deterministic; it ensures the demo and tests run
-without needing to compile C extensions.
+Only the ranks of the inputs (and their ties) matter to the grid search, so every column is first
+reduced to a `_PreparedColumn` (sort order, ranks, runs of tied values, equipartitions). The pairwise
+engine prepares each column once and spreads blocks of column pairs over a process pool; the
+streaming variant does the same one block of columns at a time for tables that do not fit in memory.
 """
-from typing import Sequence
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from typing import List, NamedTuple, Sequence
 import numpy as np
 
 try:
@@ -16,56 +25,529 @@ try:
 except Exception:
     MINE = None
 
-try:
-    from sklearn.metrics import r2_score
-except Exception:
-    r2_score = None
 
+def _equipartition(run_sizes: np.ndarray, bins: int):
+    """Greedy equipartition of sorted data into at most `bins` rows (minepy's EquipartitionYAxis).
+
+    Runs of tied values are never split. A run is added to the current row while its midpoint lies
+    before the target row size; the target is recomputed from the remaining points every time a row
+    is closed. Returns the row label of every run and the number of rows actually produced.
+    """
+    n = int(run_sizes.sum())
+    ends = np.cumsum(run_sizes)
+    mids2 = 2 * ends - run_sizes  # twice the midpoint of each run
+    n_runs = run_sizes.shape[0]
+
+    labels = np.empty(n_runs, dtype=np.int64)
+    start_run, start, curr = 0, 0, 0
+    rowsize = n / bins
+    while start_run < n_runs:
+        stop_run = int(np.searchsorted(mids2, 2 * start + 2 * rowsize, side="left"))
+        stop_run = max(stop_run, start_run + 1)
+        labels[start_run:stop_run] = curr
+        if stop_run >= n_runs:
+            break
+        start_run, start = stop_run, int(ends[stop_run - 1])
+        curr += 1
+        rowsize = (n - start) / (bins - curr) if bins > curr else np.inf
+    return labels, curr + 1
+
+
+def _clumps(x_run_sizes: np.ndarray, q_sorted: np.ndarray):
+    """Clumps partition of the x-sorted points (minepy's GetClumpsPartition).
+
+    Consecutive points sharing a row label stay in one clump; a run of tied x values that spans
+    several rows becomes a clump of its own. Returns the clump label of every x-sorted point.
+    """
+    run_id = np.repeat(np.arange(x_run_sizes.shape[0]), x_run_sizes)
+    starts = np.r_[0, np.cumsum(x_run_sizes)[:-1]]
+    mixed = np.maximum.reduceat(q_sorted, starts) != np.minimum.reduceat(q_sorted, starts)
+    q_tilde = q_sorted.copy()
+    in_mixed = mixed[run_id]
+    q_tilde[in_mixed] = -1 - run_id[in_mixed]
+    return np.r_[0, np.cumsum(q_tilde[1:] != q_tilde[:-1])]
+
+
+def _xlogx_table(n: int) -> np.ndarray:
+    """Lookup table of v * log(v) for the integer counts 0..n."""
+    v = np.arange(n + 1, dtype=np.float64)
+    v[0] = 1.0
+    return v * np.log(v)
+
+
+def _optimize_axis(q_sorted: np.ndarray, q: int, p_map: np.ndarray, p: int, x: int, xlogx: np.ndarray):
+    """Best mutual information using 2..x columns over the p (super)clumps (minepy's OptimizeXAxis).
+
+    The dynamic program is written in terms of J_l[t] = -H(Q | P_l) on the first t clumps, which
+    avoids the per-cell logarithms of the reference implementation:
+
+        J_l[t] = max_{l-1 <= s <= t} (c_s * J_{l-1}[s] + G[s, t] - f(c_t - c_s)) / c_t
+
+    with f(v) = v log v, c the cumulative clump sizes and G[s, t] the summed f of the row counts
+    that fall in clumps s+1..t. Each level is one broadcast add and one column-wise max over the
+    precomputed G - f table. Returns the normalized scores for 2..x columns.
+    """
+    if p == 1:
+        return np.zeros(x - 1)
+
+    counts = np.zeros((q, p), dtype=np.int64)
+    np.add.at(counts, (q_sorted, p_map), 1)
+    cumhist = np.zeros((q, p + 1), dtype=np.int64)
+    np.cumsum(counts, axis=1, out=cumhist[:, 1:])
+    c = cumhist.sum(axis=0)
+    n = int(c[-1])
+    f_c = xlogx[c]
+
+    totals = cumhist[:, -1]
+    hq = np.log(n) - xlogx[totals].sum() / n
+
+    # J_1[t] from G[0, t], the prefix entropies
+    j_prev = np.full(p + 1, -np.inf)
+    j_prev[1:] = (xlogx[cumhist[:, 1:]].sum(axis=0) - f_c[1:]) / c[1:]
+
+    last = min(x, p)
+    if last > 2:
+        # base[s, t] = G[s, t] - f(c_t - c_s) for s <= t, filled one clump boundary s at a time
+        base = np.full((p + 1, p + 1), -np.inf)
+        for s in range(1, p + 1):
+            gap = cumhist[:, s:] - cumhist[:, s:s + 1]
+            base[s, s:] = xlogx[gap].sum(axis=0) - xlogx[c[s:] - c[s]]
+        buf = np.empty_like(base)
+
+    scores_i = np.empty(x - 1)
+    for level in range(2, last + 1):
+        if level < last:
+            block = buf[level - 1:, level:]
+            np.add(base[level - 1:, level:], (c[level - 1:] * j_prev[level - 1:])[:, None], out=block)
+            j_next = np.full(p + 1, -np.inf)
+            j_next[level:] = block.max(axis=0) / c[level:]
+            scores_i[level - 2] = hq + j_next[p]
+            j_prev = j_next
+        else:
+            # the last level only needs t = p
+            s = np.arange(level - 1, p + 1)
+            if last > 2:
+                base_col = base[s, p]
+            else:
+                base_col = xlogx[cumhist[:, p:p + 1] - cumhist[:, s]].sum(axis=0) - xlogx[c[p] - c[s]]
+            scores_i[level - 2] = hq + (c[s] * j_prev[s] + base_col).max() / c[p]
+    scores_i[last - 1:] = scores_i[last - 2]
 
-def compute_mic(x: Sequence[float], y: Sequence[float], **minepy_kwargs) -> float:
-    """Compute an MIC-like score between x and y.
+    cols = np.arange(2, x + 1)
+    return scores_i / np.minimum(np.log(cols), np.log(q))
+
+
+class _Grid(NamedTuple):
+    """Grid-search limits shared by every pair of columns of length n."""
+    n_rows: int           # row counts 2..n_rows+1 are tried
+    max_cols: List[int]   # most columns allowed with i+2 rows, i.e. floor(B / (i+2))
+    c: float
+    xlogx: np.ndarray
+
+
+def _make_grid(n: int, alpha: float = 0.6, c: float = 15) -> _Grid:
+    """Maximum grid size B = n**alpha and the column limit for each row count (minepy's rule)."""
+    if 0 < alpha <= 1:
+        B = max(n ** alpha, 4)
+    elif alpha >= 4:
+        B = min(alpha, n)
+    else:
+        raise ValueError("alpha must be in (0, 1] or >= 4")
+    n_rows = max(int(np.floor(B / 2.0)), 2) - 1
+    max_cols = [int(np.floor(B / (i + 2))) for i in range(n_rows)]
+    return _Grid(n_rows, max_cols, c, _xlogx_table(n))
+
+
+class _PreparedColumn(NamedTuple):
+    """Everything the grid search needs from one column, independent of its partner."""
+    order: np.ndarray               # stable argsort of the values
+    rank: np.ndarray                # position of each point in `order`
+    run_sizes: np.ndarray           # sizes of the runs of tied values, in sorted order
+    row_bounds: List[np.ndarray]    # equipartition row starts (sorted positions) for i+2 rows
+
+
+def _prepare_column(values: np.ndarray, grid: _Grid) -> _PreparedColumn:
+    """Rank a column and equipartition it into every row count the grid search will ask for."""
+    n = values.shape[0]
+    order = np.argsort(values, kind="mergesort")
+    rank = np.empty(n, dtype=np.int64)
+    rank[order] = np.arange(n)
+    sorted_vals = values[order]
+    starts = np.flatnonzero(np.r_[True, sorted_vals[1:] != sorted_vals[:-1]])
+    run_sizes = np.diff(np.r_[starts, n])
+    run_starts = np.r_[0, np.cumsum(run_sizes)]
+
+    row_bounds = []
+    for i in range(grid.n_rows):
+        run_labels, q = _equipartition(run_sizes, i + 2)
+        first_runs = np.r_[0, np.flatnonzero(np.diff(run_labels)) + 1]
+        row_bounds.append(np.r_[run_starts[first_runs], n])
+    return _PreparedColumn(order, rank, run_sizes, row_bounds)
+
+
+def _half_characteristic_matrix(x_prep: _PreparedColumn, y_prep: _PreparedColumn, grid: _Grid):
+    """Scores for grids whose rows equipartition y and whose columns are optimized on x."""
+    y_pos_of_x = y_prep.rank[x_prep.order]
+    half = []
+    for i in range(grid.n_rows):
+        bounds = y_prep.row_bounds[i]
+        q = bounds.shape[0] - 1
+        q_sorted = np.repeat(np.arange(q), np.diff(bounds))[y_pos_of_x]
+        p_map = _clumps(x_prep.run_sizes, q_sorted)
+        p = int(p_map[-1]) + 1
+        k = max(int(grid.c * grid.max_cols[i]), 1)
+        if p > k:
+            clump_sizes = np.bincount(p_map)
+            super_labels, p = _equipartition(clump_sizes, k)
+            p_map = super_labels[p_map]
+        half.append(_optimize_axis(q_sorted, q, p_map, p, grid.max_cols[i], grid.xlogx))
+    return half
+
+
+def _characteristic_matrix(x_prep: _PreparedColumn, y_prep: _PreparedColumn, grid: _Grid) -> np.ndarray:
+    """Characteristic matrix M of (x, y) as a square array, NaN outside the grid-size limit.
+
+    `M[i, j]` is the normalized maximal mutual information of grids with `i + 2` rows (y bins) and
+    `j + 2` columns (x bins), taking the better of equipartitioning y and optimizing x, or the reverse.
+    """
+    xy = _half_characteristic_matrix(x_prep, y_prep, grid)
+    yx = _half_characteristic_matrix(y_prep, x_prep, grid)
+    M = np.full((grid.n_rows, grid.n_rows), np.nan)
+    for i in range(grid.n_rows):
+        M[i, :xy[i].shape[0]] = xy[i]
+    for j in range(grid.n_rows):
+        M[:yx[j].shape[0], j] = np.maximum(M[:yx[j].shape[0], j], yx[j])
+    return M
+
+
+MINE_STATISTICS = ("mic", "mas", "mev", "mcn", "tic")
+
+
+def _mine_statistics(M: np.ndarray, stats=MINE_STATISTICS, mcn_eps: float = 0.0, tic_norm: bool = False) -> dict:
+    """Derive the requested MINE statistics from one characteristic matrix (minepy's definitions).
+
+    - mic: maximum of M.
+    - mas: maximum asymmetry |M[i, j] - M[j, i]|, large for non-monotonic relationships.
+    - mev: maximum over grids with two rows or two columns (closeness to a function), never above mic.
+    - mcn: log2 of the fewest cells of a grid reaching (1 - mcn_eps) * MIC.
+    - tic: total information coefficient, the sum of M (its mean with `tic_norm`).
+    """
+    mic = float(np.nanmax(M))
+    out = {}
+    for name in stats:
+        # MIC, MAS and MEV are all clipped to [0, 1]: rounding in M can push them just past 1
+        if name == "mic":
+            out[name] = max(0.0, min(1.0, mic))
+        elif name == "mas":
+            out[name] = max(0.0, min(1.0, float(np.nanmax(np.abs(M - M.T)))))
+        elif name == "mev":
+            out[name] = max(0.0, min(1.0, float(max(np.nanmax(M[0, :]), np.nanmax(M[:, 0])))))
+        elif name == "mcn":
+            cells = np.arange(2, M.shape[0] + 2)
+            log_xy = np.log2(np.outer(cells, cells).astype(np.float64))
+            out[name] = float(log_xy[M + 0.0001 >= (1.0 - mcn_eps) * mic].min())
+        elif name == "tic":
+            out[name] = float(np.nanmean(M) if tic_norm else np.nansum(M))
+        else:
+            raise ValueError(f"unknown MINE statistic {name!r}")
+    return out
+
+
+def _native_mic(x_prep: _PreparedColumn, y_prep: _PreparedColumn, grid: _Grid) -> float:
+    return _mine_statistics(_characteristic_matrix(x_prep, y_prep, grid), ("mic",))["mic"]
+
+
+def compute_mic(x: Sequence[float], y: Sequence[float], alpha: float = 0.6, c: float = 15,
+                **minepy_kwargs) -> float:
+    """Compute the MIC between x and y.
 
     Returns a float in [0, 1].
 
     - If `minepy` is available, returns the official MIC from MINE.
-    - Otherwise, returns max(0, min(1, R²)) as a fallback approximation.
+    - Otherwise, runs the built-in ApproxMaxMI grid search, which matches minepy's `mic_approx`.
 
     Args:
         x, y: 1-D numeric sequences of equal length.
+        alpha: exponent of the maximum grid size B = n**alpha (or B itself when alpha >= 4).
+        c: clumps factor; the x axis is coarsened to at most c times as many superclumps as columns.
         minepy_kwargs: forwarded to `MINE(**kwargs)` when using minepy.
     """
-    x_arr = np.asarray(x).ravel()
-    y_arr = np.asarray(y).ravel()
+    x_arr = np.asarray(x, dtype=np.float64).ravel()
+    y_arr = np.asarray(y, dtype=np.float64).ravel()
     if x_arr.shape[0] != y_arr.shape[0]:
         raise ValueError("x and y must have the same length")
 
     if MINE is not None:
-        mine = MINE(**minepy_kwargs)
+        mine = MINE(alpha=alpha, c=c, **minepy_kwargs)
         # minepy expects finite numeric arrays
         mine.compute_score(x_arr, y_arr)
         mic_val = float(mine.mic())
         # ensure numeric range
         return max(0.0, min(1.0, mic_val))
 
-    # Fallback: use R² if available
-    if r2_score is None:
-        raise RuntimeError("Neither minepy nor scikit-learn are available. Install scikit-learn or minepy.")
+    if not (np.isfinite(x_arr).all() and np.isfinite(y_arr).all()):
+        raise ValueError("x and y must be finite")
+    if x_arr.shape[0] < 2:
+        return 0.0
+
+    grid = _make_grid(x_arr.shape[0], alpha, c)
+    return _native_mic(_prepare_column(x_arr, grid), _prepare_column(y_arr, grid), grid)
+
+
+def compute_mine_stats(x: Sequence[float], y: Sequence[float], stats=MINE_STATISTICS, alpha: float = 0.6,
+                       c: float = 15, mcn_eps: float = 0.0, tic_norm: bool = False, return_matrix: bool = False):
+    """Compute MIC, MAS, MEV, MCN and TIC between x and y from one characteristic matrix.
+
+    The grid search runs once (always on the native engine); every statistic in `stats` is then read
+    off the same matrix, so asking for all five costs the same as asking for MIC alone.
+
+    Args:
+        x, y: 1-D numeric sequences of equal length.
+        stats: names of the statistics to return, any subset of `MINE_STATISTICS`.
+        alpha, c: grid-search parameters, as in `compute_mic`.
+        mcn_eps: MCN counts the cells of the smallest grid reaching (1 - mcn_eps) * MIC.
+        tic_norm: return the mean instead of the sum of the characteristic matrix as TIC.
+        return_matrix: also return the characteristic matrix; entry [i, j] belongs to the grid with
+            i + 2 rows (y bins) and j + 2 columns (x bins), and grids beyond the size limit are NaN.
+
+    Returns:
+        A dict of statistic name -> value, or `(stats_dict, matrix)` with `return_matrix`.
+    """
+    x_arr = np.asarray(x, dtype=np.float64).ravel()
+    y_arr = np.asarray(y, dtype=np.float64).ravel()
+    if x_arr.shape[0] != y_arr.shape[0]:
+        raise ValueError("x and y must have the same length")
+    if not (np.isfinite(x_arr).all() and np.isfinite(y_arr).all()):
+        raise ValueError("x and y must be finite")
+    if x_arr.shape[0] < 2:
+        raise ValueError("at least two points are needed")
+
+    grid = _make_grid(x_arr.shape[0], alpha, c)
+    M = _characteristic_matrix(_prepare_column(x_arr, grid), _prepare_column(y_arr, grid), grid)
+    values = _mine_statistics(M, stats, mcn_eps=mcn_eps, tic_norm=tic_norm)
+    return (values, M) if return_matrix else values
+
+
+def _subsample_mic(task):
+    """MIC of one (x, y) subsample, for the approximate mode's workers."""
+    x_sub, y_sub, alpha, c = task
+    grid = _make_grid(x_sub.shape[0], alpha, c)
+    return _native_mic(_prepare_column(x_sub, grid), _prepare_column(y_sub, grid), grid)
+
+
+def _stratified_draw(order: np.ndarray, size: int, rng) -> np.ndarray:
+    """One point from each of `size` equal slices of the x-sorted points."""
+    edges = np.linspace(0, order.shape[0], size + 1).astype(np.int64)
+    picks = edges[:-1] + (rng.rand(size) * (edges[1:] - edges[:-1])).astype(np.int64)
+    return order[picks]
+
 
+def compute_mic_approx(x: Sequence[float], y: Sequence[float], subsample_size: int = 5000, n_draws: int = 8,
+                       tol: float = 0.02, max_subsample_size: int = 20000, confidence: float = 0.95,
+                       n_boot: int = 1000, n_jobs=1, alpha: float = 0.6, c: float = 15, seed: int = 0) -> dict:
+    """Estimate MIC of very long columns from repeated stratified subsamples.
+
+    Each draw takes one point from each of `subsample_size` equal slices of the x-sorted data and
+    runs the native grid search on it; the `n_draws` draws run on `n_jobs` worker processes. The
+    estimate is the mean over draws, with a percentile bootstrap interval of that mean. While the
+    interval is wider than `tol`, the subsample size is doubled (up to `max_subsample_size`) and a
+    fresh set of draws is taken. Note that MIC of noisy data drifts down with n, so the estimate is
+    the MIC at the final subsample size.
+
+    Returns a dict with mic, ci_low, ci_high, subsample_size and n_draws. When the columns are no
+    longer than the subsample size the exact MIC is returned with a zero-width interval.
+    """
+    x_arr = np.asarray(x, dtype=np.float64).ravel()
+    y_arr = np.asarray(y, dtype=np.float64).ravel()
+    if x_arr.shape[0] != y_arr.shape[0]:
+        raise ValueError("x and y must have the same length")
+    if not (np.isfinite(x_arr).all() and np.isfinite(y_arr).all()):
+        raise ValueError("x and y must be finite")
+    n = x_arr.shape[0]
+    if n <= subsample_size:
+        mic = _subsample_mic((x_arr, y_arr, alpha, c)) if n >= 2 else 0.0
+        return {"mic": mic, "ci_low": mic, "ci_high": mic, "subsample_size": n, "n_draws": 1}
+
+    rng = np.random.RandomState(seed)
+    order = np.argsort(x_arr, kind="mergesort")
+    size = int(subsample_size)
+    workers = _resolve_n_jobs(n_jobs)
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
     try:
-        r2 = r2_score(y_arr, np.poly1d(np.polyfit(x_arr, y_arr, deg=1))(x_arr))
-    except Exception:
-        # polyfit can fail for degenerate inputs; fall back to Pearson r²
-        r = np.corrcoef(x_arr, y_arr)[0, 1]
-        r2 = float(np.nan_to_num(r) ** 2)
+        while True:
+            draws = [_stratified_draw(order, size, rng) for _ in range(n_draws)]
+            tasks = [(x_arr[idx], y_arr[idx], alpha, c) for idx in draws]
+            mics = np.array(list(pool.map(_subsample_mic, tasks)) if pool else [_subsample_mic(t) for t in tasks])
+            boot = mics[rng.randint(0, n_draws, size=(n_boot, n_draws))].mean(axis=1)
+            low, high = np.quantile(boot, [(1 - confidence) / 2, (1 + confidence) / 2])
+            if high - low <= tol or size >= min(max_subsample_size, n):
+                break
+            size = min(2 * size, max_subsample_size, n)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return {"mic": float(mics.mean()), "ci_low": float(low), "ci_high": float(high),
+            "subsample_size": size, "n_draws": n_draws}
+
+
+# Per-process state of the pairwise engine, filled by `_init_pair_worker`.
+_PAIR_STATE = {}
+
+
+def _packed_index(i: int, j: int, n_cols: int) -> int:
+    """Position of pair (i, j), i <= j, in the row-major packed upper triangle."""
+    return i * n_cols - i * (i - 1) // 2 + (j - i)
+
+
+def _init_pair_worker(preps, grid, shm_name=None, n_cols=0, stats=("mic",)):
+    _PAIR_STATE.update(preps=preps, grid=grid, n_cols=n_cols, stats=stats)
+    if shm_name is not None:
+        shm = shared_memory.SharedMemory(name=shm_name)
+        _PAIR_STATE.update(shm=shm, out=np.ndarray((len(stats), n_cols * (n_cols + 1) // 2),
+                                                    dtype=np.float64, buffer=shm.buf))
+
+
+def _score_pair_block(block):
+    """Score every pair (i, j), i <= j, of a block of columns and write it to the shared triangles."""
+    i0, i1, j0, j1 = block
+    preps, grid, out, n_cols, stats = (_PAIR_STATE[key] for key in ("preps", "grid", "out", "n_cols", "stats"))
+    for i in range(i0, i1):
+        for j in range(max(i, j0), j1):
+            values = _mine_statistics(_characteristic_matrix(preps[i], preps[j], grid), stats)
+            out[:, _packed_index(i, j, n_cols)] = [values[name] for name in stats]
+    return block
+
+
+def _score_pair_list(pairs):
+    """MINE statistics (the worker's `stats`, in order) for an explicit list of (i, j) column pairs."""
+    preps, grid, stats = _PAIR_STATE["preps"], _PAIR_STATE["grid"], _PAIR_STATE["stats"]
+    scores = []
+    for i, j in pairs:
+        values = _mine_statistics(_characteristic_matrix(preps[i], preps[j], grid), stats)
+        scores.append(tuple(values[name] for name in stats))
+    return scores
+
+
+@contextmanager
+def _pair_executor(n_jobs, initargs):
+    """Yield a `map` that runs tasks inline or on a process pool whose workers share `initargs`."""
+    workers = _resolve_n_jobs(n_jobs)
+    if workers == 1:
+        _init_pair_worker(*initargs)
+        try:
+            yield lambda func, tasks: [func(task) for task in tasks]
+        finally:
+            if "shm" in _PAIR_STATE:
+                _PAIR_STATE["shm"].close()
+            _PAIR_STATE.clear()
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_pair_worker,
+                                 initargs=initargs) as pool:
+            yield lambda func, tasks: list(pool.map(func, tasks))
+
+
+def _pair_blocks(n_cols: int, chunk_size: int):
+    """Tile the upper triangle (diagonal included) into chunk_size x chunk_size column blocks."""
+    edges = list(range(0, n_cols, chunk_size)) + [n_cols]
+    for a in range(len(edges) - 1):
+        for b in range(a, len(edges) - 1):
+            yield edges[a], edges[a + 1], edges[b], edges[b + 1]
+
 
-    return float(max(0.0, min(1.0, r2)))
+def _resolve_n_jobs(n_jobs) -> int:
+    if n_jobs is None:
+        return 1
+    if n_jobs < 0:
+        return max(1, (os.cpu_count() or 1) + 1 + n_jobs)
+    return max(1, int(n_jobs))
 
 
-def compute_pairwise_mic(df, columns=None):
-    """Compute pairwise MIC-like matrix for columns in a DataFrame (or 2D array-like).
+def _mid_rank(prep: _PreparedColumn) -> np.ndarray:
+    """Rank of every point, tied values sharing the mid-rank of their run (average ranks)."""
+    ends = np.cumsum(prep.run_sizes)
+    mid = np.empty(prep.order.shape[0])
+    mid[prep.order] = np.repeat((2 * ends - prep.run_sizes - 1) / 2.0, prep.run_sizes)
+    return mid
 
-    Returns a pandas DataFrame of pairwise scores when given a DataFrame; otherwise returns
-    a square numpy array.
+
+def _rank_cells(rank: np.ndarray, bins: int) -> np.ndarray:
+    """Equal-frequency cell of every point on a fixed `bins`-cell rank axis (tied ranks share a cell)."""
+    n = rank.shape[0]
+    return np.minimum((rank * bins // n).astype(np.int64), bins - 1)
+
+
+def _grid_mi(joint: np.ndarray) -> np.ndarray:
+    """Normalized mutual information of joint distributions stacked on the last two axes."""
+    bins = joint.shape[-1]
+    indep = joint.sum(axis=-1)[..., :, None] * joint.sum(axis=-2)[..., None, :]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        terms = np.where(joint > 0, joint * np.log(joint / indep), 0.0)
+    return terms.sum(axis=(-2, -1)) / np.log(bins)
+
+
+def _screen_scores(preps: List[_PreparedColumn], method: str = "mi", bins: int = 8, chunk_size: int = 256):
+    """Cheap all-pairs association scores in [0, 1], computed as blocked matrix products.
+
+    - "mi": mutual information on a fixed `bins` x `bins` rank grid, divided by log(bins).
+    - "spearman": squared Spearman rank correlation (misses non-monotonic relationships).
+
+    Both use mid-ranks, so tied values fall in the same cell and a constant column scores 0.
+    """
+    ranks = np.stack([_mid_rank(prep) for prep in preps], axis=1)
+    n, n_cols = ranks.shape
+    if method == "spearman":
+        z = ranks - ranks.mean(axis=0)
+        norms = np.sqrt((z * z).sum(axis=0))
+        z /= np.where(norms > 0, norms, 1.0)
+        return (z.T @ z) ** 2
+    if method != "mi":
+        raise ValueError(f"unknown screen method {method!r}; use 'mi' or 'spearman'")
+
+    cells = _rank_cells(ranks, bins)
+    onehot = np.zeros((n, n_cols * bins), dtype=np.float32)
+    onehot[np.arange(n)[:, None], np.arange(n_cols)[None, :] * bins + cells] = 1.0
+
+    scores = np.zeros((n_cols, n_cols))
+    for a0 in range(0, n_cols, chunk_size):
+        a1 = min(a0 + chunk_size, n_cols)
+        for b0 in range(a0, n_cols, chunk_size):
+            b1 = min(b0 + chunk_size, n_cols)
+            joint = onehot[:, a0 * bins:a1 * bins].T @ onehot[:, b0 * bins:b1 * bins]
+            joint = joint.reshape(a1 - a0, bins, b1 - b0, bins).transpose(0, 2, 1, 3) / n
+            block = _grid_mi(joint)
+            scores[a0:a1, b0:b1] = block
+            scores[b0:b1, a0:a1] = block.T
+    return scores
+
+
+def _screen_against(target: _PreparedColumn, preps: List[_PreparedColumn], bins: int = 8) -> np.ndarray:
+    """Rank-grid mutual information of one target against every candidate, from a single bincount."""
+    n = target.rank.shape[0]
+    cand_cells = _rank_cells(np.stack([_mid_rank(prep) for prep in preps], axis=1), bins)
+    codes = np.arange(len(preps)) * bins * bins + _rank_cells(_mid_rank(target), bins)[:, None] * bins + cand_cells
+    joint = np.bincount(codes.ravel(), minlength=len(preps) * bins * bins).reshape(-1, bins, bins) / n
+    return _grid_mi(joint)
+
+
+def compute_pairwise_mic(df, columns=None, n_jobs=1, chunk_size=32, alpha=0.6, c=15,
+                         screen=None, top_k=None, threshold=None, screen_bins=8, stats=None):
+    """Compute pairwise MIC matrix for columns in a DataFrame (or 2D array-like).
+
+    Every column is ranked and equipartitioned once up front. The upper triangle is then split into
+    `chunk_size` x `chunk_size` blocks of column pairs that are scored by `n_jobs` worker processes
+    (-1 for all cores), each writing straight into a shared packed upper-triangular buffer.
+    Scores always come from the native grid search, even when minepy is installed.
+
+    With `screen` set to "mi" or "spearman", all pairs are first scored by the cheap statistic of
+    `_screen_scores` and only the `top_k` best pairs and/or the pairs scoring at least `threshold`
+    get the full MIC.
+
+    `stats` selects extra MINE statistics (any subset of `MINE_STATISTICS`); they are read off the
+    characteristic matrix already built for MIC, so they add no grid-search cost.
+
+    Returns a pandas DataFrame of pairwise MIC indexed by column name, or a dict of such frames keyed
+    by statistic when `stats` is given. When screening, returns a sparse pair list with columns var1,
+    var2, screen_score and one column per statistic, sorted by decreasing MIC.
     """
     import pandas as pd
 
@@ -73,12 +555,386 @@ def compute_pairwise_mic(df, columns=None):
         columns = list(df.columns)
 
     data = pd.DataFrame(df)[columns]
-    n = len(columns)
-    mat = np.zeros((n, n), dtype=float)
-    for i in range(n):
-        for j in range(i, n):
-            s = compute_mic(data.iloc[:, i].values, data.iloc[:, j].values)
-            mat[i, j] = s
-            mat[j, i] = s
-
-    return pd.DataFrame(mat, index=columns, columns=columns)
+    columns = list(data.columns)
+    values = np.ascontiguousarray(data.to_numpy(dtype=np.float64).T)
+    if not np.isfinite(values).all():
+        raise ValueError("all columns must be finite")
+    n_cols, n = values.shape
+    if screen is not None and top_k is None and threshold is None:
+        raise ValueError("screening needs top_k and/or threshold")
+    as_dict = stats is not None
+    stats = ("mic",) if stats is None else tuple(stats)
+    if "mic" not in stats:
+        stats = ("mic",) + stats
+
+    if n_cols == 0 or n < 2:
+        if screen is not None:
+            return pd.DataFrame(columns=["var1", "var2", "screen_score", *stats])
+        empty = {name: pd.DataFrame(np.zeros((n_cols, n_cols)), index=columns, columns=columns) for name in stats}
+        return empty if as_dict else empty["mic"]
+
+    grid = _make_grid(n, alpha, c)
+    preps = [_prepare_column(col, grid) for col in values]
+    chunk_size = max(1, int(chunk_size))
+
+    if screen is not None:
+        scores = _screen_scores(preps, screen, bins=screen_bins)
+        iu, ju = np.triu_indices(n_cols, 1)
+        pair_scores = scores[iu, ju]
+        keep = np.zeros(pair_scores.shape[0], dtype=bool)
+        if top_k is not None:
+            keep[np.argsort(-pair_scores, kind="stable")[:top_k]] = True
+        if threshold is not None:
+            keep |= pair_scores >= threshold
+        pairs = list(zip(iu[keep].tolist(), ju[keep].tolist()))
+        tasks = [pairs[k:k + chunk_size] for k in range(0, len(pairs), chunk_size)]
+        with _pair_executor(n_jobs if len(tasks) > 1 else 1, (preps, grid, None, 0, stats)) as run:
+            scored = [score for chunk in run(_score_pair_list, tasks) for score in chunk]
+        result = pd.DataFrame({"var1": [columns[i] for i, _ in pairs],
+                               "var2": [columns[j] for _, j in pairs],
+                               "screen_score": pair_scores[keep]})
+        for k, name in enumerate(stats):
+            result[name] = [score[k] for score in scored]
+        return result.sort_values("mic", ascending=False, kind="stable").reset_index(drop=True)
+
+    n_pairs = n_cols * (n_cols + 1) // 2
+    shm = shared_memory.SharedMemory(create=True, size=len(stats) * n_pairs * np.dtype(np.float64).itemsize)
+    try:
+        blocks = list(_pair_blocks(n_cols, chunk_size))
+        with _pair_executor(n_jobs if len(blocks) > 1 else 1, (preps, grid, shm.name, n_cols, stats)) as run:
+            run(_score_pair_block, blocks)
+        packed = np.ndarray((len(stats), n_pairs), dtype=np.float64, buffer=shm.buf)
+        mats = {}
+        for k, name in enumerate(stats):
+            mat = np.zeros((n_cols, n_cols), dtype=float)
+            mat[np.triu_indices(n_cols)] = packed[k]
+            mats[name] = pd.DataFrame(mat + np.triu(mat, 1).T, index=columns, columns=columns)
+        del packed
+    finally:
+        shm.close()
+        shm.unlink()
+
+    return mats if as_dict else mats["mic"]
+
+
+def compute_mic_against(target, frame, top_k=None, stats=MINE_STATISTICS, n_jobs=1, batch_size=32,
+                        patience=None, alpha=0.6, c=15):
+    """Score one target column against every column of `frame` and rank the associations.
+
+    `target` is a 1-D sequence or the name of a column of `frame` (which is then left out of the
+    candidates). The target is ranked and equipartitioned once; candidates are scored in batches of
+    `batch_size` by `n_jobs` worker processes, and every requested MINE statistic comes from the
+    same characteristic matrix.
+
+    With `top_k` and `patience` set, candidates are visited in decreasing order of a rank-grid
+    mutual information prefilter and scoring stops once `patience` consecutive batches have not
+    changed the top-k; unscored candidates are left out of the result.
+
+    Returns a pandas DataFrame indexed by candidate name with one column per statistic, sorted by
+    decreasing MIC and truncated to `top_k` rows when given.
+    """
+    import pandas as pd
+
+    frame = pd.DataFrame(frame)
+    if isinstance(target, str) and target in frame.columns:
+        target_values = frame[target].to_numpy(dtype=np.float64)
+        frame = frame.drop(columns=[target])
+    else:
+        target_values = np.asarray(target, dtype=np.float64).ravel()
+    values = np.ascontiguousarray(frame.to_numpy(dtype=np.float64).T)
+    names = list(frame.columns)
+    if values.shape[1] != target_values.shape[0]:
+        raise ValueError("target and frame must have the same number of rows")
+    if not (np.isfinite(values).all() and np.isfinite(target_values).all()):
+        raise ValueError("target and frame must be finite")
+    stats = tuple(stats)
+    if "mic" not in stats:
+        stats = ("mic",) + stats
+
+    n = target_values.shape[0]
+    if not names or n < 2:
+        return pd.DataFrame(columns=list(stats), index=pd.Index(names[:0]))
+
+    grid = _make_grid(n, alpha, c)
+    preps = [_prepare_column(target_values, grid)] + [_prepare_column(col, grid) for col in values]
+    early_stop = top_k is not None and patience is not None
+    order = np.arange(len(names))
+    if early_stop:
+        order = np.argsort(-_screen_against(preps[0], preps[1:]), kind="stable")
+    batches = [[(0, int(j) + 1) for j in order[k:k + batch_size]] for k in range(0, len(order), batch_size)]
+
+    scored = {}
+    workers = _resolve_n_jobs(n_jobs)
+    with _pair_executor(workers if len(batches) > 1 else 1, (preps, grid, None, 0, stats)) as run:
+        stale, top = 0, None
+        for start in range(0, len(batches), workers):
+            wave = batches[start:start + workers]
+            for batch, scores in zip(wave, run(_score_pair_list, wave)):
+                for (_, j), score in zip(batch, scores):
+                    scored[j - 1] = score
+            if early_stop:
+                mics = {j: score[0] for j, score in scored.items()}
+                new_top = set(sorted(mics, key=lambda j: (-mics[j], j))[:top_k])
+                stale = stale + len(wave) if new_top == top else 0
+                top = new_top
+                if stale >= patience:
+                    break
+
+    idx = sorted(scored)
+    table = pd.DataFrame([scored[j] for j in idx], index=pd.Index([names[j] for j in idx]), columns=list(stats))
+    table = table.sort_values("mic", ascending=False, kind="stable")
+    return table.head(top_k) if top_k is not None else table
+
+
+def _csv_to_npy(path, npy_path, chunksize=100_000):
+    """Parse a CSV once into a column-major (Fortran-ordered) `.npy` file of float64.
+
+    The row chunks are appended to a raw row-major file while parsing, then copied into the
+    column-major array, so a block of columns is later one contiguous read per column.
+    """
+    import pandas as pd
+
+    raw_path, tmp_path = npy_path + ".rows", npy_path + ".tmp"
+    n_rows, n_cols = 0, len(pd.read_csv(path, nrows=0).columns)
+    with open(raw_path, "wb") as raw:
+        for chunk in pd.read_csv(path, chunksize=chunksize):
+            chunk.to_numpy(dtype=np.float64).tofile(raw)
+            n_rows += chunk.shape[0]
+    out = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float64, shape=(n_rows, n_cols),
+                                    fortran_order=True)
+    if n_rows and n_cols:
+        rows = np.memmap(raw_path, dtype=np.float64, mode="r", shape=(n_rows, n_cols))
+        step = max(1, 2 ** 24 // n_cols)  # about 128 MB of rows per copy
+        for r0 in range(0, n_rows, step):
+            out[r0:r0 + step] = rows[r0:r0 + step]
+        del rows
+    out.flush()
+    del out
+    os.replace(tmp_path, npy_path)
+    os.remove(raw_path)
+
+
+def _column_source(path, cache_path=None):
+    """Column names of an on-disk table and a loader returning a (rows, len(names)) float64 block.
+
+    `.npy` files are memory-mapped and sliced, and Parquet files are read one column group at a time.
+    CSV/TXT files are parsed once, on the first load, into the column-major `.npy` file `cache_path`
+    (default: the source path + ".columns.npy"), which is then memory-mapped; a cache newer than the
+    source is reused.
+    """
+    import pandas as pd
+
+    path = str(path)
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        names = list(pq.ParquetFile(path).schema_arrow.names)
+        return names, lambda cols: pd.read_parquet(path, columns=list(cols)).to_numpy(dtype=np.float64)
+
+    arr = None
+    if path.endswith(".npy"):
+        arr = np.load(path, mmap_mode="r")
+        if arr.ndim != 2:
+            raise ValueError(f"{path} must hold a 2-D array")
+        names = [f"col{i}" for i in range(arr.shape[1])]
+    else:
+        names = list(pd.read_csv(path, nrows=0).columns)
+        cache_path = str(cache_path or path + ".columns.npy")
+    index = {name: i for i, name in enumerate(names)}
+
+    def load(cols):
+        nonlocal arr
+        if arr is None:
+            if not (os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(path)):
+                _csv_to_npy(path, cache_path)
+            arr = np.load(cache_path, mmap_mode="r")
+        return np.array(arr[:, [index[name] for name in cols]], dtype=np.float64)
+    return names, load
+
+
+def compute_pairwise_mic_streaming(source, out_path, block_size=64, stats=None, n_jobs=1, chunk_size=32,
+                                   alpha=0.6, c=15):
+    """Out-of-core pairwise MIC over a CSV, `.npy` or Parquet table, written as an on-disk edge list.
+
+    Columns are loaded and prepared `block_size` at a time and every pair of blocks is scored
+    (within a block pair, as in `compute_pairwise_mic`), so peak memory is bounded by two blocks of
+    columns rather than by the table width. Each finished block pair is appended to the CSV edge list
+    `out_path` (columns var1, var2 and one per statistic, i < j only) and logged with the file offset
+    in `out_path + ".done"`; rerunning after a crash truncates the edge list to the last logged offset
+    and skips the block pairs already done.
+
+    A CSV source is parsed once into the column-major `out_path + ".columns.npy"` before the first
+    block is scored, instead of once per block load; the file is kept for a resumed run and removed
+    when every block pair is done.
+
+    Returns `out_path`; load the result with `pandas.read_csv(out_path)`.
+    """
+    import csv
+
+    cache_path = str(out_path) + ".columns.npy"
+    names, load = _column_source(source, cache_path)
+    stats = ("mic",) if stats is None else tuple(stats)
+    if "mic" not in stats:
+        stats = ("mic",) + stats
+    block_size = max(1, int(block_size))
+    chunk_size = max(1, int(chunk_size))
+    blocks = [names[k:k + block_size] for k in range(0, len(names), block_size)]
+
+    out_path = str(out_path)
+    done_path = out_path + ".done"
+    done, offset = set(), 0
+    if os.path.exists(done_path) and os.path.exists(out_path):
+        with open(done_path) as fh:
+            for line in fh:
+                parts = line.split()
+                if len(parts) == 3:
+                    a, b, end = (int(part) for part in parts)
+                    done.add((a, b))
+                    offset = max(offset, end)
+    if done:
+        with open(out_path, "r+") as fh:
+            fh.truncate(offset)
+    else:
+        with open(out_path, "w", newline="") as fh:
+            csv.writer(fh).writerow(["var1", "var2", *stats])
+        open(done_path, "w").close()
+
+    grid = None
+
+    def prepare_block(index):
+        nonlocal grid
+        values = load(blocks[index])
+        if not np.isfinite(values).all():
+            raise ValueError(f"columns {blocks[index][0]}..{blocks[index][-1]} must be finite")
+        if grid is None:
+            grid = _make_grid(values.shape[0], alpha, c)
+        return [_prepare_column(np.ascontiguousarray(col), grid) for col in values.T]
+
+    with open(out_path, "a", newline="") as edges, open(done_path, "a") as log:
+        writer = csv.writer(edges)
+        for a in range(len(blocks)):
+            pending = [b for b in range(a, len(blocks)) if (a, b) not in done]
+            if not pending:
+                continue
+            preps_a = prepare_block(a)
+            n_a = len(preps_a)
+            for b in pending:
+                preps_b = preps_a if b == a else prepare_block(b)
+                pairs = [(i, n_a + j) for i in range(n_a) for j in range(len(preps_b)) if b != a or i < j]
+                tasks = [pairs[k:k + chunk_size] for k in range(0, len(pairs), chunk_size)]
+                initargs = (preps_a + preps_b, grid, None, 0, stats)
+                with _pair_executor(n_jobs if len(tasks) > 1 else 1, initargs) as run:
+                    scored = [score for chunk in run(_score_pair_list, tasks) for score in chunk]
+                for (i, j), score in zip(pairs, scored):
+                    writer.writerow([blocks[a][i], blocks[b][j - n_a], *score])
+                edges.flush()
+                os.fsync(edges.fileno())
+                log.write(f"{a} {b} {edges.tell()}\n")
+                log.flush()
+                os.fsync(log.fileno())
+    if os.path.exists(cache_path):
+        os.remove(cache_path)
+    return out_path
+
+
+def _null_mic_chunk(task):
+    """MIC of independent uniform pairs of length n, one per seed."""
+    n, alpha, c, seeds = task
+    grid = _make_grid(n, alpha, c)
+    mics = []
+    for seed in seeds:
+        rng = np.random.RandomState(seed)
+        mics.append(_native_mic(_prepare_column(rng.rand(n), grid), _prepare_column(rng.rand(n), grid), grid))
+    return mics
+
+
+def _default_null_cache_dir() -> str:
+    return os.environ.get("MIC_NULL_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "mic_null"))
+
+
+def mic_null_distribution(n: int, alpha: float = 0.6, c: float = 15, n_perm: int = 1000, cache_dir=None,
+                          n_jobs=1, chunk_size: int = 25) -> np.ndarray:
+    """Sorted null distribution of MIC for two independent columns of length n.
+
+    MIC only sees ranks, so for untied data its permutation null depends on (n, alpha, c) alone and
+    can be shared by every pair of that length. Tables are generated on `n_jobs` worker processes,
+    stored as `.npy` files under `cache_dir` (default: $MIC_NULL_CACHE or ~/.cache/mic_null) and
+    reused, or extended, on later calls.
+    """
+    cache_dir = _default_null_cache_dir() if cache_dir is None else str(cache_dir)
+    path = os.path.join(cache_dir, f"mic_null_n{int(n)}_alpha{alpha:g}_c{c:g}.npy")
+    null = np.load(path) if os.path.exists(path) else np.empty(0)
+    if null.shape[0] >= n_perm:
+        return null
+
+    seeds = list(range(null.shape[0], n_perm))
+    tasks = [(int(n), alpha, c, seeds[k:k + chunk_size]) for k in range(0, len(seeds), chunk_size)]
+    workers = _resolve_n_jobs(n_jobs)
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunks = list(pool.map(_null_mic_chunk, tasks))
+    else:
+        chunks = [_null_mic_chunk(task) for task in tasks]
+    null = np.sort(np.concatenate([null] + [np.asarray(chunk) for chunk in chunks]))
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = path + ".tmp.npy"
+    np.save(tmp_path, null)
+    os.replace(tmp_path, path)
+    return null
+
+
+def mic_pvalue(mic, n: int, alpha: float = 0.6, c: float = 15, n_perm: int = 1000, cache_dir=None, n_jobs=1):
+    """Permutation p-value(s) of observed MIC value(s) for columns of length n.
+
+    Uses the cached null table of `mic_null_distribution`: p = (1 + #{null >= mic}) / (1 + n_perm).
+    Accepts a scalar or an array of MIC values.
+    """
+    null = mic_null_distribution(n, alpha, c, n_perm, cache_dir=cache_dir, n_jobs=n_jobs)
+    mic = np.asarray(mic, dtype=np.float64)
+    # a small tolerance so that ties with the null count as "at least as large"
+    exceed = null.shape[0] - np.searchsorted(null, mic - 1e-12, side="left")
+    pvalues = (1.0 + exceed) / (1.0 + null.shape[0])
+    return float(pvalues) if pvalues.ndim == 0 else pvalues
+
+
+def benjamini_hochberg(pvalues) -> np.ndarray:
+    """Benjamini-Hochberg adjusted p-values (q-values), in the input order."""
+    p = np.asarray(pvalues, dtype=np.float64).ravel()
+    m = p.shape[0]
+    if m == 0:
+        return p
+    order = np.argsort(p, kind="stable")
+    ranked = p[order] * m / np.arange(1, m + 1)
+    q = np.minimum.accumulate(ranked[::-1])[::-1]
+    out = np.empty(m)
+    out[order] = np.minimum(q, 1.0)
+    return out
+
+
+def mic_significance(result, n: int, alpha: float = 0.6, c: float = 15, n_perm: int = 1000, cache_dir=None,
+                     n_jobs=1):
+    """Attach permutation p-values and Benjamini-Hochberg q-values to `compute_pairwise_mic` output.
+
+    `result` is either the square MIC DataFrame (or the `stats` dict holding it) or the sparse pair
+    list of a screened run; `n` is the number of rows the scores were computed on. The null table
+    is looked up once for all pairs, so the significance pass costs one table lookup per pair
+    (plus generating the table the first time a given n is seen).
+
+    Returns a pair list with columns var1, var2, mic, p_value and q_value sorted by p-value.
+    """
+    import pandas as pd
+
+    if isinstance(result, dict):
+        result = result["mic"]
+    if "var1" in result.columns:
+        pairs = result.loc[:, ["var1", "var2", "mic"]].reset_index(drop=True)
+    else:
+        names = list(result.columns)
+        iu, ju = np.triu_indices(len(names), 1)
+        values = result.to_numpy()
+        pairs = pd.DataFrame({"var1": [names[i] for i in iu], "var2": [names[j] for j in ju],
+                              "mic": values[iu, ju]})
+    pairs["p_value"] = mic_pvalue(pairs["mic"].to_numpy(), n, alpha, c, n_perm, cache_dir=cache_dir, n_jobs=n_jobs)
+    pairs["q_value"] = benjamini_hochberg(pairs["p_value"].to_numpy())
+    return pairs.sort_values(["p_value", "mic"], ascending=[True, False], kind="stable").reset_index(drop=True)
@@ -1,11 +1,276 @@
+import sys
+from pathlib import Path
+
 import numpy as np
-from src.mic_utils import compute_mic
+import pytest
+from src.mic_utils import benjamini_hochberg, mic_null_distribution, mic_significance, compute_mic, compute_mic_against, compute_mic_approx, compute_mine_stats, compute_pairwise_mic, compute_pairwise_mic_streaming, _characteristic_matrix, _make_grid, _prepare_column, _screen_against
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+import experiments  # noqa: E402
+from experiments import make_relationship, plot_sweep, run_sweep  # noqa: E402
+
+KINDS = ["linear", "quadratic", "sin", "exponential", "cubic", "step", "circular"]
+
+
+def native_mic(x, y, alpha=0.6, c=15):
+    x, y = np.asarray(x, float), np.asarray(y, float)
+    grid = _make_grid(x.shape[0], alpha, c)
+    return np.nanmax(_characteristic_matrix(_prepare_column(x, grid), _prepare_column(y, grid), grid))
 
 
 def test_linear_mic_high():
-    # Perfect linear relationship (no noise) should have a high score with either minepy or R² fallback
+    # Perfect linear relationship (no noise) should have a high score with either minepy or the native engine
     x = np.linspace(0, 1, 200)
     y = 2.0 * x  # perfect linear
     score = compute_mic(x, y)
     # Accept a high threshold (0.9) to tolerate fallback behavior
     assert score >= 0.9, f"Expected high MIC-like score for perfect linear, got {score}"
+
+
+def test_native_matches_minepy_reference_example():
+    # Values printed by minepy's documented example (alpha=0.6, c=15, est="mic_approx")
+    x = np.linspace(0, 1, 1000)
+    y = np.sin(10 * np.pi * x) + x
+    assert native_mic(x, y) == pytest.approx(1.0)
+    np.random.seed(0)
+    y += np.random.uniform(-1, 1, x.shape[0])
+    assert native_mic(x, y) == pytest.approx(0.505716693417, abs=1e-9)
+
+
+def test_mine_stats_match_minepy_reference_example():
+    # minepy's documented example output for the noisy series, all read from one characteristic matrix
+    x = np.linspace(0, 1, 1000)
+    np.random.seed(0)
+    y = np.sin(10 * np.pi * x) + x + np.random.uniform(-1, 1, x.shape[0])
+    stats, M = compute_mine_stats(x, y, return_matrix=True)
+    assert stats == pytest.approx({"mic": 0.505716693417, "mas": 0.365399904262, "mev": 0.505716693417,
+                                   "mcn": 5.95419631039, "tic": 28.7498326953}, abs=1e-9)
+    assert compute_mine_stats(x, y, stats=["mcn"], mcn_eps=1 - stats["mic"])["mcn"] == pytest.approx(3.80735492206)
+    assert np.nanmax(M) == pytest.approx(stats["mic"])
+
+
+@pytest.mark.parametrize("kind", KINDS)
+def test_native_noiseless_relationships_score_one(kind):
+    # minepy gives MIC = 1 for every noiseless functional relationship in experiments.make_relationship
+    x = np.linspace(0, 1, 500)
+    y = make_relationship(kind, x)
+    assert native_mic(x, y) == pytest.approx(1.0)
+
+
+# minepy 1.2.6 MINE(alpha=0.6, c=15).mic() on make_relationship(kind, linspace(0, 1, 500), noise_scale=0.5,
+# rng=RandomState(1)), recorded so the parity check runs without minepy installed
+MINEPY_NOISY_MIC = {"linear": 0.763226002242, "quadratic": 0.706983363408, "sin": 0.804545401535,
+                    "exponential": 0.731603214613, "cubic": 0.529947218879, "step": 0.988980449991,
+                    "circular": 0.661488986637, "random": 0.159331800847}
+
+
+@pytest.mark.parametrize("kind", KINDS + ["random"])
+def test_native_matches_minepy_reference_with_noise(kind):
+    x = np.linspace(0, 1, 500)
+    y = make_relationship(kind, x, noise_scale=0.5, rng=np.random.RandomState(1))
+    assert native_mic(x, y) == pytest.approx(MINEPY_NOISY_MIC[kind], abs=1e-9)
+
+
+@pytest.mark.parametrize("kind", KINDS + ["random"])
+def test_native_matches_minepy_with_noise(kind):
+    minepy = pytest.importorskip("minepy")
+    x = np.linspace(0, 1, 500)
+    y = make_relationship(kind, x, noise_scale=0.5, rng=np.random.RandomState(1))
+    mine = minepy.MINE(alpha=0.6, c=15)
+    mine.compute_score(x, y)
+    assert native_mic(x, y) == pytest.approx(mine.mic(), abs=1e-6)
+
+
+@pytest.mark.parametrize("n", [50, 100, 500])
+def test_mine_stats_stay_in_unit_interval_on_tied_steps(n):
+    x = np.linspace(0, 1, n)
+    stats = compute_mine_stats(x, np.floor(2 * x))
+    assert stats["mic"] == 1.0 and stats["mev"] <= stats["mic"]
+    assert 0 <= stats["mas"] <= 1 and 0 <= stats["mev"] <= 1
+
+
+def test_pairwise_parallel_matches_single_pair_calls():
+    pd = pytest.importorskip("pandas")
+    x = np.linspace(0, 1, 150)
+    rng = np.random.RandomState(3)
+    df = pd.DataFrame({kind: make_relationship(kind, x, noise_scale=0.2, rng=rng) for kind in KINDS})
+    df["x"] = x
+    serial = compute_pairwise_mic(df, n_jobs=1, chunk_size=3)
+    parallel = compute_pairwise_mic(df, n_jobs=2, chunk_size=3, stats=["mas"])
+    expected = np.array([[native_mic(df[a], df[b]) for b in df.columns] for a in df.columns])
+    np.testing.assert_allclose(serial.values, expected, atol=1e-12)
+    np.testing.assert_array_equal(parallel["mic"].values, serial.values)
+    assert parallel["mas"].loc["sin", "x"] == pytest.approx(compute_mine_stats(df["sin"], df["x"])["mas"])
+
+
+def test_screened_pairs_keep_planted_relationships():
+    pd = pytest.importorskip("pandas")
+    rng = np.random.RandomState(4)
+    cols = {}
+    for kind in ["sin", "circular"]:
+        x = rng.rand(200)
+        cols[kind + "_x"], cols[kind + "_y"] = x, make_relationship(kind, x, rng=rng)
+    for i in range(4):
+        cols[f"random{i}"] = rng.rand(200)
+    df = pd.DataFrame(cols)
+    pairs = compute_pairwise_mic(df, screen="mi", top_k=2)
+    assert set(zip(pairs["var1"], pairs["var2"])) == {("sin_x", "sin_y"), ("circular_x", "circular_y")}
+    for a, b, mic in zip(pairs["var1"], pairs["var2"], pairs["mic"]):
+        assert mic == pytest.approx(native_mic(df[a], df[b]))
+
+
+@pytest.mark.parametrize("screen", ["mi", "spearman"])
+def test_screen_ignores_row_order_of_ties(screen):
+    pd = pytest.importorskip("pandas")
+    rng = np.random.RandomState(6)
+    x = rng.rand(200)
+    # a sorted key, a constant and a two-valued column: only x and x**2 are associated
+    df = pd.DataFrame({"key": np.arange(200.0), "const": np.ones(200), "flag": rng.randint(0, 2, 200).astype(float),
+                       "x": x, "x2": x ** 2})
+    pairs = compute_pairwise_mic(df, screen=screen, top_k=1, threshold=0.0)
+    scores = {frozenset(p): s for *p, s in zip(pairs["var1"], pairs["var2"], pairs["screen_score"])}
+    assert pairs.loc[0, ["var1", "var2"]].tolist() == ["x", "x2"] and pairs.loc[0, "screen_score"] > 0.9
+    assert all(s == 0 for p, s in scores.items() if "const" in p)
+    assert scores[frozenset(("key", "flag"))] < 0.05
+
+    grid = _make_grid(200, 0.6, 15)
+    preps = [_prepare_column(df[name].to_numpy(), grid) for name in ["key", "const", "flag", "x"]]
+    against = _screen_against(preps[0], preps[1:])
+    assert against[0] == 0 and against[1] < 0.05
+
+
+def test_mic_against_ranks_candidates_and_stops_early():
+    pd = pytest.importorskip("pandas")
+    rng = np.random.RandomState(5)
+    x = rng.rand(200)
+    df = pd.DataFrame({f"random{i}": rng.rand(200) for i in range(20)})
+    df["sin"] = make_relationship("sin", x, noise_scale=0.1, rng=rng)
+    df["step"] = make_relationship("step", x, rng=rng)
+    full = compute_mic_against(x, df)
+    assert list(full.columns) == ["mic", "mas", "mev", "mcn", "tic"]
+    assert set(full.index[:2]) == {"sin", "step"}
+    assert full.loc["sin", "mic"] == pytest.approx(native_mic(x, df["sin"]))
+    early = compute_mic_against(x, df, top_k=2, patience=1, batch_size=4)
+    pd.testing.assert_frame_equal(early, full.head(2))
+
+
+def test_streaming_edge_list_matches_in_memory_and_resumes(tmp_path):
+    pd = pytest.importorskip("pandas")
+    rng = np.random.RandomState(6)
+    x = rng.rand(120)
+    df = pd.DataFrame({"x": x, "sin": make_relationship("sin", x, rng=rng), "r1": rng.rand(120),
+                       "quad": make_relationship("quadratic", x, rng=rng), "r2": rng.rand(120)})
+    df.to_csv(tmp_path / "table.csv", index=False)
+    out = compute_pairwise_mic_streaming(tmp_path / "table.csv", tmp_path / "edges.csv", block_size=2)
+    edges = pd.read_csv(out)
+    full = compute_pairwise_mic(df)
+    assert len(edges) == 10
+    for a, b, mic in zip(edges["var1"], edges["var2"], edges["mic"]):
+        assert mic == pytest.approx(full.loc[a, b], abs=1e-12)
+
+    # simulate a crash after the edges of the last block pairs were only partly written
+    done = (tmp_path / "edges.csv.done").read_text().splitlines()
+    (tmp_path / "edges.csv.done").write_text("\n".join(done[:-2]) + "\n")
+    with open(out, "a") as fh:
+        fh.write("x,partial,0.5\n")
+    compute_pairwise_mic_streaming(tmp_path / "table.csv", out, block_size=2)
+    pd.testing.assert_frame_equal(pd.read_csv(out), edges)
+
+
+def test_streaming_parses_a_csv_once(tmp_path, monkeypatch):
+    pd = pytest.importorskip("pandas")
+    rng = np.random.RandomState(9)
+    table = rng.rand(150, 6)
+    table[:, 1] = np.sin(6 * table[:, 0])
+    pd.DataFrame(table, columns=list("abcdef")).to_csv(tmp_path / "table.csv", index=False)
+    np.save(tmp_path / "table.npy", table)
+    parses, read_csv = [], pd.read_csv
+    monkeypatch.setattr(pd, "read_csv", lambda *args, **kwargs: parses.append(kwargs) or read_csv(*args, **kwargs))
+
+    out = compute_pairwise_mic_streaming(tmp_path / "table.csv", tmp_path / "edges.csv", block_size=1)
+    assert sum("chunksize" in kwargs for kwargs in parses) == 1  # 21 block pairs, one parse
+    assert not (tmp_path / "edges.csv.columns.npy").exists()
+    monkeypatch.undo()
+    edges = pd.read_csv(out)
+    reference = pd.read_csv(compute_pairwise_mic_streaming(tmp_path / "table.npy", tmp_path / "npy.csv", block_size=1))
+    np.testing.assert_array_equal(edges["mic"], reference["mic"])
+    assert len(edges) == 15 and edges.loc[edges["mic"].idxmax(), ["var1", "var2"]].tolist() == ["a", "b"]
+
+
+def test_subsampled_mic_interval():
+    rng = np.random.RandomState(7)
+    x = rng.rand(3000)
+    y = make_relationship("sin", x, noise_scale=0.3, rng=rng)
+    est = compute_mic_approx(x, y, subsample_size=300, n_draws=4, tol=1.0, seed=1)
+    assert est["subsample_size"] == 300
+    assert est["ci_low"] <= est["mic"] <= est["ci_high"]
+    assert 0.3 < est["mic"] < 1.0
+    exact = compute_mic_approx(x[:200], y[:200], subsample_size=300)
+    assert exact["mic"] == pytest.approx(native_mic(x[:200], y[:200]))
+    assert exact["ci_low"] == exact["ci_high"] == exact["mic"]
+
+
+def test_benjamini_hochberg_adjustment():
+    q = benjamini_hochberg([0.01, 0.04, 0.03, 0.20])
+    np.testing.assert_allclose(q, [0.04, 0.04 * 4 / 3, 0.04 * 4 / 3, 0.20])
+
+
+def test_significance_uses_cached_null(tmp_path):
+    pd = pytest.importorskip("pandas")
+    null = mic_null_distribution(80, n_perm=40, cache_dir=tmp_path)
+    assert null.shape == (40,) and np.all(np.diff(null) >= 0)
+    assert len(list(tmp_path.glob("*.npy"))) == 1
+    rng = np.random.RandomState(8)
+    x = rng.rand(80)
+    df = pd.DataFrame({"x": x, "sin": make_relationship("sin", x, rng=rng), "rnd": rng.rand(80)})
+    sig = mic_significance(compute_pairwise_mic(df), 80, n_perm=40, cache_dir=tmp_path)
+    assert (sig.loc[0, "var1"], sig.loc[0, "var2"]) == ("x", "sin")
+    assert sig.loc[0, "p_value"] == pytest.approx(1 / 41)
+    assert (sig["q_value"] >= sig["p_value"]).all()
+
+
+def test_sweep_resumes_after_interruption(tmp_path, monkeypatch):
+    pd = pytest.importorskip("pandas")
+    grid = dict(ns=(60,), noise_levels=[0.0, 0.5, 1.0], kinds=["sin", "random"], reps=2, seed=3)
+    full = run_sweep(tmp_path / "full", n_jobs=1, **grid)
+
+    # stop the sweep after five rows, leaving a half-written sixth row behind
+    task, calls = experiments._sweep_task, []
+
+    def interrupted(t):
+        if len(calls) == 5:
+            raise KeyboardInterrupt
+        calls.append(t)
+        return task(t)
+
+    monkeypatch.setattr(experiments, "_sweep_task", interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        run_sweep(tmp_path / "resumed", n_jobs=1, **grid)
+    monkeypatch.undo()
+    store = tmp_path / "resumed" / "sweep_results.csv"
+    with open(store, "a") as fh:
+        fh.write("sin,0.5,60")
+    assert len(pd.read_csv(store, on_bad_lines="skip").dropna(subset=["r2"])) == 5
+
+    resumed = run_sweep(tmp_path / "resumed", n_jobs=2, **grid)
+    key = ["kind", "noise", "n", "rep"]
+    rows = pd.read_csv(store).sort_values(key).reset_index(drop=True)
+    assert not rows.duplicated(key).any() and len(rows) == 12
+    expected = pd.read_csv(tmp_path / "full" / "sweep_results.csv").sort_values(key).reset_index(drop=True)
+    assert rows.equals(expected)
+    assert resumed.equals(full)
+
+    plot_sweep(tmp_path / "resumed")
+    assert len(list((tmp_path / "resumed").glob("sweep_*_n60.png"))) == 2
+
+
+def test_sweep_summary_covers_the_requested_grid(tmp_path):
+    pytest.importorskip("pandas")
+    grid = dict(ns=(60,), noise_levels=[0.0, 0.5], kinds=["sin", "random"], reps=2, seed=3)
+    full = run_sweep(tmp_path, n_jobs=-1, **grid)
+    assert len(full) == 4 and (full["reps"] == 2).all()
+
+    # another grid in the same directory: its summary leaves out the cells of the first one
+    small = run_sweep(tmp_path, ns=(60,), noise_levels=[0.5, 1.0], kinds=["sin"], reps=1, seed=3, n_jobs=-1)
+    assert small[["kind", "noise", "n", "reps"]].values.tolist() == [["sin", 0.5, 60, 1], ["sin", 1.0, 60, 1]]
+    assert run_sweep(tmp_path, n_jobs=-2, **grid).equals(full)
@@ -6,13 +6,653 @@ Created on Wed Jan  5 10:04:22 2022
 """
 '''
 DPC算法，返回聚类的结果
+
+DPC() 是向量化实现：截断距离用分块 np.partition 选出，密度用 KD 树半径计数，
+delta/nneigh 用分块的"最近的更高密度点"搜索，内存为 O(N·block) 而不是 O(N²)。
+距离块由 distances.PairwiseDistances 提供，可以和 HIAC 的各阶段共用同一份。
+DensityPeaks 缓存 fit() 的结果，之后可以用 labels(k) 或 labels(centers=...) 以 O(N) 重新分配簇；
+partial_fit(batch) 增量加入新点，只更新受影响的点的密度、delta/nneigh 和标签。
+DPC_naive() 保留原来的双重循环实现，作为对照和基准。两者输出的标签完全相同。
+ratio='auto' 用数据势能的熵在候选比例中选截断距离，k='auto' 取 gamma 排序后最大落差之前的点作为簇心。
+n_jobs > 1 时截断距离、密度和 delta 按点分片交给进程池计算，数据放在 multiprocessing.shared_memory 里，结果与单进程完全相同。
+DPC_knn() 是面向大数据（10^5 以上）的近似模式：用 k 近邻定义密度，用 KD 树按密度排名查找更高密度的最近邻。
 '''
 import numpy as np
+import itertools
 import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
 import scipy.spatial.distance
+from scipy.spatial import cKDTree
 
+try:
+    from .distances import PairwiseDistances
+except ImportError:  # DPC.py run or imported as a top-level script
+    from distances import PairwiseDistances
 
-def DPC(data, k):
+
+def _band_pass(distances, starts, lo, hi):
+    '''
+    One pass over the upper triangle for the row blocks starting at starts: the number of distances
+    below lo, the distances in [lo, hi] and the largest distance.
+    '''
+    data = distances.data
+    Num = data.shape[0]
+    below = 0
+    band = [np.empty(0)]
+    maxd = 0.0
+    for b0 in starts:
+        b1 = min(b0 + distances.block, Num)
+        if b1 == Num and b0 == 0 and distances.matrix is None:
+            dis = scipy.spatial.distance.pdist(data)  # everything fits in one block
+        else:
+            dis = distances.rows(np.arange(b0, b1), np.arange(b0, Num))
+            dis = dis[np.arange(b0, Num)[None, :] > np.arange(b0, b1)[:, None]]
+        if dis.size:
+            maxd = max(maxd, dis.max())
+        below += int(np.count_nonzero(dis < lo))
+        band.append(dis[(dis >= lo) & (dis <= hi)])
+    return below, np.concatenate(band), maxd
+
+
+def _cutoff_distance(distances, ratio, seed=0, band_pass=None):
+    '''
+    The same cutoff as DPC_naive, i.e. sda[round(M*ratio/100) - 1] of the M sorted pairwise distances,
+    without materializing them: a random sample of pairs brackets the quantile, one blocked pass counts
+    the distances below the bracket and keeps the ones inside it, and np.partition picks the exact value.
+    Also returns the largest pairwise distance, found in the same pass. band_pass(lo, hi) replaces the
+    serial _band_pass over all row blocks (used by the process pool). Without any pair (a single point)
+    the cutoff is undefined and 0 is returned.
+    '''
+    data = distances.data
+    Num = data.shape[0]
+    M = Num * (Num - 1) // 2
+    if M == 0:  # a single point: no pair, so no point lies within any cutoff
+        return 0.0, 0.0
+    kth = round(M * ratio / 100) - 1
+    if kth < 0:
+        kth += M
+    if band_pass is None:
+        def band_pass(lo, hi):
+            return _band_pass(distances, range(0, Num, distances.block), lo, hi)
+
+    rng = np.random.RandomState(seed)
+    S = min(M, 200000, max(2000, 4000000 // data.shape[1]))
+    i = rng.randint(0, Num, S)
+    j = (i + rng.randint(1, Num, S)) % Num
+    sample = np.sqrt(((data[i] - data[j]) ** 2).sum(axis=1))
+    q = (kth + 0.5) / M
+    margin = 5.0 / math.sqrt(S) + 1e-3
+    lo = np.quantile(sample, max(0.0, q - margin)) if q - margin > 0 else -np.inf
+    hi = np.quantile(sample, min(1.0, q + margin)) if q + margin < 1 else np.inf
+
+    while True:
+        below, band, maxd = band_pass(lo, hi)
+        if below <= kth < below + band.shape[0]:
+            area = np.partition(band, kth - below)[kth - below]
+            return area, maxd
+        # the sample missed the quantile: widen the bracket on the side that failed
+        if kth < below:
+            lo = -np.inf
+        else:
+            hi = np.inf
+
+
+# candidate cutoffs of ratio='auto', in % of the pairwise distances
+AUTO_RATIOS = (0.1, 0.25, 0.5, 1, 1.5, 2, 3, 4, 5, 7, 10, 15, 20)
+
+
+def _entropy_ratio(distances, ratios=AUTO_RATIOS, default=2, rows=256, seed=0):
+    '''
+    ratio='auto': the candidate ratio whose cutoff minimizes the entropy of the Gaussian potential
+    phi_i = sum_j exp(-(d_ij/sigma)^2), sigma = dc*sqrt(2)/3 (the potential is uniform, i.e. of maximal
+    entropy, for both a tiny and a huge dc, and most uneven at the scale of the clusters). phi is
+    estimated on a few random rows of the distance matrix, sorted once, so every candidate only touches
+    the distances below its 3*sigma. A candidate whose cutoff is 0 (duplicate points) has no Gaussian
+    scale and is skipped. When the entropy has no minimum inside the range of the remaining candidates
+    the default ratio is kept.
+    '''
+    Num = distances.num
+    if Num < 3:
+        return default
+    S = min(Num, rows)
+    sample = np.sort(np.random.RandomState(seed).choice(Num, S, replace=False))
+    dis = distances.rows(sample)
+    dis[np.arange(S), sample] = np.inf
+    dis.sort(axis=1)
+    column_min = dis.min(axis=0)  # rows are sorted: the prefix below t is column_min < t
+    index = np.minimum(np.round(np.asarray(ratios) / 100 * (Num - 2)).astype(np.intp), Num - 2)
+    entropy = np.full(len(ratios), np.nan)
+    for c, dc in enumerate(np.median(dis[:, index], axis=0)):
+        sigma = dc * math.sqrt(2) / 3
+        if not sigma > 0:
+            continue
+        part = dis[:, :max(1, np.searchsorted(column_min, 3 * sigma))]
+        # clipped at 3*sigma before dividing, so the masked-out distances cannot overflow
+        phi = 1 + np.where(part < 3 * sigma, np.exp(-(np.minimum(part, 3 * sigma) / sigma) ** 2), 0).sum(axis=1)
+        phi /= phi.sum()
+        entropy[c] = -(phi * np.log(phi)).sum()
+    valid = np.flatnonzero(np.isfinite(entropy))
+    if valid.shape[0] < 3:
+        return default
+    best = valid[np.argmin(entropy[valid])]
+    if best == valid[0] or best == valid[-1]:
+        return default
+    return ratios[best]
+
+
+def _gamma_gap(gamma, kmax=None):
+    '''
+    k='auto': the centres are the gamma outliers, i.e. the points before the largest relative drop
+    gamma[i-1]/gamma[i] of the sorted gamma, searched for 2 <= k <= kmax (default max(10, 2*sqrt(N))).
+    '''
+    Num = gamma.shape[0]
+    if Num < 3:
+        return Num
+    kmax = min(Num - 1, kmax or max(10, int(2 * math.sqrt(Num))))
+    g = np.sort(gamma)[::-1][:kmax + 1].astype(np.float64)
+    g = g[:max(2, np.count_nonzero(g > 0))]
+    if g.shape[0] < 3:
+        return g.shape[0]
+    return int(np.argmax(g[1:-1] / g[2:])) + 2
+
+
+def _nearest_higher(distances, density_index, maxd, positions=None):
+    '''
+    delta and nneigh as computed by DPC_naive: for the point at position i of density_index, the
+    closest point among positions 0..i-1. The original keeps the running minimum in a float32 array,
+    so when several candidates lie within float32 precision of the minimum the original scan is
+    replayed over just those candidates to pick the same neighbour. Only the given (sorted) positions
+    are computed, 1..N-1 by default; the result is aligned with them.
+    '''
+    Num = distances.num
+    block = distances.block
+    if positions is None:
+        positions = np.arange(1, Num)
+    maxd32 = np.float32(maxd)
+    delta = np.zeros(positions.shape[0], dtype=np.float32)
+    nneigh = np.zeros(positions.shape[0], dtype=np.int32)
+    for c0 in range(0, positions.shape[0], block):
+        pos = positions[c0:c0 + block]
+        b1 = pos[-1] + 1
+        dis = distances.rows(density_index[pos], density_index[:b1])
+        dis[np.arange(b1)[None, :] >= pos[:, None]] = np.inf
+        nearest = dis.argmin(axis=1)
+        mind = dis[np.arange(pos.shape[0]), nearest]
+        found = mind < maxd32
+        d = np.where(found, mind, maxd32).astype(np.float32)
+        n = np.where(found, density_index[nearest], 0).astype(np.int32)
+
+        tol = 8 * np.spacing(mind.astype(np.float32)).astype(np.float64)
+        near = dis <= (mind + tol)[:, None]
+        for r in np.flatnonzero(near.sum(axis=1) > 1):
+            best_d, best_n = maxd32, 0
+            for j in np.flatnonzero(near[r]):
+                if dis[r, j] < best_d:
+                    best_d, best_n = np.float32(dis[r, j]), density_index[j]
+            d[r], n[r] = best_d, best_n
+        delta[c0:c0 + block] = d
+        nneigh[c0:c0 + block] = n
+    return delta, nneigh
+
+
+def _assign(density, delta, nneigh, density_index, k):
+    gamma = density*delta
+    gamma_index = np.argsort(-gamma, kind='stable')
+    if k == 'auto':
+        k = _gamma_gap(gamma)
+    return _propagate(gamma_index[:k], nneigh, density_index)
+
+
+def _propagate(centers, nneigh, density_index):
+    Num = density_index.shape[0]
+    cl = np.ones(Num, dtype=np.int32)
+    cl *= -1
+    for i in range(len(centers)):
+        cl[centers[i]] = i + 1  # 第i+1个簇的簇心
+    for i in range(Num):
+        if cl[density_index[i]] == -1:
+            cl[density_index[i]] = cl[nneigh[density_index[i]]]
+    return cl
+
+
+def _share(array):
+    '''copy array into a new shared memory block; returns the block and the (name, shape, dtype) to attach it'''
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+    return shm, (shm.name, array.shape, array.dtype.str)
+
+
+_attached = {}
+
+
+def _attach(shared):
+    '''the array of a shared memory block in a worker process, attached once per process'''
+    name, shape, dtype = shared
+    if name not in _attached:
+        shm = shared_memory.SharedMemory(name=name)
+        _attached[name] = (shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf))
+    return _attached[name][1]
+
+
+def _band_task(shared, block, starts, lo, hi):
+    return _band_pass(PairwiseDistances(_attach(shared), block=block, knn_only=True), starts, lo, hi)
+
+
+def _density_task(shared, block, radius, rows):
+    return PairwiseDistances(_attach(shared), block=block, knn_only=True).count_within(radius, rows=rows)
+
+
+def _delta_task(shared, shared_index, block, maxd, positions):
+    distances = PairwiseDistances(_attach(shared), block=block, knn_only=True)
+    return _nearest_higher(distances, _attach(shared_index), maxd, positions)
+
+
+def _resolve_n_jobs(n_jobs):
+    '''number of processes: None means 1, a negative n_jobs counts back from all cores (-1: all, -2: all but one)'''
+    if n_jobs is None:
+        return 1
+    if n_jobs < 0:
+        return max(1, (os.cpu_count() or 1) + 1 + n_jobs)
+    return max(1, int(n_jobs))
+
+
+def _fit_parallel(distances, ratio, cutoff, n_jobs):
+    '''
+    The cutoff, density and delta/nneigh of DensityPeaks.fit() on a process pool. The data (and later the
+    density order) is put in shared memory once; the upper-triangle pass and the density are split into
+    contiguous row shards, the nearest-higher search into row blocks dealt out round robin (a block at
+    position i costs O(i), so this balances the shards). Every row is computed by the same code as in the
+    serial path and the shards are merged in a fixed order, so the results are bit-identical.
+    '''
+    Num = distances.num
+    block = distances.block
+    shm, shared = _share(distances.data)
+    shm_index = None
+    try:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            starts = np.array_split(np.arange(0, Num, block), n_jobs)
+
+            def band_pass(lo, hi):
+                parts = list(pool.map(_band_task, *zip(*[(shared, block, s, lo, hi) for s in starts])))
+                return (sum(p[0] for p in parts), np.concatenate([p[1] for p in parts]), max(p[2] for p in parts))
+
+            if cutoff is None:
+                area, maxd = _cutoff_distance(distances, ratio, band_pass=band_pass)
+            else:
+                area, maxd = cutoff, distances.max()
+            shards = np.array_split(np.arange(Num), n_jobs)
+            density = np.concatenate(list(pool.map(_density_task, *zip(*[(shared, block, area, r) for r in shards]))))
+
+            density_index = np.argsort(-density, kind='stable')
+            shm_index, shared_index = _share(density_index)
+            chunks = [np.arange(c0, min(c0 + block, Num)) for c0 in range(1, Num, block)]
+            positions = [np.concatenate(chunks[w::n_jobs] or [np.empty(0, dtype=np.intp)]) for w in range(n_jobs)]
+            delta = np.zeros(Num, dtype=np.float32)
+            nneigh = np.zeros(Num, dtype=np.int32)
+            tasks = [(shared, shared_index, block, maxd, p) for p in positions]
+            for p, (d, n) in zip(positions, pool.map(_delta_task, *zip(*tasks))):
+                delta[density_index[p]], nneigh[density_index[p]] = d, n
+    finally:
+        for s in (shm, shm_index):
+            if s is not None:
+                s.close()
+                s.unlink()
+    return area, maxd, density, density_index, delta, nneigh
+
+
+class DensityPeaks:
+    '''
+    DPC as a model: fit() computes the cutoff, density, delta and nneigh once, after which labels() only
+    re-runs the O(N) assignment, so the number of clusters (or the centres themselves) can be picked from
+    the decision graph without touching the distances again.
+
+    partial_fit(batch) adds points to a fitted model without refitting. The cutoff is frozen at the value
+    of the first fit on at least two points (until then every batch refits, as one point has no cutoff
+    distance), so the result is the same as DensityPeaks(cutoff=model.area).fit() on all points in
+    the order they were added: the new points go into a KD-tree forest, only the points within the cutoff
+    of a new point gain density, delta/nneigh are recomputed only for points that have a changed point
+    inside their delta ball, and labels() then relabels only the nneigh subtrees below changed points.
+
+    Parameters
+    ----------
+    ratio: the cutoff distance is the ratio% quantile of all pairwise distances; 'auto' picks it from
+           AUTO_RATIOS by the entropy of the data potential (see _entropy_ratio)
+    block: rows per distance block (default: about 64 MB of float64 per block)
+    distances: a PairwiseDistances of the data passed to fit() to reuse
+    cutoff: use this cutoff distance instead of the ratio% quantile
+    n_jobs: processes for fit() (negative: all cores + 1 + n_jobs, so -1 is all cores); only used for exact distances computed on the fly and
+            more points than one block, the result is the same as with one process
+
+    Attributes after fit()
+    ----------
+    area: cutoff distance; dc_ratio: the ratio it was taken at; maxd: largest pairwise distance
+    rho: cut-off density; delta: distance to the nearest higher-density point; gamma: rho*delta
+    nneigh: the nearest higher-density point; density_index: points by decreasing density
+    '''
+
+    def __init__(self, ratio=2, block=None, distances=None, cutoff=None, n_jobs=None):
+        self.ratio = ratio
+        self.block = block
+        self.distances = distances
+        self.cutoff = cutoff
+        self.n_jobs = n_jobs
+
+    def fit(self, data):
+        distances = self.distances
+        if distances is None:
+            distances = PairwiseDistances(data, block=self.block, knn_only=True)
+        self.data = distances.data
+        self.dc_ratio = self.ratio
+        if self.cutoff is None and self.ratio == 'auto':
+            self.dc_ratio = _entropy_ratio(distances)
+        n_jobs = _resolve_n_jobs(self.n_jobs)
+        if n_jobs > 1 and distances.num > distances.block and distances.matrix is None and distances.backend == 'exact':
+            self.area, self.maxd, self.rho, self.density_index, self.delta, self.nneigh = \
+                _fit_parallel(distances, self.dc_ratio, self.cutoff, n_jobs)
+        else:
+            if self.cutoff is None:
+                self.area, self.maxd = _cutoff_distance(distances, self.dc_ratio)
+            else:
+                self.area, self.maxd = self.cutoff, distances.max()
+            # 求密度(剪切密度)
+            self.rho = distances.count_within(self.area)
+            self.density_index = np.argsort(-self.rho, kind='stable')
+            self.delta = np.zeros(self.data.shape[0], dtype=np.float32)
+            self.nneigh = np.zeros(self.data.shape[0], dtype=np.int32)
+            self.delta[self.density_index[1:]], self.nneigh[self.density_index[1:]] = \
+                _nearest_higher(distances, self.density_index, self.maxd)
+        self._finish()
+        self._trees = None
+        self._labels = None
+        return self
+
+    def _finish(self):
+        top = self.density_index[0]
+        self.delta[top] = -1.
+        self.delta[top] = self.delta.max()
+        self.nneigh[top] = 0
+        self.gamma = self.rho*self.delta
+        self.gamma_index = np.argsort(-self.gamma, kind='stable')
+
+    def _insert(self, start, end):
+        # logarithmic method: the trees cover consecutive index ranges of decreasing size, and a new
+        # range is merged with every tree not larger than it, so each point is rebuilt O(log N) times
+        if self._trees is None:
+            self._trees = [(0, cKDTree(self.data[:start]))] if start else []
+        while self._trees and self._trees[-1][1].n <= end - start:
+            start = self._trees.pop()[0]
+        self._trees.append((start, cKDTree(self.data[start:end])))
+
+    def partial_fit(self, batch):
+        '''Add the points of batch (indices N, N+1, ... in order) to the fitted model.'''
+        batch = np.asarray(batch, dtype=np.float64)
+        if not hasattr(self, 'rho'):
+            return self.fit(batch)
+        if self.cutoff is None and self.data.shape[0] < 2:
+            return self.fit(np.concatenate([self.data, batch]))
+        if batch.shape[0] == 0:
+            return self
+        n0 = self.data.shape[0]
+        self.data = np.concatenate([self.data, batch])
+        Num = self.data.shape[0]
+        new = np.arange(n0, Num)
+        self._insert(n0, Num)
+        distances = PairwiseDistances(self.data, block=self.block, knn_only=True)
+
+        # density: only pairs with a new point change; the tree gives candidates, cdist decides as in fit()
+        rho = np.zeros(Num, dtype=np.int32)
+        rho[:n0] = self.rho
+        for start, tree in self._trees:
+            for p, cand in zip(new, tree.query_ball_point(batch, self.area * (1 + 1e-9))):
+                cand = np.asarray(cand, dtype=np.intp) + start
+                dis = scipy.spatial.distance.cdist(self.data[p:p + 1], self.data[cand])[0]
+                inside = cand[(dis < self.area) & (cand != p)]
+                rho[p] += inside.shape[0]
+                np.add.at(rho, inside[inside < n0], 1)
+        moved = np.concatenate([rho[:n0] != self.rho, np.ones(Num - n0, dtype=bool)])
+        maxd = max(self.maxd, max(dis.max() for _, dis in distances.blocks(new)))
+        old_rank = np.empty(n0, dtype=np.intp)
+        old_rank[self.density_index] = np.arange(n0)
+        old_top = self.density_index[0]
+        self.rho = rho
+        self.density_index = np.argsort(-rho, kind='stable')
+        rank = np.empty(Num, dtype=np.intp)
+        rank[self.density_index] = np.arange(Num)
+
+        # delta/nneigh of a point only change if a point inside its delta ball is new or moved past it in
+        # the density order, or (float32 ties) moved at the rim of the ball; the old top's delta was
+        # only a placeholder
+        affected = np.concatenate([np.zeros(n0, dtype=bool), np.ones(Num - n0, dtype=bool)])
+        affected[old_top] = True
+        if maxd > self.maxd:
+            affected[:n0] |= self.delta >= np.float32(self.maxd)
+        check = np.flatnonzero(~affected)
+        radius = self.delta[check].astype(np.float64) * (1 + 4e-6)
+        for c0 in range(0, check.shape[0], 4096):
+            rows, r = check[c0:c0 + 4096], radius[c0:c0 + 4096]
+            ties = np.zeros(rows.shape[0], dtype=np.intp)
+            rim_moved = np.zeros(rows.shape[0], dtype=bool)
+            for start, tree in self._trees:
+                found = tree.query_ball_point(self.data[rows], r)
+                lengths = np.fromiter(map(len, found), dtype=np.intp, count=rows.shape[0])
+                j = np.fromiter(itertools.chain.from_iterable(found), dtype=np.intp, count=lengths.sum()) + start
+                row = np.repeat(np.arange(rows.shape[0]), lengths)
+                i = rows[row]
+                was_higher = (j < n0) & (old_rank[np.minimum(j, n0 - 1)] < old_rank[i])
+                is_higher = rank[j] < rank[i]
+                affected[i[is_higher != was_higher]] = True
+                rim = np.sqrt(((self.data[i] - self.data[j]) ** 2).sum(axis=1)) >= r[row] * (1 - 1e-5)
+                ties += np.bincount(row[rim & is_higher], minlength=rows.shape[0])
+                rim_moved[row[rim & moved[j]]] = True
+            affected[rows[(ties > 1) & rim_moved]] = True
+        self.maxd = maxd
+
+        positions = np.sort(rank[affected])
+        positions = positions[positions > 0]
+        delta, nneigh = self._nearest_higher(distances, rank, positions)
+        self.delta = np.concatenate([self.delta, np.zeros(Num - n0, dtype=np.float32)])
+        old_nneigh = np.concatenate([self.nneigh, np.full(Num - n0, -1, dtype=np.int32)])
+        self.nneigh = old_nneigh.copy()
+        self.delta[self.density_index[positions]] = delta
+        self.nneigh[self.density_index[positions]] = nneigh
+        self._finish()
+        if self._labels is not None:
+            self._labels[2] = np.concatenate([self._labels[2], np.ones(Num - n0, dtype=bool)])
+            self._labels[2] |= self.nneigh != old_nneigh
+        return self
+
+    def _nearest_higher(self, distances, rank, positions):
+        '''
+        _nearest_higher() for a few positions, searched in the KD-tree forest: kNN queries give an upper
+        bound of the distance to the nearest denser point, a ball query just beyond it gives every
+        candidate, and the float32 scan of _nearest_higher() is replayed over those candidates. Points
+        without a denser point among their first N/4 neighbours fall back to the blocked scan.
+        '''
+        data = self.data
+        Num = data.shape[0]
+        maxd32 = np.float32(self.maxd)
+        points = self.density_index[positions]
+        delta = np.zeros(points.shape[0], dtype=np.float32)
+        nneigh = np.zeros(points.shape[0], dtype=np.int32)
+        bound = np.full(points.shape[0], np.inf)
+        todo = np.arange(points.shape[0])
+        K = 16
+        while todo.size and K < Num:
+            for start, tree in self._trees:
+                d, i = tree.query(data[points[todo]], k=min(K, tree.n))
+                d, i = d.reshape(todo.shape[0], -1), i.reshape(todo.shape[0], -1) + start
+                d[rank[i] >= rank[points[todo]][:, None]] = np.inf
+                bound[todo] = np.minimum(bound[todo], d.min(axis=1))
+            todo = todo[np.isinf(bound[todo])]
+            K *= 4
+        if todo.size:
+            delta[todo], nneigh[todo] = _nearest_higher(distances, self.density_index, self.maxd, positions[todo])
+
+        rows = np.flatnonzero(np.isfinite(bound))
+        cands = [[] for _ in rows]
+        for start, tree in self._trees:
+            for c, found in zip(cands, tree.query_ball_point(data[points[rows]], bound[rows] * (1 + 4e-6))):
+                c.append(np.asarray(found, dtype=np.intp) + start)
+        for r, c in zip(rows, cands):
+            p = points[r]
+            cand = np.concatenate(c)
+            cand = cand[rank[cand] < rank[p]]
+            cand = cand[np.argsort(rank[cand])]  # scanned in density order, as in the blocked search
+            dis = scipy.spatial.distance.cdist(data[p:p + 1], data[cand])[0]
+            nearest = dis.argmin()
+            mind = dis[nearest]
+            if mind < maxd32:
+                delta[r], nneigh[r] = mind, cand[nearest]
+            else:
+                delta[r], nneigh[r] = maxd32, 0
+            near = np.flatnonzero(dis <= mind + 8 * np.float64(np.spacing(np.float32(mind))))
+            if near.shape[0] > 1:
+                best_d, best_n = maxd32, 0
+                for j in near:
+                    if dis[j] < best_d:
+                        best_d, best_n = np.float32(dis[j]), cand[j]
+                delta[r], nneigh[r] = best_d, best_n
+        return delta, nneigh
+
+    def centers(self, k):
+        '''
+        The k points of largest gamma, i.e. the centres DPC picks for k clusters; k='auto' takes the
+        points before the largest drop of the sorted gamma (see _gamma_gap).
+        '''
+        if k == 'auto':
+            k = _gamma_gap(self.gamma)
+        return self.gamma_index[:k]
+
+    def labels(self, k=None, centers=None):
+        '''
+        Cluster label (1..k) of every point, with the k centres of largest gamma (k='auto': the gamma
+        outliers), or with the given centres (indices of points, labelled 1, 2, ... in that order).
+        '''
+        if centers is None:
+            if k is None:
+                raise ValueError('labels() needs either k or centers')
+            centers = self.centers(k)
+        centers = np.asarray(centers)
+        Num = self.density_index.shape[0]
+        top = self.density_index[0]
+        if self._labels is None or top not in centers:
+            cl = _propagate(centers, self.nneigh, self.density_index)
+        else:
+            old_centers, cl, dirty = self._labels
+            cl = np.concatenate([cl, np.full(Num - cl.shape[0], -1, dtype=np.int32)])
+            number = np.zeros(Num, dtype=np.int32)
+            number[centers] = np.arange(1, centers.shape[0] + 1)
+            old_number = np.zeros(Num, dtype=np.int32)
+            old_number[old_centers] = np.arange(1, old_centers.shape[0] + 1)
+            dirty = dirty | (number != old_number)
+            # everything below a dirty point in the nneigh forest is relabelled, in density order
+            parent = np.where(np.arange(Num) == top, -1, self.nneigh)
+            order = np.argsort(parent, kind='stable')
+            first = np.searchsorted(parent[order], np.arange(Num + 1))
+            frontier = np.flatnonzero(dirty)
+            while frontier.size:
+                lengths = first[frontier + 1] - first[frontier]
+                children = order[np.repeat(first[frontier + 1] - lengths.cumsum(), lengths) + np.arange(lengths.sum())]
+                children = children[~dirty[children]]
+                dirty[children] = True
+                frontier = children
+            rank = np.empty(Num, dtype=np.intp)
+            rank[self.density_index] = np.arange(Num)
+            for i in self.density_index[np.sort(rank[dirty])]:
+                cl[i] = number[i] if number[i] else cl[self.nneigh[i]]
+        self._labels = [centers.copy(), cl.copy(), np.zeros(Num, dtype=bool)]
+        return cl
+
+
+def DPC(data, k, ratio=2, block=None, distances=None, n_jobs=None):
+    '''
+    Vectorized DPC with the same output as DPC_naive.
+
+    Parameters
+    ----------
+    data: (N, d) array
+    k: number of cluster centres, or 'auto' to take the gamma outliers
+    ratio: the cutoff distance is the ratio% quantile of all pairwise distances, or 'auto'
+    block: rows per distance block (default: about 64 MB of float64 per block)
+    distances: a PairwiseDistances of data to reuse (e.g. one shared with the HIAC stages); by default
+               distance blocks are computed on the fly and never stored
+    n_jobs: processes for the cutoff, density and delta passes (-1: all cores, -2: all but one, ...);
+            labels are identical
+
+    Returns: cluster label (1..k) of every point
+    -------
+    '''
+    return DensityPeaks(ratio, block, distances, n_jobs=n_jobs).fit(data).labels(k)
+
+
+def DPC_knn(data, k, n_neighbors=None, block=65536):
+    '''
+    Large-data DPC: the cut-off density is replaced by a kNN density, rho = exp(-r / mean(r)) with r the
+    mean distance to the n_neighbors nearest points, so no global radius count is needed. The nearest
+    higher-density point of most points is already in their kNN list; the rest are queried again with
+    4x more neighbours until found, and only the few remaining peaks fall back to a scan of all denser
+    points. float32 input is kept as float32 for the neighbour distances.
+
+    Parameters
+    ----------
+    data: (N, d) array
+    k: number of cluster centres, or 'auto'
+    n_neighbors: neighbours for the density (default 2% of N, clipped to 8..32)
+    block: points per KD-tree query block
+
+    Returns: cluster label (1..k) of every point
+    -------
+    '''
+    data = np.asarray(data)
+    if data.dtype not in (np.float32, np.float64):
+        data = data.astype(np.float64)
+    Num = data.shape[0]
+    K = min(Num - 1, n_neighbors or max(8, min(32, round(0.02 * Num))))
+    tree = cKDTree(data)
+    dist = np.empty((Num, K + 1), dtype=data.dtype)
+    index = np.empty((Num, K + 1), dtype=np.int32 if Num < 2 ** 31 else np.int64)
+    for b0 in range(0, Num, block):
+        dist[b0:b0 + block], index[b0:b0 + block] = tree.query(data[b0:b0 + block], k=K + 1)
+    r = dist[:, 1:].mean(axis=1, dtype=np.float64)
+    density = np.exp(-r / max(r.mean(), np.finfo(np.float64).tiny))
+    density_index = np.argsort(-density, kind='stable')
+    rank = np.empty(Num, dtype=np.int64)
+    rank[density_index] = np.arange(Num)
+
+    # the first neighbour of higher density in a distance-sorted kNN list is the nearest one overall
+    delta = np.zeros(Num, dtype=np.float64)
+    nneigh = np.zeros(Num, dtype=np.int64)
+    todo = np.arange(Num)
+    K_query = K + 1
+    while True:
+        if K_query == K + 1:
+            d, i = dist, index
+        else:
+            d, i = tree.query(data[todo], k=K_query)
+        higher = rank[i] < rank[todo][:, None]
+        found = higher.any(axis=1)
+        first = higher.argmax(axis=1)
+        rows = np.arange(todo.shape[0])
+        delta[todo[found]] = d[rows, first][found]
+        nneigh[todo[found]] = i[rows, first][found]
+        todo = todo[~found & (rank[todo] > 0)]
+        K_query *= 4
+        if todo.size == 0 or K_query >= Num:
+            break
+    for p in todo:  # peaks with no denser point nearby: scan all denser points
+        cand = density_index[:rank[p]]
+        dis = scipy.spatial.distance.cdist(data[p:p + 1].astype(np.float64), data[cand].astype(np.float64))[0]
+        delta[p] = dis.min()
+        nneigh[p] = cand[dis.argmin()]
+    delta[density_index[0]] = -1.
+    delta[density_index[0]] = delta.max()
+    nneigh[density_index[0]] = 0
+    return _assign(density, delta, nneigh, density_index, k)
+
+
+def DPC_naive(data, k):
 
     Num = data.shape[0]
     ratio = 2
@@ -73,4 +713,3 @@ def DPC(data, k):
             cl[density_index[i]] = cl[nneigh[density_index[i]]]
 
     return cl
-
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""Benchmark the vectorized DPC against the original double-loop implementation.
+
+For every dataset both versions are run with the true number of clusters, the wall times are printed
+and the labels are checked to be identical. The quadratic reference is skipped above --naive-max points.
+
+With --n-jobs the parallel DPC is timed instead, for every given number of processes, and the speedup
+over one process is reported together with a check that the labels are identical:
+
+    python benchmark_dpc.py T7.10k.txt --synthetic 100000 --n-jobs 1 2 4 8 16 32
+
+With --knn the approximate DPC_knn is compared with the exact DPC: wall time and peak memory of each (every
+run in a fresh worker process, the peak is its RSS growth during the call) and the ARI of DPC_knn against
+the exact labels and against the true labels. The exact DPC is skipped above --exact-max points:
+
+    python benchmark_dpc.py --knn --synthetic 1000000
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import time
+import numpy as np
+from sklearn.metrics import adjusted_rand_score
+
+from DPC import DPC, DPC_knn, DPC_naive
+from run_dpc_experiments import DATA_DIR, load_shape_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('datasets', nargs='*', default=['R15.txt', 'Aggregation.txt', 'flame.txt', 'T7.10k.txt'])
+    parser.add_argument('--naive-max', type=int, default=4000, help='skip DPC_naive on larger datasets')
+    parser.add_argument('--n-jobs', type=int, nargs='*', help='time the parallel DPC with these numbers of processes')
+    parser.add_argument('--synthetic', type=int, default=0, help='also run on N points from 20 2-D Gaussian clusters')
+    parser.add_argument('--knn', action='store_true', help='compare DPC_knn with the exact DPC')
+    parser.add_argument('--exact-max', type=int, default=50000, help='skip the exact DPC on larger datasets (--knn)')
+    args = parser.parse_args()
+    if args.n_jobs:
+        return scaling(args)
+    if args.knn:
+        return knn(args)
+
+    print(f"{'dataset':<16}{'N':>8}{'naive (s)':>12}{'vectorized (s)':>16}{'speedup':>10}  labels")
+    for fname in args.datasets:
+        X, labels = load_shape_file(os.path.join(DATA_DIR, fname))
+        k = len(np.unique(labels)) if labels is not None else 3
+
+        t0 = time.perf_counter()
+        fast = DPC(X, k)
+        t_fast = time.perf_counter() - t0
+
+        if X.shape[0] <= args.naive_max:
+            t0 = time.perf_counter()
+            ref = DPC_naive(X, k)
+            t_naive = time.perf_counter() - t0
+            same = 'identical' if np.array_equal(ref, fast) else 'DIFFERENT'
+            print(f'{fname:<16}{X.shape[0]:>8}{t_naive:>12.2f}{t_fast:>16.3f}{t_naive / t_fast:>9.0f}x  {same}')
+        else:
+            print(f"{fname:<16}{X.shape[0]:>8}{'-':>12}{t_fast:>16.3f}{'-':>10}  (reference skipped)")
+
+
+def load(fname, synthetic=0):
+    if fname.startswith('synthetic'):
+        rng = np.random.RandomState(0)
+        labels = rng.randint(0, 20, synthetic)
+        return rng.uniform(0, 100, (20, 2))[labels] + rng.normal(0, 3, (synthetic, 2)), labels
+    return load_shape_file(os.path.join(DATA_DIR, fname))
+
+
+def scaling(args):
+    datasets = args.datasets + (['synthetic%d' % args.synthetic] if args.synthetic else [])
+    print(f"{'dataset':<18}{'N':>8}{'n_jobs':>8}{'time (s)':>10}{'speedup':>9}  labels")
+    for fname in datasets:
+        X, labels = load(fname, args.synthetic)
+        k = len(np.unique(labels)) if labels is not None else 3
+        ref = t_ref = None
+        for n_jobs in args.n_jobs:
+            t0 = time.perf_counter()
+            res = DPC(X, k, n_jobs=n_jobs)
+            elapsed = time.perf_counter() - t0
+            if ref is None:
+                ref, t_ref = res, elapsed
+            same = 'identical' if np.array_equal(ref, res) else 'DIFFERENT'
+            print(f'{fname:<18}{X.shape[0]:>8}{n_jobs:>8}{elapsed:>10.2f}{t_ref / elapsed:>8.2f}x  {same}')
+
+
+
+def _measured(fn, X, k):
+    # runs in a fresh worker: its RSS before the call already holds the interpreter and the data
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    t0 = time.perf_counter()
+    res = fn(X, k)
+    elapsed = time.perf_counter() - t0
+    return res, elapsed, (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before) / 1024
+
+
+def measured(fn, X, k):
+    '''(labels, seconds, peak MB) of fn(X, k) in a fresh process'''
+    with multiprocessing.Pool(1, maxtasksperchild=1) as pool:
+        return pool.apply(_measured, (fn, X, k))
+
+
+def knn(args):
+    datasets = args.datasets + (['synthetic%d' % args.synthetic] if args.synthetic else [])
+    print(f"{'dataset':<18}{'N':>9}{'exact (s)':>11}{'exact MB':>10}{'knn (s)':>9}{'knn MB':>8}"
+          f"{'ARI vs exact':>14}{'ARI vs truth':>14}{'exact vs truth':>16}")
+    for fname in datasets:
+        X, labels = load(fname, args.synthetic)
+        k = len(np.unique(labels)) if labels is not None else 3
+        approx, t_knn, mb_knn = measured(DPC_knn, X, k)
+        truth = f'{adjusted_rand_score(labels, approx):>14.3f}' if labels is not None else f"{'-':>14}"
+        if X.shape[0] <= args.exact_max:
+            exact, t_exact, mb_exact = measured(DPC, X, k)
+            agree = adjusted_rand_score(exact, approx)
+            exact_truth = f'{adjusted_rand_score(labels, exact):>16.3f}' if labels is not None else f"{'-':>16}"
+            print(f'{fname:<18}{X.shape[0]:>9}{t_exact:>11.2f}{mb_exact:>10.0f}{t_knn:>9.2f}{mb_knn:>8.0f}'
+                  f'{agree:>14.3f}{truth}{exact_truth}')
+        else:
+            print(f"{fname:<18}{X.shape[0]:>9}{'-':>11}{'-':>10}{t_knn:>9.2f}{mb_knn:>8.0f}{'-':>14}{truth}{'-':>16}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+'''
+两两欧氏距离，按行分块计算一次，供 DPC 和 HIAC 的各个阶段共用。
+
+PairwiseDistances 可以把 N×N 距离矩阵存在内存或 np.memmap 文件里；knn_only=True 时不存矩阵，
+需要时按行块用 cdist 重新计算，只保留 k 近邻。各阶段只取自己需要的东西：行块、每行第 k 小的距离、
+k 近邻、半径内的邻居数。
+
+backend='approx' 用随机投影森林 + NN-descent 求近似 k 近邻（n_trees 控制召回率），
+第 k 小距离、半径内邻居数和最大距离用随机抽样的列估计，整个过程是次二次的。
+'''
+import numpy as np
+import scipy.spatial.distance
+from scipy.spatial import ConvexHull, QhullError, cKDTree
+
+
+def _block_rows(Num, block_bytes=64 * 2 ** 20):
+    # rows per distance block so that one float64 block stays around block_bytes
+    return max(1, int(block_bytes // (8 * max(Num, 1))))
+
+
+def _pair_distances(data, rows, cand):
+    '''distances from data[rows[i]] to data[cand[i, j]], (len(rows), cand.shape[1])'''
+    out = np.empty(cand.shape)
+    step = max(1, 4000000 // max(1, cand.shape[1] * data.shape[1]))
+    for b0 in range(0, rows.shape[0], step):
+        diff = data[cand[b0:b0 + step]] - data[rows[b0:b0 + step], None, :]
+        out[b0:b0 + step] = np.sqrt(np.einsum('ijk,ijk->ij', diff, diff))
+    return out
+
+
+def _merge_nearest(index, dist, m):
+    '''the m nearest distinct candidates of every row, sorted by distance then index'''
+    order = np.argsort(index, axis=1, kind='stable')
+    index = np.take_along_axis(index, order, axis=1)
+    dist = np.take_along_axis(dist, order, axis=1)
+    dist[:, 1:][index[:, 1:] == index[:, :-1]] = np.inf  # drop repeated candidates
+    if index.shape[1] > m:
+        part = np.argpartition(dist, m - 1, axis=1)[:, :m]
+        index = np.take_along_axis(index, part, axis=1)
+        dist = np.take_along_axis(dist, part, axis=1)
+    order = np.lexsort((index, dist), axis=1)
+    return np.take_along_axis(index, order, axis=1), np.take_along_axis(dist, order, axis=1)
+
+
+def _rp_tree_leaves(data, leaf_size, rng):
+    '''
+    leaf id of every point in one random projection tree: every node larger than leaf_size is split at
+    the median of the projection on a random direction, one tree level at a time for all nodes
+    '''
+    Num = data.shape[0]
+    node = np.zeros(Num, dtype=np.intp)
+    n_nodes = 1
+    while True:
+        sizes = np.bincount(node, minlength=n_nodes)
+        split = sizes > leaf_size
+        if not split.any():
+            return node
+        direction = rng.standard_normal((n_nodes, data.shape[1]))
+        proj = np.empty(Num)
+        step = max(1, 4000000 // data.shape[1])
+        for b0 in range(0, Num, step):
+            proj[b0:b0 + step] = np.einsum('ij,ij->i', data[b0:b0 + step], direction[node[b0:b0 + step]])
+        order = np.lexsort((proj, node))
+        start = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+        rank = np.empty(Num, dtype=np.intp)
+        rank[order] = np.arange(Num) - start[node[order]]
+        right = np.full(n_nodes, -1)
+        right[split] = n_nodes + np.arange(split.sum())
+        move = split[node] & (rank >= sizes[node] // 2)
+        node[move] = right[node[move]]
+        n_nodes += int(split.sum())
+
+
+def _leaf_neighbors(data, leaves, m):
+    '''the m nearest points of every point among the members of its leaf: (index, dist), -1/inf padded'''
+    Num = data.shape[0]
+    order = np.argsort(leaves, kind='stable')
+    sizes = np.bincount(leaves)
+    width = sizes.max()
+    start = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    members = np.full((sizes.shape[0], width), -1)
+    slot = np.arange(Num) - start[leaves[order]]
+    members[leaves[order], slot] = order
+    index = np.full((Num, m), -1)
+    dist = np.full((Num, m), np.inf)
+    step = max(1, 4000000 // (width * max(width, data.shape[1])))
+    for b0 in range(0, members.shape[0], step):
+        block = members[b0:b0 + step]
+        pts = data[np.maximum(block, 0)]
+        sq = np.einsum('ijk,ijk->ij', pts, pts)
+        d2 = sq[:, :, None] + sq[:, None, :] - 2 * np.matmul(pts, pts.transpose(0, 2, 1))
+        d2[np.broadcast_to(block[:, None, :] < 0, d2.shape)] = np.inf
+        owner = block.reshape(-1)
+        d2 = d2.reshape(-1, width)[owner >= 0]
+        cand = np.repeat(block, width, axis=0)[owner >= 0]
+        owner = owner[owner >= 0]
+        keep = min(m, width)
+        part = np.argpartition(d2, keep - 1, axis=1)[:, :keep]
+        index[owner, :keep] = np.take_along_axis(cand, part, axis=1)
+        dist[owner, :keep] = np.take_along_axis(d2, part, axis=1)
+    return index, dist
+
+
+def approximate_kneighbors(data, k, n_trees=8, leaf_size=None, n_iter=1, seed=0):
+    '''
+    Approximate k nearest neighbours without any O(N²) step.
+
+    Candidates come from the leaves of n_trees random projection trees, then n_iter NN-descent rounds
+    also try the neighbours of neighbours. More trees (or rounds) give higher recall. The returned
+    distances are exact for the pairs that were found.
+
+    Returns: (dist, index), both (N, k+1), sorted by distance, the point itself first
+    -------
+    '''
+    data = np.asarray(data, dtype=np.float64)
+    Num = data.shape[0]
+    m = min(k + 1, Num)
+    leaf_size = leaf_size or max(2 * m, 32)
+    rng = np.random.RandomState(seed)
+    index = np.empty((Num, 0), dtype=np.intp)
+    for _ in range(n_trees):
+        cand, _ = _leaf_neighbors(data, _rp_tree_leaves(data, leaf_size, rng), m)
+        index = np.concatenate([index, cand], axis=1)
+    rows = np.arange(Num)
+    index = np.where(index < 0, rows[:, None], index)
+    index, dist = _merge_nearest(index, _pair_distances(data, rows, index), m)
+    for _ in range(n_iter):
+        cand = np.concatenate([index, index[index].reshape(Num, -1)], axis=1)
+        index, dist = _merge_nearest(cand, _pair_distances(data, rows, cand), m)
+    return dist, index
+
+
+class PairwiseDistances:
+    '''
+    Euclidean distances of one dataset.
+
+    Parameters
+    ----------
+    data: (N, d) array
+    dtype: dtype of the stored matrix; float32 halves the memory, blocks are always returned as float64
+    block: rows per distance block (default: about 64 MB of float64 per block)
+    path: if given, the matrix is spilled to this .npy file as an np.memmap instead of RAM
+    knn_only: do not store the matrix at all; row blocks are recomputed with cdist when a stage needs
+              them and kneighbors() keeps only the k+1 nearest, so memory stays O(N·k + N·block)
+    backend: 'exact', or 'approx' for high-dimensional data: kneighbors() comes from
+             approximate_kneighbors() and row_kth(), count_within() and max() are estimated from
+             `sample` random columns, so no stage is quadratic (implies knn_only)
+    n_trees, leaf_size, n_iter: recall knobs of approximate_kneighbors()
+    sample: number of columns used by the 'approx' estimates
+    seed: random seed of the 'approx' backend
+    '''
+
+    def __init__(self, data, dtype=np.float64, block=None, path=None, knn_only=False, backend='exact',
+                 n_trees=8, leaf_size=None, n_iter=1, sample=2000, seed=0):
+        if backend not in ('exact', 'approx'):
+            raise ValueError("backend must be 'exact' or 'approx'")
+        self.data = np.asarray(data, dtype=np.float64)
+        self.num = self.data.shape[0]
+        self.block = block or _block_rows(self.num)
+        self.backend = backend
+        self.knn_only = knn_only or backend == 'approx'
+        self.approx = dict(n_trees=n_trees, leaf_size=leaf_size, n_iter=n_iter, seed=seed)
+        self.sample = sample
+        self.matrix = None
+        self._knn = None  # (k, dist, index) for the largest k asked so far
+        self._tree = None
+        if self.knn_only:
+            return
+        shape = (self.num, self.num)
+        if path is None:
+            self.matrix = np.empty(shape, dtype=dtype)
+        else:
+            self.matrix = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=shape)
+        # upper triangle block by block, mirrored into the lower one (euclidean distances are symmetric bit for bit)
+        for b0 in range(0, self.num, self.block):
+            b1 = min(b0 + self.block, self.num)
+            dis = scipy.spatial.distance.cdist(self.data[b0:b1], self.data[b0:])
+            self.matrix[b0:b1, b0:] = dis
+            self.matrix[b0:, b0:b1] = dis.T
+        if path is not None:
+            self.matrix.flush()
+
+    def rows(self, rows, cols=None):
+        '''distances (float64 copy) from the points in rows to the points in cols, all points by default'''
+        if self.matrix is not None:
+            dis = self.matrix[rows]
+            if cols is not None:
+                dis = dis[:, cols]
+            return np.array(dis, dtype=np.float64)
+        return scipy.spatial.distance.cdist(self.data[rows], self.data if cols is None else self.data[cols])
+
+    def blocks(self, rows=None, cols=None):
+        '''yield (row indices, distances of those rows to cols, all points by default) block by block'''
+        rows = np.arange(self.num) if rows is None else np.asarray(rows)
+        for b0 in range(0, rows.shape[0], self.block):
+            r = rows[b0:b0 + self.block]
+            yield r, self.rows(r, cols)
+
+    def pairs(self, i, j):
+        '''element-wise distances between data[i] and data[j] (broadcasting index arrays)'''
+        if self.matrix is not None:
+            return np.asarray(self.matrix[i, j], dtype=np.float64)
+        return np.sqrt(((self.data[i] - self.data[j]) ** 2).sum(axis=-1))
+
+    def tree(self):
+        '''the cKDTree of data, built on first use'''
+        if self._tree is None:
+            self._tree = cKDTree(self.data)
+        return self._tree
+
+    def _use_tree(self, tree_max_dim):
+        return self.matrix is None and self.data.shape[1] <= tree_max_dim
+
+    def _sampled(self):
+        '''the random columns used by the 'approx' estimates, or None when every column is used'''
+        if self.backend != 'approx' or self.sample >= self.num:
+            return None
+        return np.sort(np.random.RandomState(self.approx['seed']).choice(self.num, self.sample, replace=False))
+
+    def max(self):
+        '''the largest pairwise distance; in 2-D/3-D without a stored matrix only convex hull vertices are compared'''
+        if self._sampled() is not None:
+            # 'approx': farthest-point sweeps from a few random starts, a lower bound that is usually exact
+            best = 0.0
+            for start in np.random.RandomState(self.approx['seed']).choice(self.num, 4, replace=False):
+                for _ in range(4):
+                    dis = self.rows([start])[0]
+                    start = dis.argmax()
+                    best = max(best, dis[start])
+            return best
+        rows = None
+        if self.matrix is None and 2 <= self.data.shape[1] <= 3 and self.num > self.block:
+            try:
+                rows = ConvexHull(self.data).vertices  # the farthest pair is always on the hull
+            except QhullError:  # degenerate (e.g. collinear) data
+                rows = None
+        if rows is not None:
+            return max((scipy.spatial.distance.cdist(self.data[rows[b0:b0 + self.block]], self.data[rows]).max()
+                        for b0 in range(0, rows.shape[0], self.block)), default=0.0)
+        return max((dis.max() for _, dis in self.blocks()), default=0.0)
+
+    def row_kth(self, kth, tree_max_dim=8):
+        '''
+        the kth smallest distance in every row, i.e. np.sort(matrix, axis=1)[:, kth]; kth may also be a
+        sequence, which gives one column per entry from the same pass
+        '''
+        top = np.max(kth)
+        if self._knn is not None and self._knn[0] >= top:
+            return self._knn[1][:, kth].copy()
+        out = np.empty((self.num,) + np.shape(kth))
+        cols = self._sampled()
+        if cols is not None:
+            # 'approx': the same rank scaled to the sampled columns
+            rank = np.minimum(np.round(np.asarray(kth) * cols.shape[0] / self.num).astype(np.intp), cols.shape[0] - 1)
+            rank = np.maximum(rank, 1)
+            for r, dis in self.blocks(cols=cols):
+                out[r] = np.partition(dis, rank, axis=1)[:, rank]
+            return out
+        if self._use_tree(tree_max_dim) and 8 * (top + 1) <= self.num:
+            # few neighbours in low dimension: KD-tree queries instead of a full pass over every row
+            step = max(1, (self.block * self.num) // (top + 1))
+            for b0 in range(0, self.num, step):
+                dis, _ = self.tree().query(self.data[b0:b0 + step], k=top + 1)
+                out[b0:b0 + step] = dis.reshape(-1, top + 1)[:, kth]
+            return out
+        for r, dis in self.blocks():
+            out[r] = np.partition(dis, kth, axis=1)[:, kth]
+        return out
+
+    def kneighbors(self, k, tree_max_dim=8):
+        '''
+        (dist, index), both (N, k+1): the k+1 nearest points of every point sorted by distance, so column 0
+        is the point itself (or a duplicate of it), in the same order as np.argsort(matrix, axis=1)[:, :k+1].
+        With a stored matrix the rows are fully argsorted. In knn_only mode the k+2 nearest are selected (by
+        KD-tree queries for low-dimensional data); np.argsort is not stable, so its order among equal
+        distances depends on the whole row, and the rows with a tie among those k+2 are argsorted in full.
+        '''
+        if self._knn is not None and self._knn[0] >= k:
+            return self._knn[1][:, :k + 1], self._knn[2][:, :k + 1]
+        if self.backend == 'approx':
+            dist, index = approximate_kneighbors(self.data, k, **self.approx)
+            self._knn = (k, dist, index)
+            return dist, index
+        m = min(k + 1, self.num)
+        fetch = min(m + 1, self.num)  # one more, to see a tie across the cut
+        dist = np.empty((self.num, m))
+        index = np.empty((self.num, m), dtype=np.intp)
+        if self._use_tree(tree_max_dim):
+            step = max(1, (self.block * self.num) // fetch)
+            tied = []
+            for b0 in range(0, self.num, step):
+                d, i = self.tree().query(self.data[b0:b0 + step], k=fetch)
+                d, i = d.reshape(-1, fetch), i.reshape(-1, fetch)
+                dist[b0:b0 + step], index[b0:b0 + step] = d[:, :m], i[:, :m]
+                # the tree sums the squares in its own order: a few ulps apart may be a tie of the matrix
+                tied.append(b0 + np.flatnonzero((np.diff(d, axis=1) <= 1e-12 * d[:, 1:]).any(axis=1)))
+            for r, dis in self.blocks(np.concatenate(tied)):
+                index[r] = np.argsort(dis, axis=1)[:, :m]
+                dist[r] = np.take_along_axis(dis, index[r], axis=1)
+            self._knn = (k, dist, index)
+            return dist, index
+        for r, dis in self.blocks():
+            if self.knn_only and fetch < self.num:
+                part = np.argpartition(dis, fetch - 1, axis=1)[:, :fetch]
+                d = np.take_along_axis(dis, part, axis=1)
+                order = np.argsort(d, axis=1)
+                nearest = np.take_along_axis(part, order, axis=1)[:, :m]
+                tied = (np.diff(np.take_along_axis(d, order, axis=1), axis=1) == 0).any(axis=1)
+                nearest[tied] = np.argsort(dis[tied], axis=1)[:, :m]
+            else:
+                nearest = np.argsort(dis, axis=1)[:, :m]
+            index[r] = nearest
+            dist[r] = np.take_along_axis(dis, nearest, axis=1)
+        self._knn = (k, dist, index)
+        return dist, index
+
+    def count_within(self, radius, tree_max_dim=8, rows=None):
+        '''
+        number of other points strictly closer than radius, for every point or only for the given rows
+        (estimated by the 'approx' backend). Without a stored matrix, low-dimensional data uses KD-tree
+        radius counts just inside and just outside radius and recounts exactly only the points with a
+        neighbour in that thin band.
+        '''
+        rows = np.arange(self.num) if rows is None else np.asarray(rows)
+        count = np.zeros(rows.shape[0], dtype=np.int32)
+        if radius <= 0:
+            return count
+        cols = self._sampled()
+        if cols is not None:
+            # 'approx': count among the sampled columns and scale up to the other N-1 points
+            for b0, (r, dis) in zip(range(0, rows.shape[0], self.block), self.blocks(rows, cols=cols)):
+                itself = np.isin(r, cols)
+                inside = np.count_nonzero(dis < radius, axis=1) - itself
+                count[b0:b0 + r.shape[0]] = np.round(inside * (self.num - 1) / (cols.shape[0] - itself))
+            return count
+        recount = np.arange(rows.shape[0])
+        if self._use_tree(tree_max_dim):
+            inner = self.tree().query_ball_point(self.data[rows], radius * (1 - 1e-9), return_length=True)
+            outer = self.tree().query_ball_point(self.data[rows], radius * (1 + 1e-9), return_length=True)
+            count[:] = inner - 1  # every point counts itself
+            recount = np.flatnonzero(inner != outer)
+        for b0, (r, dis) in zip(range(0, recount.shape[0], self.block), self.blocks(rows[recount])):
+            dis[np.arange(r.shape[0]), r] = np.inf
+            count[recount[b0:b0 + r.shape[0]]] = np.count_nonzero(dis < radius, axis=1)
+        return count
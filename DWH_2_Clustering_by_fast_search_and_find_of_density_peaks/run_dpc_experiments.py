@@ -9,7 +9,8 @@ import matplotlib.pyplot as plt
 from sklearn.metrics import adjusted_rand_score, normalized_mutual_info_score
 
 # import the local DPC module (script is executed from this folder)
-from DPC import DPC
+from DPC import DensityPeaks
+from textcache import cached_loadtxt
 
 ROOT = os.path.dirname(__file__)
 # datasets are stored in the repository's DWH_3 folder; prefer that if available
@@ -19,12 +20,15 @@ if os.path.exists(possible_dwh3):
 else:
     DATA_DIR = os.path.join(ROOT, 'data-sets', 'shapes')
     # fallback: use local data-sets in DWH_2 if present
+# the .npy cache next to the data, data-sets/.cache/shapes (the one DWH_3's datasets.py uses as well)
+CACHE_DIR = os.path.join(os.path.dirname(DATA_DIR), '.cache', os.path.basename(DATA_DIR))
 OUT_DIR = os.path.join(ROOT, 'outputs')
 os.makedirs(OUT_DIR, exist_ok=True)
 
 
 def load_shape_file(path):
-    data = np.loadtxt(path)
+    cache = os.path.join(CACHE_DIR, os.path.splitext(os.path.basename(path))[0] + '.npy')
+    data = cached_loadtxt(path, cache)  # parsed once, then memory-mapped from the .npy cache
     if data.shape[1] >= 3:
         coords = data[:, :2]
         labels = data[:, 2].astype(int)
@@ -67,36 +71,6 @@ def decision_graph(density, delta, centers_idx, outpath, title=None):
     plt.close()
 
 
-def compute_density_delta(X):
-    # replicate the way DPC.py computes density and delta so we can plot decision graph
-    import scipy.spatial.distance as ssd
-    N = X.shape[0]
-    dist = ssd.pdist(X)
-    dmat = ssd.squareform(dist)
-    # area used in DPC.py: 2% quantile
-    sda = np.sort(dist)
-    area = sda[round(sda.shape[0]*2/100)-1]
-    density = np.zeros(N, dtype=int)
-    for i in range(N-1):
-        for j in range(i+1, N):
-            if dmat[i, j] < area:
-                density[i] += 1
-                density[j] += 1
-    maxd = dmat.max()
-    density_index = np.argsort(-density, kind='stable')
-    delta = np.zeros(N, dtype=float)
-    delta[density_index[0]] = -1.0
-    nneigh = np.zeros(N, dtype=int)
-    for i in range(1, N):
-        delta[density_index[i]] = maxd
-        for j in range(i):
-            if dmat[density_index[i], density_index[j]] < delta[density_index[i]]:
-                delta[density_index[i]] = dmat[density_index[i], density_index[j]]
-                nneigh[density_index[i]] = density_index[j]
-    delta[density_index[0]] = delta.max()
-    return density, delta
-
-
 def run():
     datasets = ['R15.txt', 'Aggregation.txt', 'flame.txt', 'T7.10k.txt']
     results = []
@@ -107,18 +81,18 @@ def run():
             continue
         X, labels = load_shape_file(path)
         true_k = len(np.unique(labels)) if labels is not None else None
-        k = true_k if true_k is not None else 3
+        k = true_k if true_k is not None else 'auto'  # unlabeled data: centres from the decision graph
 
-        # run DPC
-        clusters = DPC(X, k)
+        # run DPC; the fitted model also gives the decision graph without recomputing anything
+        model = DensityPeaks().fit(X)
+        clusters = model.labels(k)
 
         # clusters in the DPC implementation start at 1; convert to zero-based for plotting
         clusters0 = clusters.copy()
 
-        # compute density and delta for decision graph
-        density, delta = compute_density_delta(X)
-        gamma = density * delta
-        centers_idx = np.argsort(-gamma)[:k]
+        density, delta = model.rho, model.delta
+        centers_idx = model.centers(k)
+        k = len(centers_idx)
 
         base = os.path.splitext(fname)[0]
         plot_clusters(X, clusters0, centers_idx, os.path.join(OUT_DIR, f'{base}_clusters.png'),
@@ -0,0 +1,63 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from distances import PairwiseDistances, approximate_kneighbors  # noqa: E402
+
+DATA_SETS = Path(__file__).resolve().parents[2] / "DWH_3_How_to_improve_the_accuracy_of_clustering_algorithms" / "data-sets"
+
+
+def load(name):
+    data = np.loadtxt(DATA_SETS / name)
+    return (data - data.min(axis=0)) / (data.max(axis=0) - data.min(axis=0))
+
+
+def recall(exact_dist, approx_dist):
+    # by distance, so that a tied neighbour found instead of another one still counts
+    return np.mean(approx_dist <= exact_dist[:, -1:] * (1 + 1e-9))
+
+
+@pytest.mark.parametrize("name", ["dimension/dim32.txt", "dimension/dim128.txt", "S-set/s1.txt"])
+def test_approximate_kneighbors_recall(name):
+    data = load(name)
+    exact_dist, _ = PairwiseDistances(data, knn_only=True).kneighbors(10)
+    dist, index = approximate_kneighbors(data, 10, n_trees=8)
+    assert recall(exact_dist, dist) >= 0.99
+    assert (dist[:, 0] == 0).all() and (np.diff(dist, axis=1) >= 0).all()  # the point itself (or a duplicate) first
+    rows = np.arange(data.shape[0])[:, None]
+    np.testing.assert_allclose(dist, np.linalg.norm(data[index] - data[rows], axis=2), rtol=1e-12, atol=1e-12)
+    approx = PairwiseDistances(data, backend="approx")
+    np.testing.assert_array_equal(approx.kneighbors(10)[1], index)
+
+
+def test_approx_estimates_are_exact_with_every_column_sampled():
+    data = load("dimension/dim32.txt")
+    exact, approx = PairwiseDistances(data, knn_only=True), PairwiseDistances(data, backend="approx")
+    kth = round(data.shape[0] * 0.015)
+    np.testing.assert_allclose(approx.row_kth(kth), exact.row_kth(kth), rtol=1e-12)
+    area = np.mean(exact.row_kth(kth))
+    np.testing.assert_array_equal(approx.count_within(area), exact.count_within(area))
+
+
+# the HIAC quantities estimated from `sample` columns: the 1.5%-rank distance, the neighbour counts within
+# its mean (the densities) and the largest distance
+@pytest.mark.parametrize("name, sample", [("S-set/s1.txt", 2000), ("dimension/dim128.txt", 500)])
+def test_approx_estimates_within_tolerance(name, sample):
+    data = load(name)
+    exact, approx = PairwiseDistances(data, knn_only=True), PairwiseDistances(data, backend="approx", sample=sample)
+    kth = round(data.shape[0] * 0.015)
+    exact_kth, approx_kth = exact.row_kth(kth), approx.row_kth(kth)
+    assert np.mean(approx_kth) == pytest.approx(np.mean(exact_kth), rel=0.03)
+    assert np.median(np.abs(approx_kth / exact_kth - 1)) <= 0.1
+
+    area = np.mean(exact_kth)
+    exact_count, approx_count = exact.count_within(area), approx.count_within(area)
+    assert np.mean(approx_count) == pytest.approx(np.mean(exact_count), rel=0.03)
+    assert np.median(np.abs(approx_count - exact_count) / np.maximum(exact_count, 1)) <= 0.2
+    # the low-density objects that HIAC moves
+    assert np.mean((approx_count < approx_count.mean()) == (exact_count < exact_count.mean())) >= 0.93
+
+    assert 0.98 * exact.max() <= approx.max() <= exact.max() * (1 + 1e-12)
@@ -0,0 +1,119 @@
+import os
+import sys
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import DPC as dpc  # noqa: E402
+from DPC import DPC, DPC_knn, DPC_naive, DensityPeaks  # noqa: E402
+from sklearn.metrics import adjusted_rand_score  # noqa: E402
+
+SHAPES = Path(__file__).resolve().parents[2] / "DWH_3_How_to_improve_the_accuracy_of_clustering_algorithms" / "data-sets" / "shapes"
+
+
+def load_shape(name):
+    data = np.loadtxt(SHAPES / name)
+    if name == "Ls3.txt":  # the labels are in the first column
+        return data[:, 1:], data[:, 0].astype(int)
+    return data[:, :2], data[:, 2].astype(int)
+
+
+def tied_grid():
+    # integer grid with some points repeated: equal distances and equal densities everywhere
+    grid = np.stack(np.meshgrid(np.arange(15), np.arange(15)), axis=-1).reshape(-1, 2).astype(float)
+    return np.concatenate([grid, grid[:40]])
+
+
+@pytest.mark.parametrize("name", ["Heartshapes.txt", "flame.txt", "R15.txt", "Aggregation.txt", "Ls3.txt", "grid"])
+@pytest.mark.parametrize("block", [None, 97])
+def test_dpc_matches_naive(name, block):
+    X, truth = (tied_grid(), np.arange(4)) if name == "grid" else load_shape(name)
+    for k in {1, len(np.unique(truth))}:
+        np.testing.assert_array_equal(DPC(X, k, block=block), DPC_naive(X, k))
+
+
+@pytest.mark.parametrize("name", ["R15.txt", "Aggregation.txt", "flame.txt", "Heartshapes.txt", "Ls3.txt"])
+@pytest.mark.parametrize("first", [None, 1])
+def test_partial_fit_matches_refit(name, first):
+    # stream the points in random order; after every batch the model must equal a refit on everything seen so far
+    X, truth = load_shape(name)
+    k = len(np.unique(truth))
+    X = X[np.random.RandomState(0).permutation(X.shape[0])]
+    if first is None:
+        batches = np.array_split(np.arange(X.shape[0]), 6)
+    else:  # a stream that starts with a single point, which has no cutoff distance yet
+        batches = [np.arange(first)] + np.array_split(np.arange(first, X.shape[0]), 5)
+    model = DensityPeaks()
+    for batch in batches:
+        model.partial_fit(X[batch])
+        labels = model.labels(k)
+        seen = batch[-1] + 1
+        ref = DensityPeaks(cutoff=model.area).fit(X[:seen])
+        np.testing.assert_array_equal(model.rho, ref.rho)
+        np.testing.assert_array_equal(model.delta, ref.delta)
+        np.testing.assert_array_equal(model.nneigh, ref.nneigh)
+        np.testing.assert_array_equal(labels, ref.labels(k))
+
+
+def test_labels_reuse_fit():
+    X, truth = load_shape("Aggregation.txt")
+    model = DensityPeaks().fit(X)
+    for k in (2, 7, 12):
+        np.testing.assert_array_equal(model.labels(k), model.labels(centers=model.centers(k)))
+    assert model.labels(7).max() == 7
+
+
+@pytest.mark.parametrize("name", ["Heartshapes.txt", "flame.txt", "R15.txt", "Aggregation.txt", "Ls3.txt"])
+def test_knn_mode_as_accurate_as_exact(name):
+    X, truth = load_shape(name)
+    k = len(np.unique(truth))
+    exact, approx = DPC(X, k), DPC_knn(X, k)
+    assert adjusted_rand_score(truth, approx) >= adjusted_rand_score(truth, exact) - 0.05
+
+
+def test_knn_mode_agrees_with_exact():
+    # where the exact DPC finds the clusters, the kNN density finds the same ones
+    X, truth = load_shape("R15.txt")
+    assert adjusted_rand_score(DPC(X, 15), DPC_knn(X, 15)) >= 0.95
+    rng = np.random.RandomState(0)
+    labels = rng.randint(0, 20, 5000)
+    X = rng.uniform(0, 100, (20, 2))[labels] + rng.normal(0, 3, (5000, 2))
+    assert adjusted_rand_score(DPC(X, 20), DPC_knn(X, 20)) >= 0.85
+    assert adjusted_rand_score(DPC(X, 20), DPC_knn(X.astype(np.float32), 20)) >= 0.85
+
+
+@pytest.mark.parametrize("ratio", [2, "auto"])
+def test_process_pool_is_bit_identical(ratio, monkeypatch):
+    X, truth = load_shape("Aggregation.txt")
+    calls = []
+    fit_parallel = dpc._fit_parallel
+    monkeypatch.setattr(dpc, "_fit_parallel", lambda *args: calls.append(args[-1]) or fit_parallel(*args))
+    serial = DensityPeaks(ratio, block=64, n_jobs=1).fit(X)
+    pooled = DensityPeaks(ratio, block=64, n_jobs=2).fit(X)
+    assert calls == [2]  # only the second fit went through the pool
+    assert (pooled.area, pooled.maxd) == (serial.area, serial.maxd)
+    for name in ("rho", "delta", "nneigh", "density_index", "gamma"):
+        np.testing.assert_array_equal(getattr(pooled, name), getattr(serial, name))
+    np.testing.assert_array_equal(pooled.labels(7), serial.labels(7))
+
+
+def test_negative_n_jobs_count_back_from_all_cores(monkeypatch):
+    monkeypatch.setattr(os, "cpu_count", lambda: 8)
+    assert [dpc._resolve_n_jobs(n) for n in (None, 1, 3, -1, -2, -8, -20)] == [1, 1, 3, 8, 7, 1, 1]
+
+
+def test_auto_ratio_skips_zero_cutoffs():
+    # the repeated blobs make the smallest candidate cutoffs exactly 0; Ls3 is an ordinary shape set
+    X, _ = load_shape("Ls3.txt")
+    rng = np.random.RandomState(2)
+    blobs = np.repeat(rng.normal(0, 1, (300, 2)) + rng.randint(0, 3, (300, 1)) * 6, 8, axis=0)
+    for data in (X, blobs):
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            ratio = dpc._entropy_ratio(dpc.PairwiseDistances(data, knn_only=True))
+            model = DensityPeaks("auto").fit(data)
+        assert ratio in dpc.AUTO_RATIOS and model.dc_ratio == ratio
+        assert np.isfinite(model.area) and model.area > 0
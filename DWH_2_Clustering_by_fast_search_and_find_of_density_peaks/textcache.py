@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+'''
+文本数据文件的二进制缓存，DWH_2 的实验脚本和 DWH_3 的 datasets.py 共用。
+
+第一次读取时用 np.loadtxt 解析，结果存成 .npy 文件（旁边的 .json 记录源文件的 mtime、大小和 sha1）；
+之后直接 np.load(mmap_mode='r') 零拷贝映射。mtime 或大小变了再比较 sha1，内容没变就只更新记录。
+
+    from textcache import cached_loadtxt
+    data = cached_loadtxt('T7.10k.txt', 'data-sets/.cache/T7.10k.npy')
+'''
+import hashlib
+import json
+import os
+
+import numpy as np
+
+
+def _sha1(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(2 ** 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _save(path, array):
+    # write to a temporary file and rename, so concurrent readers never see a half-written cache
+    tmp = '%s.%d.tmp' % (path, os.getpid())
+    with open(tmp, 'wb') as fh:
+        np.save(fh, array)
+    os.replace(tmp, path)
+
+
+def _save_meta(path, meta):
+    tmp = '%s.%d.tmp' % (path, os.getpid())
+    with open(tmp, 'w') as fh:
+        json.dump(meta, fh)
+    os.replace(tmp, path)
+
+
+def cached_loadtxt(path, cache, dtype=np.float64, mmap=True):
+    '''
+    np.loadtxt(path, dtype=dtype, ndmin=2), parsed once into the .npy file cache and then read from it
+    (memory-mapped read-only when mmap, else read into a writable array)
+    '''
+    meta_path = cache[:-4] + '.json'
+    stat = os.stat(path)
+    meta = None
+    if os.path.exists(cache) and os.path.exists(meta_path):
+        with open(meta_path) as fh:
+            meta = json.load(fh)
+        if meta.get('dtype') != np.dtype(dtype).str:
+            meta = None
+        elif (meta['mtime_ns'], meta['size']) != (stat.st_mtime_ns, stat.st_size):
+            # touched: only rebuild when the content really changed
+            sha1 = _sha1(path)
+            if meta['sha1'] != sha1:
+                meta = None
+            else:
+                meta.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+                _save_meta(meta_path, meta)
+    if meta is None:
+        os.makedirs(os.path.dirname(cache), exist_ok=True)
+        _save(cache, np.loadtxt(path, dtype=dtype, ndmin=2))
+        _save_meta(meta_path, dict(source=os.path.abspath(path), mtime_ns=stat.st_mtime_ns, size=stat.st_size,
+                                   sha1=_sha1(path), dtype=np.dtype(dtype).str))
+    return np.load(cache, mmap_mode='r' if mmap else None)
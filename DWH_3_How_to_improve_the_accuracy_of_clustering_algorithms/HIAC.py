@@ -8,7 +8,7 @@ import os.path
 
 import numpy as np
 import pandas
-import scipy.spatial.distance as dis
+from scipy.ndimage import gaussian_filter1d
 import matplotlib.pyplot as plt
 import matplotlib
 import sklearn.cluster as sc
@@ -21,6 +21,9 @@ from sklearn import decomposition as dec
 from sklearn import cluster
 
 from DWH_2_Clustering_by_fast_search_and_find_of_density_peaks.DPC import DPC
+from DWH_2_Clustering_by_fast_search_and_find_of_density_peaks.distances import PairwiseDistances
+from datasets import load_file
+from normalization import MinMaxScaling
 
 global num
 num = 1
@@ -68,88 +71,217 @@ def Plot(data, labels, title):
     plt.show()
 
 
-def TGP(data, k, photo_path, threshold):
+def _decision_curve(pointWeight):
+    '''
+    the probability curve of the decision-graph: (N/10, 2) array of the start position of each weight interval
+    and the fraction of objects whose point weight falls in it
+    '''
+    pointNum = pointWeight.shape[0]
+    probability = np.zeros([int(pointNum / 10), 2])
+    dc = (max(pointWeight) - min(pointWeight)) * 10 / pointNum  # get the length of each interval
+    if dc == 0:  # every object has the same weight: one interval holding all of them
+        return np.array([[min(pointWeight), 1.0]])
+    probability[:, 0] = min(pointWeight) + dc * np.arange(probability.shape[0])  # the start position of each interval
+    interval = ((pointWeight - min(pointWeight)) / dc).astype(np.int64)  # the interval to which each object belongs
+    interval = interval[interval < probability.shape[0]]
+    probability[:, 1] = np.bincount(interval, minlength=probability.shape[0]) / pointNum
+    return probability
+
+
+def TGP(data, k, photo_path, threshold, distances=None):
     '''
 
     Parameters
     ----------
     data
     k
-    photo_path: the address to save decision-graph
-    threshold
+    photo_path: the address to save decision-graph (None: the decision-graph is not drawn)
+    threshold: marked on the decision-graph; "auto" marks the one found by auto_threshold()
+    distances: PairwiseDistances of data shared with the other stages (computed here if not given)
 
-    Returns:the edge weight matrix that record the edge weight of each object i and its k-nearest-neighbors
+    Returns:the edge weight matrix that record the edge weight of each object i and its k-nearest-neighbors,
+            shape (N, k+1): column j is the weight of the edge to the j-th nearest neighbor (column 0 is the object itself)
     -------
 
     '''
     global num
-    pointNum = data.shape[0]
-    probability = np.zeros([int(pointNum / 10), 2])
-    distance = dis.pdist(data)
-    distance_matrix = -dis.squareform(distance) + np.max(distance)
-    distance_sort = -np.sort(-distance_matrix, axis=1)
+    if distances is None:
+        distances = PairwiseDistances(data, knn_only=True)
+    knnDistance, _ = distances.kneighbors(k)
+    distance_sort = -knnDistance + distances.max()  # the k+1 largest of max(distance) - distance, in descending order
 
+    if photo_path is None:
+        return distance_sort
     pointWeight = np.mean(distance_sort[:, 1:k + 1], axis=1)  # get point weight to replace edge weight
-    dc = (max(pointWeight) - min(pointWeight)) * 10 / pointNum  # get the length of each interval
-    for i in range(probability.shape[0]):  # for each interval
-        location = min(pointWeight) + dc * i  # get the start position of each interval
-        probability[i, 0] = location  # the start position is recorded at probability[:, 0]
-    for i in range(pointNum):  # for each object
-        j = (int)((pointWeight[i] - min(pointWeight)) / dc)  # for each object, calculate the interval to which it belongs
-        if j < int(pointNum / 10):
-            probability[j, 1] += 1
-    probability[:, 1] = probability[:, 1] / pointNum
-
+    probability = _decision_curve(pointWeight)
+    title = 'Decision graph'
+    if isinstance(threshold, str) and threshold == 'auto':
+        threshold, confidence = auto_threshold(distance_sort, k)
+        title += ' (auto, confidence %.2f)' % confidence
     plt.figure(num)
     num += 1
     plt.plot(probability[:, 0], probability[:, 1])
     plt.axvline(x=threshold, c="r", ls="--", lw=1.5)
-    plt.title('Decision graph', fontstyle='italic', size=20)
+    plt.title(title, fontstyle='italic', size=20)
     plt.xlabel('wight', fontsize=20)
     plt.ylabel('probability', fontsize=20)
     plt.savefig(photo_path, dpi=300)
     plt.show()
     return distance_sort
 
-def prune(data, knn, threshold, distanceTGP):
+def auto_threshold(distanceTGP, k):
+    '''
+    the weight threshold read off the decision-graph without a human. The probability curve of TGP is
+    smoothed (a Gaussian over max(4, N/250) intervals) and the threshold is its knee on the rising side: the
+    interval that lies farthest below the straight line from the lowest weight to the peak of the curve
+    (the triangle method), i.e. where the sparse invalid-neighbor tail ends and the bulk begins.
+
+    Parameters
+    ----------
+    distanceTGP: the weight matrix returned by TGP
+    k: the number of nearest neighbors
+
+    Returns: (threshold, confidence), confidence in [0, 1) is how far the curve drops below that line at the
+             knee relative to the peak: near 0 for a straight ramp without a visible division, near 1 when
+             the curve stays flat until it rises sharply. Without a rising side (too few objects, or all
+             weights equal) no edge is clipped and confidence is 0.
+    -------
+
+    '''
+    pointWeight = np.mean(distanceTGP[:, 1:k + 1], axis=1)
+    probability = _decision_curve(pointWeight)
+    keep_all = float(np.min(distanceTGP[:, 1:k + 1])), 0.0  # nothing is strictly below the smallest weight
+    if probability.shape[0] < 2:
+        return keep_all
+    curve = gaussian_filter1d(probability[:, 1], max(4, probability.shape[0] / 25), mode='constant')
+    peak = int(np.argmax(curve))
+    if peak == 0:
+        return keep_all
+    line = curve[0] + (curve[peak] - curve[0]) * np.arange(peak + 1) / peak
+    drop = line - curve[:peak + 1]
+    knee = int(np.argmax(drop))
+    return float(probability[knee, 0]), float(drop[knee] / curve[peak])
+
+def prune(data, knn, threshold, distanceTGP, distances=None):
     '''
 
     Parameters
     ----------
     data:
     knn:the number of neighbor
-    threshold:to clip invalid-edge
+    threshold:to clip invalid-edge, or "auto" for the one found by auto_threshold()
     distanceTGP:the weight matrix for each object, we only need distanceTGP[:,:k+1], i.e. the k-nearest-neighbors
+    distances: PairwiseDistances of data shared with the other stages (computed here if not given)
 
-    Returns: the index matrix which records the valid-neighbors index of object i
+    Returns: the (N, knn+1) index matrix which records the valid-neighbors index of object i
     -------
 
     '''
+    if isinstance(threshold, str) and threshold == 'auto':
+        threshold, _ = auto_threshold(distanceTGP, knn)
+    if distances is None:
+        distances = PairwiseDistances(data, knn_only=True)
     pointNum = data.shape[0]
-    distance = dis.pdist(data)
-    distance_matrix = dis.squareform(distance)
-    disIndex = np.argsort(distance_matrix, axis=1)
-    distance_sort = np.sort(distance_matrix, axis=1)
-    area = np.mean(distance_sort[:, round(pointNum * 0.015)])
-    density = np.zeros(pointNum)
-    for i in range(pointNum):
-        num = 1
-        while (distance_sort[i, num] < area):
-            num += 1
-        density[i] = num
+    _, disIndex = distances.kneighbors(knn)
+    disIndex = disIndex.copy()
+    area = np.mean(distances.row_kth(round(pointNum * 0.015)))
+    density = distances.count_within(area) + 1  # the object itself is counted too
     densityThreshold = np.mean(density)  # we didn't move objects that have high density
-    for i in range(pointNum):
-        if density[i] < densityThreshold:
-            for j in range(knn + 1):  # for k nearest neighbours
-                if (data[disIndex[i][j]] == data[i]).all():
-                    continue
-                else:
-                    # to clip invalid-neighbors
-                    if distanceTGP[i, j] < threshold:
-                        disIndex[i][j] = -1
+    itself = (data[disIndex] == data[:, None, :]).all(axis=2)
+    # to clip invalid-neighbors of the low-density objects
+    clip = (density < densityThreshold)[:, None] & ~itself & (distanceTGP[:, :knn + 1] < threshold)
+    disIndex[clip] = -1
     return disIndex
 
-def shrink(data, knn, T, disIndex):
+def _gravitation_tree(data, leaf_size=16):
+    '''
+    Binary space-partitioning tree for the global gravitation kernels: every node holding more than
+    leaf_size objects is split at the median of its widest axis, one tree level at a time.
+
+    Returns: dict of per-node arrays: count, com (centre of mass), size (bounding-box diagonal),
+             child (id of the left child, the right one is child + 1; -1 for leaves) and
+             members (objects of each leaf, -1 padded)
+    -------
+    '''
+    pointNum, dim = data.shape
+    maxNodes = 4 * (pointNum // leaf_size + 1) + 1
+    count = np.zeros(maxNodes, dtype=np.intp)
+    com = np.zeros((maxNodes, dim))
+    lo = np.zeros((maxNodes, dim))
+    hi = np.zeros((maxNodes, dim))
+    child = np.full(maxNodes, -1)
+    count[0], com[0], lo[0], hi[0] = pointNum, data.mean(axis=0), data.min(axis=0), data.max(axis=0)
+    node = np.zeros(pointNum, dtype=np.intp)
+    nodeNum = 1
+    active = np.array([0]) if pointNum > leaf_size else np.array([], dtype=np.intp)
+    while active.size:
+        isActive = np.zeros(nodeNum, dtype=bool)
+        isActive[active] = True
+        points = np.flatnonzero(isActive[node])
+        owner = node[points]
+        axis = np.argmax(hi[owner] - lo[owner], axis=1)
+        order = np.lexsort((data[points, axis], owner))
+        points, owner = points[order], owner[order]
+        rank = np.arange(points.shape[0]) - np.searchsorted(owner, owner, side='left')
+        child[active] = nodeNum + 2 * np.arange(active.shape[0])
+        node[points] = child[owner] + (rank >= count[owner] // 2)
+        new = np.arange(nodeNum, nodeNum + 2 * active.shape[0])
+        nodeNum += 2 * active.shape[0]
+        count[new] = np.bincount(node[points] - new[0], minlength=new.shape[0])
+        for j in range(dim):
+            com[new, j] = np.bincount(node[points] - new[0], data[points, j], minlength=new.shape[0]) / count[new]
+        lo[new], hi[new] = np.inf, -np.inf
+        np.minimum.at(lo, node[points], data[points])
+        np.maximum.at(hi, node[points], data[points])
+        active = new[count[new] > leaf_size]
+    order = np.argsort(node, kind='stable')
+    slot = np.arange(pointNum) - np.searchsorted(node[order], node[order], side='left')
+    members = np.full((nodeNum, leaf_size), -1)
+    members[node[order], slot] = order
+    return dict(count=count[:nodeNum], com=com[:nodeNum], size=np.linalg.norm(hi - lo, axis=1)[:nodeNum],
+                child=child[:nodeNum], members=members)
+
+
+def gravitation(data, targets, theta=0.5, radius=None, leaf_size=16, chunk=200000):
+    '''
+    Global gravitational pull sum_j (x_j - x_i) / d_ij^2 on every target object i from all objects j
+    within radius (all objects when radius is None), the objects identical to i excepted.
+
+    The sum is Barnes-Hut approximated: a tree node whose size is below theta times its distance (and
+    that lies wholly inside the radius) acts as its whole mass at its centre of mass. theta=0 gives the
+    exact sum. The tree is traversed breadth-first over all (target, node) pairs at once.
+
+    Returns: (len(targets), d) array of pulls
+    -------
+    '''
+    tree = _gravitation_tree(data, leaf_size)
+    radius = np.inf if radius is None else radius
+    count, com, size, child, members = tree['count'], tree['com'], tree['size'], tree['child'], tree['members']
+    x = data[targets]
+    force = np.zeros(x.shape)
+    q = np.arange(x.shape[0])
+    n = np.zeros(x.shape[0], dtype=np.intp)
+    while q.size:
+        delta = com[n] - x[q]
+        dist = np.sqrt(np.einsum('ij,ij->i', delta, delta))
+        inside = dist - size[n] <= radius  # the node may hold objects within the radius
+        far = inside & (size[n] < theta * dist) & (dist + size[n] <= radius)
+        np.add.at(force, q[far], count[n[far], None] * delta[far] / (dist[far] ** 2)[:, None])
+        leaf = inside & ~far & (child[n] < 0)
+        ql, nl = q[leaf], n[leaf]
+        for b0 in range(0, ql.shape[0], max(1, chunk // leaf_size)):
+            qb, mb = ql[b0:b0 + chunk // leaf_size], members[nl[b0:b0 + chunk // leaf_size]]
+            d = data[np.maximum(mb, 0)] - x[qb, None, :]
+            d2 = np.einsum('ijk,ijk->ij', d, d)
+            ok = (mb >= 0) & (d2 > 0) & (d2 <= radius * radius)
+            np.add.at(force, qb, (d * np.where(ok, 1 / np.where(ok, d2, 1), 0)[:, :, None]).sum(axis=1))
+        split = inside & ~far & (child[n] >= 0)
+        q = np.concatenate([q[split], q[split]])
+        n = np.concatenate([child[n[split]], child[n[split]] + 1])
+    return force
+
+
+def shrink(data, knn, T, disIndex, distances=None, kernel='knn', theta=0.5, radius=None):
     '''
 
     Parameters
@@ -160,43 +292,49 @@ def shrink(data, knn, T, disIndex):
     disIndex:i.e. the index matrix which records the valid-neighbors index of each object i
             for object i, if j is invalid-neighbor of i, neighbor_index[i][j] = -1,
             else neighbor_index[i][j] is the index of object j
+    distances: PairwiseDistances of data (by default distance blocks are computed on the fly and not stored)
+    kernel: 'knn' pulls each object towards its valid-neighbors only; 'barnes_hut' pulls it towards every
+            object within radius (all objects by default) with the Barnes-Hut approximated gravitation(),
+            and 'exact' computes the same global pull exactly. The global kernels do not use disIndex.
+    theta: opening angle of the 'barnes_hut' kernel
+    radius: attraction radius of the global kernels
     Returns:dataset after ameliorating
     -------
 
     '''
-    bata = data.copy()
+    if distances is None:
+        distances = PairwiseDistances(data, knn_only=True)
     pointNum = data.shape[0]
-    distance = dis.pdist(data)
-    distance_matrix = dis.squareform(distance)
-    distance_sort = np.sort(distance_matrix, axis=1)
-    area = np.mean(distance_sort[:, round(pointNum * 0.015)])
-    density = np.zeros(pointNum)
+    # distance to the nearest neighbor and to the 1.5%-rank neighbor of each object, in one pass
+    nearest, areaDistance = distances.row_kth([1, round(pointNum * 0.015)]).T
+    area = np.mean(areaDistance)
 
     # calculate density of each object
-    for i in range(pointNum):
-        num = 1
-        while (distance_sort[i, num] < area):
-            num += 1
-        density[i] = num
+    density = distances.count_within(area) + 1
     densityThreshold = np.mean(density)
-    G = np.mean(distance_sort[:, 1])  # Gravitational constant for each time-segment
-
-    # move the objects to ameliorate the dataset
-    for i in range(pointNum):  # for each object
-        if density[i] < densityThreshold:  # we didn't move objects that have high density
-            displacement = np.zeros(data.shape[1], dtype=np.float32)
-
-            # calculate graduation pull of all valid neighbours on current object i, and then calculate the displacement of current object i.
-            for j in range(knn + 1):  # for k nearest neighbours
-                if (data[disIndex[i][j]] == data[i]).all():  # if itself
-                    continue
-                else:
-                    if disIndex[i][j] != -1:
-                        ff = (data[disIndex[i][j]] - data[i])
-                        fff = (distance_sort[i, 1] / (
-                                    distance_matrix[i, disIndex[i, j]] * distance_matrix[i, disIndex[i, j]]))
-                        displacement += G * ff * fff
-            bata[i] = data[i] + displacement * T  # object after moving
+    G = np.mean(nearest)  # Gravitational constant for each time-segment
+
+    # move the objects to ameliorate the dataset; we didn't move objects that have high density
+    moved = density < densityThreshold
+    if kernel != 'knn':
+        pull = gravitation(data, np.flatnonzero(moved), theta if kernel == 'barnes_hut' else 0, radius)
+        bata = data.copy()
+        bata[moved] = data[moved] + G * pull * nearest[moved, None] * T
+        return bata
+
+    # only the distances to the k nearest neighbours are refreshed for the current positions
+    neighbor = disIndex[:, :knn + 1]
+    neighborDistance = distances.pairs(np.arange(pointNum)[:, None], neighbor)
+    pull = data[neighbor] - data[:, None, :]
+    # skip invalid-neighbors and the object itself (or its duplicates)
+    valid = (neighbor != -1) & (pull != 0).any(axis=2)
+    fff = nearest[:, None] / np.where(valid, neighborDistance * neighborDistance, 1)
+
+    displacement = np.zeros(data.shape, dtype=np.float32)
+    for j in range(neighbor.shape[1]):  # accumulated neighbor by neighbor in float32, as in the per-object loop
+        displacement += np.where(valid[:, j, None], G * pull[:, j] * fff[:, j, None], 0)
+    bata = data.copy()
+    bata[moved] = data[moved] + displacement[moved] * T  # object after moving
     return bata
 
 if __name__ == "__main__":
@@ -212,30 +350,22 @@ if __name__ == "__main__":
     k = 6# the number of nearest neighbors, parameter k in HIAC
     T = 0.3# parameter T in HIAC
     d = 4# the d in paper HIAC
-    threshold = 1.514# the weight threshold to clip invalid-neighbors
+    threshold = 1.514# the weight threshold to clip invalid-neighbors, or "auto" to read it off the decision-graph automatically
+    backend = "exact"# neighbor search: "exact", or "approx" (random projection forest) for high-dimensional data
+    kernel = "knn"# gravitation between valid-neighbors ("knn"), or "barnes_hut" for a global/radius-limited pull
     pca = dec.PCA(n_components=2) # High-dimensional data are displayed using PCA dimensionality reduction methods
 
     #####################read data and label#################
-    data = np.loadtxt(filePath)
-    if with_label:
-        labels = data[:, -1]
-        labels = np.array(labels, dtype=np.int32)
-        data = data[:, :-1]
-    else:
-        labels = np.loadtxt(labelPath, dtype=np.int32)
+    data, labels = load_file(filePath, "last" if with_label else labelPath)  # parsed once, then memory-mapped from the .npy cache
     dim = data.shape[1]# the dimension of data
     cluster_num = max(labels) - min(labels) + 1# the number of clusters
 
     ########################normalization###################################
-    data_without_nml = data.copy()
-    for j in range(data.shape[1]):
-        max_ = max(data[:, j])
-        min_ = min(data[:, j])
-        if max_ == min_:
-            continue
-        for i in range(data.shape[0]):
-            data[i][j] = (data[i][j] - min_) / (max_ - min_)
-    np.savetxt(os.path.join(save_dir, file_name + "_normalization.txt"), data)  #
+    data_without_nml = data
+    scaling = MinMaxScaling().fit(data)# min-max per column, constant columns are kept as they are
+    data = scaling.transform(data)
+    scaling.save(os.path.join(save_dir, file_name + "_scaling.npz"))# reapply to new data with MinMaxScaling.load(...).transform(new_data)
+    np.save(os.path.join(save_dir, file_name + "_normalization.npy"), data)
 
     ########################use PCA to reduce the dimension of the dataset, and visualization###################################
     if dim > 2:# for high dimension dataset
@@ -248,8 +378,9 @@ if __name__ == "__main__":
 
     ######################call HIAC##############################
     photoPath = os.path.join(save_dir, "decision_" + str(k) + "_" + str(threshold) + ".png")# the path to save picture(decision-graph)
-    distanceTGP = TGP(data, k, photoPath, threshold)  # we can determine the threshold，and return the weight matrix
-    neighbor_index = prune(data, k, threshold, distanceTGP) # clip invalid-neighbors based on the weight threshold and the decision-graph,
+    distances = PairwiseDistances(data, knn_only=True, backend=backend)  # computed once and shared by TGP, prune and the first time-segment
+    distanceTGP = TGP(data, k, photoPath, threshold, distances)  # we can determine the threshold，and return the weight matrix
+    neighbor_index = prune(data, k, threshold, distanceTGP, distances) # clip invalid-neighbors based on the weight threshold and the decision-graph,
                                                             # and then return the index matrix which records the valid-neighbors index of object i
                                                             # for object i, if j is invalid-neighbor of i, neighbor_index[i][j] = -1,
                                                             # else neighbor_index[i][j] is the index of object j
@@ -257,12 +388,13 @@ if __name__ == "__main__":
                                                             # so,
 
     for i in range(d): # ameliorated the dataset by d time-segments
-        bata = shrink(data, k, T, neighbor_index)
+        bata = shrink(data, k, T, neighbor_index, distances, kernel=kernel)
         data = bata
+        distances = PairwiseDistances(data, knn_only=True, backend=backend)
     np.savetxt(os.path.join(save_dir, file_name + '_ameliorated_by_HIAC.txt'), data)
     
     # call DPC to clustering, and calculate nmi by the interface:adjusted_mutual_info_score 
-    res = DPC(data, cluster_num)
+    res = DPC(data, cluster_num, distances=distances if backend == "exact" else None)
     nmi = metrics.adjusted_mutual_info_score(labels, res, average_method='max')
     print("nmi:  ", nmi)
 
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Benchmark the Barnes-Hut gravitation kernel of HIAC against the exact global kernel.
+
+For the overlapping Gaussian sets (S-set, A-set) it times the global pull on every object with the exact
+kernel (theta=0) and with Barnes-Hut at several opening angles, and reports the relative error. With
+--ami it also runs HIAC with the usual valid-neighbor kernel and with the radius-limited Barnes-Hut
+kernel (parameters from parameter-config.xls) and reports the AMI of DPC on each result.
+
+    python benchmark_gravitation.py
+    python benchmark_gravitation.py s1 a1 --ami --radius 0.05
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+from sklearn import metrics
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(ROOT))
+
+from HIAC import TGP, prune, shrink, gravitation
+from datasets import load as load_dataset
+from normalization import MinMaxScaling
+from DWH_2_Clustering_by_fast_search_and_find_of_density_peaks.DPC import DPC
+from DWH_2_Clustering_by_fast_search_and_find_of_density_peaks.distances import PairwiseDistances
+
+# k, T, d, threshold from parameter-config.xls
+PARAMS = {'s1': (30, 0.3, 2, 1.15284), 's2': (30, 0.55, 2, 1.09397), 's3': (20, 0.6, 79, 1.13094),
+          's4': (40, 0.6, 25, 1.0161), 'a1': (10, 0.7, 40, 1.18617), 'a2': (20, 0.6, 40, 1.24031),
+          'a3': (30, 0.6, 40, 1.19293)}
+
+
+def load(name):
+    data, labels = load_dataset(name)
+    return MinMaxScaling().fit_transform(data), labels
+
+
+def hiac_ami(data, labels, k, T, d, threshold, **kernel):
+    distances = PairwiseDistances(data, knn_only=True)
+    weight = TGP(data, k, os.path.join(tempfile.gettempdir(), 'decision_benchmark.png'), threshold, distances)
+    neighbor_index = prune(data, k, threshold, weight, distances)
+    t0 = time.perf_counter()
+    for _ in range(d):
+        data = shrink(data, k, T, neighbor_index, **kernel)
+    elapsed = time.perf_counter() - t0
+    res = DPC(data, int(labels.max() - labels.min() + 1))
+    return metrics.adjusted_mutual_info_score(labels, res, average_method='max'), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('datasets', nargs='*', default=list(PARAMS))
+    parser.add_argument('--theta', type=float, nargs='*', default=[0.3, 0.5, 0.8])
+    parser.add_argument('--ami', action='store_true', help='also compare the AMI of DPC after HIAC')
+    parser.add_argument('--radius', type=float, default=0.05, help='attraction radius of the Barnes-Hut HIAC run')
+    args = parser.parse_args()
+
+    for name in args.datasets:
+        data, labels = load(name)
+        targets = np.arange(data.shape[0])
+        t0 = time.perf_counter()
+        exact = gravitation(data, targets, theta=0)
+        t_exact = time.perf_counter() - t0
+        print(f'{name} {data.shape}: exact {t_exact:.2f}s')
+        for theta in args.theta:
+            t0 = time.perf_counter()
+            approx = gravitation(data, targets, theta=theta)
+            t_approx = time.perf_counter() - t0
+            error = np.linalg.norm(approx - exact, axis=1) / np.linalg.norm(exact, axis=1)
+            print(f'    theta={theta:<4} {t_approx:6.2f}s ({t_exact / t_approx:4.1f}x)  '
+                  f'relative error median {np.median(error):.1e}, max {error.max():.1e}')
+        if args.ami:
+            params = PARAMS[name]
+            for label, kernel in (('knn', {}), ('barnes_hut', dict(kernel='barnes_hut', radius=args.radius))):
+                ami, elapsed = hiac_ami(data, labels, *params, **kernel)
+                print(f'    HIAC {label:<10} shrink {elapsed:6.2f}s  -> DPC AMI {ami:.4f}')
+
+
+if __name__ == '__main__':
+    main()
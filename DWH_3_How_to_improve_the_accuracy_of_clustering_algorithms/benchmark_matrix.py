@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""Run the HIAC comparison experiments: every dataset x {DPC, KMeans, Agglomerative}, baseline and ameliorated.
+
+The parameters (k, T, d, threshold) of each cell come from parameter-config.xls. A row named
+"<dataset> + <algorithm>" applies to that algorithm only, and a plain dataset row applies to all three.
+For every cell, a worker process does the following:
+  * loads and normalizes the dataset (the dimension datasets are used raw, as their thresholds are in raw
+    units);
+  * clusters it (baseline);
+  * runs HIAC (TGP, prune, d x shrink);
+  * clusters the ameliorated data.
+It records the AMI/ARI/NMI of both clusterings and the wall time of each stage. The *_rss_mb columns are the
+peak RSS of each stage over the RSS it started from (on Linux the peak is reset before every stage; elsewhere
+this is how much the stage raised the peak of the worker).
+
+Each finished cell is appended to the results CSV at once, and the cells already in it with the same
+parameters (k, T, d and the threshold, or "auto") are skipped. An interrupted run therefore picks up where
+it stopped, a failed cell (its error column is set) is retried on the next run, and a changed config or
+--threshold reruns the cells it changes.
+
+Reading the .xls needs xlrd. Without it, pass --config with a CSV whose columns are
+dataset, algorithm, k, T, d and threshold (algorithm empty for all three).
+
+    python benchmark_matrix.py                          # the whole matrix with one worker per CPU
+    python benchmark_matrix.py iris s1 --algorithms DPC --n-jobs 2
+    python benchmark_matrix.py --threshold auto         # thresholds from auto_threshold() instead of the sheet
+"""
+import argparse
+import csv
+import multiprocessing
+import os
+import resource
+import sys
+import time
+import traceback
+
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+import pandas
+import sklearn.cluster as sc
+from sklearn import metrics
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(ROOT))
+
+from HIAC import TGP, auto_threshold, prune, shrink
+from datasets import load as load_dataset, registry
+from normalization import MinMaxScaling
+from DWH_2_Clustering_by_fast_search_and_find_of_density_peaks.DPC import DPC
+from DWH_2_Clustering_by_fast_search_and_find_of_density_peaks.distances import PairwiseDistances
+
+ALGORITHMS = ('DPC', 'KMeans', 'Agglomerative')
+# short names used in parameter-config.xls; the others match a registered dataset up to case
+ALIASES = {'cancer': 'breast_cancer', 'bank': 'Banknote_authentication', 'digit': 'digits',
+           'tae': 'Teaching_assistant_evaluation', 'wireless': 'Wireless_indoor_location'}
+STAGES = ('baseline', 'hiac', 'ameliorated')
+FIELDS = (['dataset', 'algorithm', 'k', 'T', 'd', 'threshold', 'threshold_mode', 'confidence', 'n', 'clusters']
+          + ['%s_%s' % (stage, score) for stage in ('baseline', 'ameliorated') for score in ('ami', 'ari', 'nmi')]
+          + ['%s_%s' % (stage, unit) for stage in ('load',) + STAGES for unit in ('seconds', 'rss_mb')]
+          + ['error'])
+
+
+def _algorithm(name):
+    name = name.strip().lower().replace('-', '')
+    for algorithm in ALGORITHMS:
+        if algorithm.lower().startswith(name[:3]):
+            return algorithm
+    raise ValueError('unknown clustering algorithm %r' % name)
+
+
+def _dataset(name):
+    name = ALIASES.get(name.strip(), name.strip())
+    known = {n.lower(): n for n in registry()}
+    return known.get(name.lower(), name)
+
+
+def read_config(path=os.path.join(ROOT, 'parameter-config.xls')):
+    '''
+    [(dataset, algorithm, k, T, d, threshold)] from parameter-config.xls (needs xlrd) or from a CSV with
+    those columns; a row without an algorithm is expanded to all of ALGORITHMS
+    '''
+    rows = []
+    if path.endswith('.csv'):
+        with open(path, newline='') as fh:
+            for r in csv.DictReader(fh):
+                rows.append((r['dataset'], r['algorithm'], r['k'], r['T'], r['d'], r['threshold']))
+    else:
+        try:
+            import xlrd
+        except ImportError:
+            raise ImportError('reading %s needs xlrd (pip install xlrd), or pass a CSV config with the columns '
+                              'dataset, algorithm, k, T, d, threshold' % path)
+        sheet = xlrd.open_workbook(path).sheet_by_index(0)
+        block, previous = [], []
+        for i in range(sheet.nrows):
+            label, params = sheet.cell_value(i, 1), sheet.row_values(i, 2, 6)
+            if not isinstance(params[0], float):  # header or blank separator row
+                if block:
+                    block, previous = [], block
+                continue
+            if not label:
+                # the Agglomerative block has one unnamed row; every block lists the real datasets in the
+                # same order, so it is the dataset at the same position of the previous block
+                label = previous[len(block)].split('+')[0] + '+' + block[-1].split('+')[1]
+            block.append(label)
+            dataset, _, algorithm = label.partition('+')
+            rows.append((dataset, algorithm) + tuple(params))
+    config = []
+    for dataset, algorithm, k, T, d, threshold in rows:
+        for a in ([_algorithm(algorithm)] if algorithm.strip() else ALGORITHMS):
+            config.append((_dataset(dataset), a, int(k), float(T), int(d), float(threshold)))
+    return config
+
+
+def cluster(algorithm, data, cluster_num):
+    if algorithm == 'DPC':
+        return DPC(data, cluster_num)
+    if algorithm == 'KMeans':
+        return sc.KMeans(n_clusters=cluster_num, n_init=10, random_state=0).fit(data).labels_
+    return sc.AgglomerativeClustering(n_clusters=cluster_num).fit(data).labels_
+
+
+def hiac(data, k, T, d, threshold):
+    '''the ameliorated data, the threshold used and its confidence (None unless threshold is "auto")'''
+    distances = PairwiseDistances(data, knn_only=True)
+    weight = TGP(data, k, None, threshold, distances)  # no decision-graph: its rendering is not part of HIAC
+    confidence = None
+    if threshold == 'auto':
+        threshold, confidence = auto_threshold(weight, k)
+    neighbor_index = prune(data, k, threshold, weight, distances)
+    for _ in range(d):
+        data = shrink(data, k, T, neighbor_index, distances)
+        distances = PairwiseDistances(data, knn_only=True)
+    return data, threshold, confidence
+
+
+def _peak_kb(reset=False):
+    '''
+    peak RSS of this process in kB. With reset the peak starts again from the current RSS, so the next call
+    gives the peak since then (Linux /proc; elsewhere this is ru_maxrss, the peak of the whole process)
+    '''
+    try:
+        if reset:
+            with open('/proc/self/clear_refs', 'w') as fh:
+                fh.write('5')
+        with open('/proc/self/status') as fh:
+            return next(int(line.split()[1]) for line in fh if line.startswith('VmHWM:'))
+    except (OSError, StopIteration):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_cell(cell):
+    '''one (dataset, algorithm) cell in a fresh worker process; returns its results row'''
+    dataset, algorithm, k, T, d, threshold = cell
+    row = dict(dataset=dataset, algorithm=algorithm, k=k, T=T, d=d, threshold=threshold,
+               threshold_mode='auto' if threshold == 'auto' else 'config')
+
+    def stage(name, fn, *args):
+        before = _peak_kb(reset=True)
+        t0 = time.perf_counter()
+        result = fn(*args)
+        row[name + '_seconds'] = round(time.perf_counter() - t0, 4)
+        row[name + '_rss_mb'] = round((_peak_kb() - before) / 1024, 1)
+        return result
+
+    def scores(name, pred):
+        row[name + '_ami'] = metrics.adjusted_mutual_info_score(labels, pred, average_method='max')
+        row[name + '_ari'] = metrics.adjusted_rand_score(labels, pred)
+        row[name + '_nmi'] = metrics.normalized_mutual_info_score(labels, pred)
+
+    try:
+        data, labels = stage('load', load_dataset, dataset)
+        data = np.array(data, dtype=np.float64) if dataset.startswith('dim') else MinMaxScaling().fit_transform(data)
+        cluster_num = int(labels.max() - labels.min() + 1)
+        row.update(n=data.shape[0], clusters=cluster_num)
+        scores('baseline', stage('baseline', cluster, algorithm, data, cluster_num))
+        data, row['threshold'], row['confidence'] = stage('hiac', hiac, data, k, T, d, threshold)
+        scores('ameliorated', stage('ameliorated', cluster, algorithm, data, cluster_num))
+    except Exception:
+        row['error'] = traceback.format_exc(limit=-1).strip().splitlines()[-1]
+    return row
+
+
+def _key(dataset, algorithm, k, T, d, threshold):
+    '''what identifies a cell: its dataset, algorithm and parameters, with the threshold "auto" or a number'''
+    return (dataset, algorithm, int(k), float(T), int(d), threshold if threshold == 'auto' else float(threshold))
+
+
+def finished(path):
+    '''keys (see _key) of the cells of the results CSV that ran without error'''
+    if not os.path.exists(path):
+        return set()
+    with open(path, newline='') as fh:
+        return {_key(r['dataset'], r['algorithm'], r['k'], r['T'], r['d'],
+                     'auto' if r.get('threshold_mode') == 'auto' else r['threshold'])
+                for r in csv.DictReader(fh) if not r['error']}
+
+
+def run(cells, out, n_jobs=None):
+    '''run the cells not yet in out in a process pool, appending each row to out as it finishes'''
+    done = finished(out)
+    todo = [c for c in cells if _key(*c) not in done]
+    print(f'{len(cells) - len(todo)} of {len(cells)} cells already in {out}, running {len(todo)}')
+    new = not os.path.exists(out)
+    with open(out, 'a', newline='') as fh, multiprocessing.Pool(n_jobs, maxtasksperchild=1) as pool:
+        writer = csv.DictWriter(fh, fieldnames=FIELDS)
+        if new:
+            writer.writeheader()
+        for row in pool.imap_unordered(run_cell, todo):
+            writer.writerow(row)
+            fh.flush()
+            if row.get('error'):
+                print(f"{row['dataset']:>30} {row['algorithm']:<13} failed: {row['error']}")
+            else:
+                print(f"{row['dataset']:>30} {row['algorithm']:<13} AMI {row['baseline_ami']:.4f} -> "
+                      f"{row['ameliorated_ami']:.4f}  HIAC {row['hiac_seconds']:.1f}s  peak +{row['hiac_rss_mb']:.0f} MB")
+
+
+def summary(out):
+    '''AMI of every dataset and algorithm before and after HIAC, from the last successful run of each cell'''
+    table = pandas.read_csv(out)
+    table = table[table['error'].isna()].drop_duplicates(['dataset', 'algorithm'], keep='last')
+    return table.pivot(index='dataset', columns='algorithm', values=['baseline_ami', 'ameliorated_ami'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('datasets', nargs='*', help='only these datasets (default: every dataset in the config)')
+    parser.add_argument('--algorithms', nargs='*', default=list(ALGORITHMS), choices=ALGORITHMS)
+    parser.add_argument('--config', default=os.path.join(ROOT, 'parameter-config.xls'))
+    parser.add_argument('--out', default=None, help='results CSV (default: benchmark_matrix[_auto].csv)')
+    parser.add_argument('--n-jobs', type=int, default=None, help='worker processes (default: all CPUs)')
+    parser.add_argument('--threshold', choices=['config', 'auto'], default='config',
+                        help='"auto": detect each threshold from the decision graph instead of reading it')
+    args = parser.parse_args()
+    if args.out is None:
+        args.out = os.path.join(ROOT, 'benchmark_matrix%s.csv' % ('_auto' if args.threshold == 'auto' else ''))
+
+    cells = [c for c in read_config(args.config) if c[1] in args.algorithms
+             and (not args.datasets or c[0] in args.datasets)]
+    if args.threshold == 'auto':
+        cells = [c[:5] + ('auto',) for c in cells]
+    missing = sorted({c[0] for c in cells if c[0] not in registry()})
+    if missing:
+        print('no data file for', ', '.join(missing))
+    # a data file registered without labels (sklearn sets have no file but come with labels)
+    unlabeled = sorted({c[0] for c in cells if c[0] in registry() and registry()[c[0]][0] is not None
+                        and registry()[c[0]][1] is None})
+    if unlabeled:
+        print('no labels to score', ', '.join(unlabeled))
+    cells = [c for c in cells if c[0] not in missing and c[0] not in unlabeled]
+    t0 = time.perf_counter()
+    run(cells, args.out, args.n_jobs)
+    print(f'done in {time.perf_counter() - t0:.1f}s\n')
+    with pandas.option_context('display.width', 200, 'display.max_rows', None, 'display.max_columns', None,
+                               'display.precision', 4):
+        print(summary(args.out))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Benchmark the exact and approximate neighbour backends of HIAC on the high-dimensional datasets.
+
+For every dataset it reports the time and recall of approximate_kneighbors() against the exact kNN for
+several numbers of trees, then runs HIAC (TGP, prune, d x shrink) with each backend followed by DPC and
+reports the AMI. Recall is the fraction of returned neighbours that are no farther than the exact k-th
+neighbour, so equally distant neighbours are not counted as misses.
+
+    python benchmark_neighbors.py                      # dim32 ... dim512 from data-sets/dimension
+    python benchmark_neighbors.py --synthetic 20000    # clustered 512-D points to show the scaling
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+from sklearn import metrics
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(ROOT))
+
+from HIAC import TGP, prune, shrink
+from datasets import load as load_dataset, registry
+from DWH_2_Clustering_by_fast_search_and_find_of_density_peaks.DPC import DPC
+from DWH_2_Clustering_by_fast_search_and_find_of_density_peaks.distances import PairwiseDistances, approximate_kneighbors
+
+# k, T, d, threshold of the high-dimensional datasets in parameter-config.xls
+DIM_PARAMS = {'dim32': (5, 0.5, 4, 564.5), 'dim64': (5, 0.5, 4, 678), 'dim128': (5, 0.5, 4, 873.4),
+              'dim256': (5, 0.5, 4, 1309), 'dim512': (5, 0.5, 4, 1791.4), 'dim1024': (5, 0.5, 4, 2550)}
+
+
+def recall(exact_dist, approx_dist):
+    return np.mean(approx_dist <= exact_dist[:, -1:] * (1 + 1e-9))
+
+
+def hiac_ami(data, labels, k, T, d, threshold, backend):
+    t0 = time.perf_counter()
+    distances = PairwiseDistances(data, knn_only=True, backend=backend)
+    weight = TGP(data, k, os.path.join(tempfile.gettempdir(), 'decision_benchmark.png'), threshold, distances)
+    neighbor_index = prune(data, k, threshold, weight, distances)
+    for _ in range(d):
+        data = shrink(data, k, T, neighbor_index, distances)
+        distances = PairwiseDistances(data, knn_only=True, backend=backend)
+    elapsed = time.perf_counter() - t0
+    res = DPC(data, int(labels.max() - labels.min() + 1))
+    return metrics.adjusted_mutual_info_score(labels, res, average_method='max'), elapsed
+
+
+def blobs(n, dim, centers=16, intrinsic=8, seed=0):
+    # clusters spread along a random low-dimensional subspace each, plus small isotropic noise
+    rng = np.random.RandomState(seed)
+    means = rng.uniform(0, 255, (centers, dim))
+    basis = rng.normal(0, 40 / np.sqrt(dim), (centers, intrinsic, dim))
+    labels = rng.randint(0, centers, n)
+    spread = np.einsum('nk,nkd->nd', rng.normal(0, 3, (n, intrinsic)), basis[labels])
+    return means[labels] + spread + rng.normal(0, 1, (n, dim)), labels
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('datasets', nargs='*', default=['dim32', 'dim64', 'dim128', 'dim256', 'dim512', 'dim1024'])
+    parser.add_argument('--trees', type=int, nargs='*', default=[2, 4, 8, 16])
+    parser.add_argument('--synthetic', type=int, default=0, help='use N clustered points in 512-D instead')
+    args = parser.parse_args()
+
+    if args.synthetic:
+        sets = [('blobs%d' % args.synthetic,) + blobs(args.synthetic, 512) + (None,)]
+    else:
+        sets = []
+        for name in args.datasets:
+            if name not in registry():
+                print('missing', name)
+                continue
+            sets.append((name,) + load_dataset(name) + (DIM_PARAMS[name],))
+
+    for name, data, labels, params in sets:
+        k = params[0] if params else 5
+        t0 = time.perf_counter()
+        exact_dist, _ = PairwiseDistances(data, knn_only=True).kneighbors(k)
+        t_exact = time.perf_counter() - t0
+        print(f'{name} {data.shape}: exact kNN {t_exact:.3f}s')
+        for n_trees in args.trees:
+            t0 = time.perf_counter()
+            approx_dist, _ = approximate_kneighbors(data, k, n_trees=n_trees)
+            t_approx = time.perf_counter() - t0
+            print(f'    n_trees={n_trees:<3} {t_approx:8.3f}s  recall {recall(exact_dist, approx_dist):.4f}')
+        if params:
+            for backend in ('exact', 'approx'):
+                ami, elapsed = hiac_ami(data, labels, *params, backend)
+                print(f'    HIAC ({backend}) {elapsed:.2f}s  -> DPC AMI {ami:.4f}')
+
+
+if __name__ == '__main__':
+    main()
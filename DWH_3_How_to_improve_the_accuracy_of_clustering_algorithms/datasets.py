@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+'''
+data-sets/ 下所有数据集的登记表和二进制缓存。
+
+第一次读取某个文本文件时用 np.loadtxt 解析，结果存成 data-sets/.cache/ 下的 .npy 文件；之后直接
+np.load(mmap_mode='r') 零拷贝映射。缓存按源文件的 mtime 失效，mtime 变了再比较 sha1，内容没变就只更新
+记录的 mtime（缓存本身在 DWH_2 的 textcache.py 里，DWH_2 的实验脚本也用它）。
+
+登记表的约定：有同名 *-label.txt 的文件（S-set、A-set、dimension、T7.10k）标签在单独的文件里，
+其余文件的标签在最后一列（FIRST_COLUMN 里的文件在第一列，UNLABELED 里的文件没有标签）；另外登记了 sklearn 自带的 iris、wine、digits、breast_cancer。
+
+    from datasets import load
+    data, labels = load('dim512')
+'''
+import functools
+import hashlib
+import os
+
+import numpy as np
+
+from DWH_2_Clustering_by_fast_search_and_find_of_density_peaks import textcache
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(ROOT, 'data-sets')
+CACHE_DIR = os.path.join(DATA_DIR, '.cache')
+
+SKLEARN = ('iris', 'wine', 'digits', 'breast_cancer')
+UNLABELED = ('Asymmetric-outlier',)  # shipped without labels: both columns are coordinates
+FIRST_COLUMN = ('Ls3',)  # labels in the first column, the coordinates after it
+
+
+def _cache_path(path):
+    path = os.path.abspath(path)
+    rel = os.path.relpath(path, DATA_DIR)
+    if rel.startswith(os.pardir):  # a file outside data-sets/: keyed by its absolute path
+        rel = hashlib.sha1(path.encode('utf-8')).hexdigest()[:12] + '-' + os.path.basename(path)
+    return os.path.join(CACHE_DIR, os.path.splitext(rel)[0].strip() + '.npy')
+
+
+def cached_loadtxt(path, dtype=np.float64, mmap=True):
+    '''
+    np.loadtxt(path, dtype=dtype, ndmin=2), parsed once and then read from the .npy cache under CACHE_DIR
+    (memory-mapped read-only when mmap, else read into a writable array)
+    '''
+    return textcache.cached_loadtxt(path, _cache_path(path), dtype, mmap)
+
+
+@functools.lru_cache(maxsize=None)
+def registry():
+    '''
+    {name: (data file, label file or 'first' or 'last' or None)} for every data file under data-sets/ and the
+    sklearn built-ins (data file None: sklearn returns the labels itself; label None: no labels)
+    '''
+    entries = {}
+    for folder, _, files in sorted(os.walk(DATA_DIR)):
+        if os.path.abspath(folder).startswith(CACHE_DIR):
+            continue
+        for fname in sorted(files):
+            if not fname.endswith('.txt') or fname.endswith('-label.txt'):
+                continue
+            base = fname[:-4]
+            label = os.path.join(folder, base + '-label.txt')
+            if base.strip() in UNLABELED:
+                label = None
+            elif base.strip() in FIRST_COLUMN:
+                label = 'first'
+            elif not os.path.exists(label):
+                label = 'last'
+            entries[base.strip()] = (os.path.join(folder, fname), label)
+    for name in SKLEARN:
+        entries[name] = (None, None)
+    return entries
+
+
+def load_file(path, labels='last', mmap=True):
+    '''
+    (data, labels) of a text data set through the cache. labels: 'last' or 'first' when they are the last or
+    the first column, the path of a separate label file, or None for a file without labels (labels is then None).
+    With mmap the data is a read-only memory map (a strided view when the labels are a column of it).
+    '''
+    array = cached_loadtxt(path, mmap=mmap)
+    if labels is None:
+        return array, None
+    if labels == 'last':
+        return array[:, :-1], np.asarray(array[:, -1], dtype=np.int32)
+    if labels == 'first':
+        return array[:, 1:], np.asarray(array[:, 0], dtype=np.int32)
+    return array, np.asarray(cached_loadtxt(labels, mmap=mmap)[:, 0], dtype=np.int32)
+
+
+def load(name, mmap=True):
+    '''(data, labels) of a registered data set by name, e.g. 's1', 'dim512', 'T7.10k', 'Seeds' or 'iris' '''
+    entries = registry()
+    if name not in entries:
+        raise KeyError('unknown data set %r, known: %s' % (name, ', '.join(sorted(entries))))
+    path, labels = entries[name]
+    if path is None:
+        from sklearn import datasets
+        bunch = getattr(datasets, 'load_' + name)()
+        return bunch.data, bunch.target.astype(np.int32)
+    return load_file(path, labels, mmap)
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""Grid or random search over the HIAC parameters k, T, d and threshold, ranked by the downstream clustering.
+
+Every candidate shares the work that a naive rerun of TGP, prune and d x shrink would repeat:
+  * the kNN graph is built once at the largest k. PairwiseDistances keeps the neighbours of the
+    largest k asked for, so every smaller k is a slice of it. The TGP weights of the largest k are
+    shared across all k and thresholds, because prune only reads their first k+1 columns;
+  * prune runs once per (k, threshold). Thresholds that clip the same edges give the same valid-neighbour
+    matrix and share one shrink chain;
+  * each (k, T, valid-neighbours) chain is shrunk once up to its largest d. The intermediate states are
+    scored on the way, so d=4 continues from d=3 instead of starting again.
+The chains run in a process pool. The result lists every candidate by score, and the time of the search
+is reported next to the time that naive reruns would have taken. That time is estimated from the same
+stage timings, or measured with --naive, which also checks that both give the same scores.
+
+    python grid_search.py iris --k 5 7 9 --T 0.6 1.1 1.3 --d 1 2 4 8 --threshold 1.3 1.45 1.6
+    python grid_search.py Seeds --n-iter 20 --naive
+"""
+import argparse
+import itertools
+import multiprocessing
+import os
+import sys
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+from sklearn import metrics
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(ROOT))
+
+from HIAC import TGP, prune, shrink
+from benchmark_matrix import ALGORITHMS, cluster
+from datasets import load as load_dataset
+from normalization import MinMaxScaling
+from DWH_2_Clustering_by_fast_search_and_find_of_density_peaks.distances import PairwiseDistances
+
+_shared = {}
+
+
+def ami(labels, pred):
+    return metrics.adjusted_mutual_info_score(labels, pred, average_method='max')
+
+
+def candidates(grid, n_iter=None, seed=0):
+    '''
+    the (k, T, d, threshold) candidates of grid, a dict of value lists with those keys; n_iter of them
+    drawn at random (without replacement) for a random search
+    '''
+    cells = list(itertools.product(grid['k'], grid['T'], grid['d'], grid['threshold']))
+    if n_iter is not None and n_iter < len(cells):
+        pick = np.random.RandomState(seed).choice(len(cells), n_iter, replace=False)
+        cells = [cells[i] for i in np.sort(pick)]
+    return cells
+
+
+def _init(data, labels, distances, algorithm, cluster_num, score):
+    _shared.update(data=data, labels=labels, distances=distances, algorithm=algorithm, cluster_num=cluster_num,
+                   score=score)
+
+
+def _chain(task):
+    '''shrink one (k, T, valid-neighbours) chain up to its largest d, scoring the candidates on the way'''
+    k, T, neighbor_index, cells = task
+    data, distances = _shared['data'], _shared['distances']
+    rows, steps = [], []
+    for d in sorted({cell[2] for cell in cells}):
+        while len(steps) < d:
+            t0 = time.perf_counter()
+            data = shrink(data, k, T, neighbor_index, distances)
+            distances = PairwiseDistances(data, knn_only=True)
+            steps.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        pred = cluster(_shared['algorithm'], data, _shared['cluster_num'])
+        score = _shared['score'](_shared['labels'], pred)
+        elapsed = time.perf_counter() - t0
+        rows += [dict(k=c[0], T=c[1], d=c[2], threshold=c[3], score=score, cluster_seconds=elapsed,
+                      shrink_seconds=sum(steps)) for c in cells if c[2] == d]
+    return rows
+
+
+def search(data, labels, grid, algorithm='DPC', n_iter=None, seed=0, n_jobs=None, score=ami):
+    '''
+    score every (k, T, d, threshold) candidate of grid (see candidates()) by clustering the ameliorated
+    data with algorithm (one of benchmark_matrix.ALGORITHMS) and comparing with labels via score(labels, pred).
+
+    Returns: (rows, timing)
+    rows: one dict per candidate with k, T, d, threshold and score, best first
+    timing: the seconds of the search and the estimated seconds of naive reruns of TGP, prune and
+            d x shrink per candidate, summed from the stage times measured here (an overestimate when
+            there are more workers than free cores)
+    -------
+    '''
+    t_start = time.perf_counter()
+    cells = candidates(grid, n_iter, seed)
+    cluster_num = int(labels.max() - labels.min() + 1)
+
+    # the kNN graph and the TGP weights at the largest k, shared by every candidate
+    t0 = time.perf_counter()
+    distances = PairwiseDistances(data, knn_only=True)
+    weight = TGP(data, max(cell[0] for cell in cells), None, None, distances)
+    t_graph = time.perf_counter() - t0
+
+    chains, t_prune = {}, {}
+    for k, threshold in sorted({(cell[0], cell[3]) for cell in cells}):
+        t0 = time.perf_counter()
+        neighbor_index = prune(data, k, threshold, weight, distances)
+        t_prune[k, threshold] = time.perf_counter() - t0
+        for cell in cells:
+            if (cell[0], cell[3]) == (k, threshold):
+                key = (k, cell[1], neighbor_index.tobytes())
+                chains.setdefault(key, (k, cell[1], neighbor_index, []))[3].append(cell)
+
+    tasks = sorted(chains.values(), key=lambda task: -max(cell[2] for cell in task[3]))  # longest chains first
+    init = (data, labels, distances, algorithm, cluster_num, score)
+    if n_jobs == 1:
+        _init(*init)
+        rows = [row for task in tasks for row in _chain(task)]
+    else:
+        with multiprocessing.Pool(n_jobs, initializer=_init, initargs=init) as pool:
+            rows = [row for part in pool.imap_unordered(_chain, tasks) for row in part]
+    rows.sort(key=lambda row: (-row['score'], row['k'], row['T'], row['d'], row['threshold']))
+
+    naive = sum(t_graph + t_prune[row['k'], row['threshold']] + row['shrink_seconds'] + row['cluster_seconds']
+                for row in rows)
+    timing = dict(seconds=time.perf_counter() - t_start, naive_seconds=naive, candidates=len(rows),
+                  chains=len(tasks), shrink_steps=sum(max(cell[2] for cell in task[3]) for task in tasks))
+    return rows, timing
+
+
+def naive(data, labels, cells, algorithm='DPC', score=ami):
+    '''every candidate from scratch, as HIAC.py runs it: {(k, T, d, threshold): score} and the seconds taken'''
+    t0 = time.perf_counter()
+    cluster_num = int(labels.max() - labels.min() + 1)
+    scores = {}
+    for k, T, d, threshold in cells:
+        moved = data
+        distances = PairwiseDistances(moved, knn_only=True)
+        weight = TGP(moved, k, None, threshold, distances)
+        neighbor_index = prune(moved, k, threshold, weight, distances)
+        for _ in range(d):
+            moved = shrink(moved, k, T, neighbor_index, distances)
+            distances = PairwiseDistances(moved, knn_only=True)
+        scores[k, T, d, threshold] = score(labels, cluster(algorithm, moved, cluster_num))
+    return scores, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('dataset')
+    parser.add_argument('--k', type=int, nargs='*', default=[5, 7, 9, 12])
+    parser.add_argument('--T', type=float, nargs='*', default=[0.3, 0.6, 0.9, 1.2])
+    parser.add_argument('--d', type=int, nargs='*', default=[1, 2, 4, 8])
+    parser.add_argument('--threshold', type=float, nargs='*', default=[1.2, 1.3, 1.4, 1.5])
+    parser.add_argument('--algorithm', default='DPC', choices=ALGORITHMS)
+    parser.add_argument('--n-iter', type=int, default=None, help='random search: number of candidates to draw')
+    parser.add_argument('--n-jobs', type=int, default=None, help='worker processes (default: all CPUs)')
+    parser.add_argument('--top', type=int, default=10, help='number of candidates to print')
+    parser.add_argument('--naive', action='store_true', help='also time naive reruns and compare their scores')
+    args = parser.parse_args()
+
+    data, labels = load_dataset(args.dataset)
+    # the dimension datasets are used raw, their thresholds in parameter-config.xls are in raw units
+    data = np.array(data, dtype=np.float64) if args.dataset.startswith('dim') else MinMaxScaling().fit_transform(data)
+    grid = dict(k=args.k, T=args.T, d=args.d, threshold=args.threshold)
+    rows, timing = search(data, labels, grid, args.algorithm, args.n_iter, n_jobs=args.n_jobs)
+
+    print(f"{timing['candidates']} candidates in {timing['chains']} shrink chains ({timing['shrink_steps']} shrink "
+          f"steps): {timing['seconds']:.1f}s, naive reruns about {timing['naive_seconds']:.1f}s "
+          f"({timing['naive_seconds'] / timing['seconds']:.1f}x)")
+    print(f"{'k':>4} {'T':>6} {'d':>4} {'threshold':>10} {args.algorithm + ' AMI':>12}")
+    for row in rows[:args.top]:
+        print(f"{row['k']:>4} {row['T']:>6} {row['d']:>4} {row['threshold']:>10} {row['score']:>12.4f}")
+    if args.naive:
+        scores, elapsed = naive(data, labels, [(r['k'], r['T'], r['d'], r['threshold']) for r in rows], args.algorithm)
+        diff = max(abs(scores[r['k'], r['T'], r['d'], r['threshold']] - r['score']) for r in rows)
+        print(f'naive reruns: {elapsed:.1f}s ({elapsed / timing["seconds"]:.1f}x), largest score difference {diff:.2e}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+'''
+逐列 min-max 归一化，HIAC 之前的预处理阶段。
+
+内存里的数组整体向量化计算；np.memmap（例如 datasets.load 返回的 .npy 缓存）按行分块扫描两遍：第一遍求每列的
+最小/最大值，第二遍把结果写进 out（可以是 np.lib.format.open_memmap 打开的 .npy），所以比内存大的数据也能处理。
+拟合出的缩放可以保存下来再用到新数据上。最大值等于最小值的常数列保持原值不变，和原来 HIAC.py 里的循环一致。
+
+    from normalization import MinMaxScaling
+    scaling = MinMaxScaling().fit(data)
+    data = scaling.transform(data)
+    scaling.save('scaling.npz')
+'''
+import numpy as np
+
+
+class MinMaxScaling:
+    '''
+    (x - min) / (max - min) per column, fitted once and reapplicable to new data; constant columns are left
+    as they are. chunk: rows per block when scanning a memory-mapped input.
+    '''
+
+    def __init__(self, chunk=65536):
+        self.chunk = chunk
+
+    def _blocks(self, data):
+        rows = self.chunk if isinstance(data, np.memmap) else max(data.shape[0], 1)
+        for r0 in range(0, data.shape[0], rows):
+            yield slice(r0, r0 + rows)
+
+    def fit(self, data):
+        '''first pass: the minimum and maximum of every column'''
+        if data.shape[0] == 0:
+            raise ValueError('cannot fit the scaling on an empty data set')
+        lo = np.full(data.shape[1], np.inf)
+        hi = np.full(data.shape[1], -np.inf)
+        for rows in self._blocks(data):
+            block = np.asarray(data[rows], dtype=np.float64)
+            np.minimum(lo, block.min(axis=0), out=lo)
+            np.maximum(hi, block.max(axis=0), out=hi)
+        self.min_, self.max_ = lo, hi
+        return self
+
+    @property
+    def offset(self):
+        return np.where(self.max_ > self.min_, self.min_, 0)
+
+    @property
+    def scale(self):
+        return np.where(self.max_ > self.min_, self.max_ - self.min_, 1)
+
+    def transform(self, data, out=None):
+        '''
+        second pass: the scaled data, written block by block into out when given (an array or a .npy opened
+        with np.lib.format.open_memmap), otherwise into a new in-memory array
+        '''
+        if data.shape[1] != self.min_.shape[0]:
+            raise ValueError('data has %d columns, the scaling was fitted on %d' % (data.shape[1], self.min_.shape[0]))
+        if out is None:
+            out = np.empty(data.shape, dtype=np.float64)
+        offset, scale = self.offset, self.scale
+        for rows in self._blocks(data):
+            np.subtract(data[rows], offset, out=out[rows])
+            np.divide(out[rows], scale, out=out[rows])
+        return out
+
+    def fit_transform(self, data, out=None):
+        return self.fit(data).transform(data, out)
+
+    def save(self, path):
+        np.savez(path, min=self.min_, max=self.max_)
+
+    @classmethod
+    def load(cls, path, chunk=65536):
+        scaling = cls(chunk)
+        with np.load(path) as stored:
+            scaling.min_, scaling.max_ = stored['min'], stored['max']
+        return scaling
+
+
+def normalize_file(src, dst, scaling=None, chunk=65536):
+    '''
+    normalize the .npy file src into the .npy file dst without holding either in memory; the scaling is
+    fitted on src unless a fitted one is given. Returns the scaling.
+    '''
+    data = np.load(src, mmap_mode='r')
+    if scaling is None:
+        scaling = MinMaxScaling(chunk).fit(data)
+    out = np.lib.format.open_memmap(dst, mode='w+', dtype=np.float64, shape=data.shape)
+    scaling.transform(data, out)
+    out.flush()
+    del out
+    return scaling
@@ -0,0 +1,57 @@
+import csv
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+HERE = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(HERE.parent))
+sys.path.insert(0, str(HERE))
+import benchmark_matrix  # noqa: E402
+
+
+def rows(path):
+    with open(path, newline='') as fh:
+        return list(csv.DictReader(fh))
+
+
+def test_resume_keys_on_parameters(tmp_path):
+    out = str(tmp_path / 'results.csv')
+    cell = ('iris', 'DPC', 7, 1.1, 2, 1.45)
+    benchmark_matrix.run([cell], out, n_jobs=1)
+    benchmark_matrix.run([cell], out, n_jobs=1)
+    assert len(rows(out)) == 1 and not rows(out)[0]['error']
+
+    # another threshold, another T, or the detected threshold are new cells
+    benchmark_matrix.run([cell, cell[:5] + (1.3,), cell[:3] + (0.6,) + cell[4:], cell[:5] + ('auto',)], out, n_jobs=1)
+    done = rows(out)
+    assert len(done) == 4 and [r['threshold_mode'] for r in done].count('auto') == 1
+    benchmark_matrix.run([cell[:5] + ('auto',)], out, n_jobs=1)
+    assert len(rows(out)) == 4
+
+
+def test_summary_keeps_the_last_successful_run(tmp_path):
+    out = str(tmp_path / 'results.csv')
+    cell = ('iris', 'DPC', 7, 1.1, 2, 1.45)
+    benchmark_matrix.run([cell], out, n_jobs=1)
+    done = rows(out)
+    # a later run of the same dataset and algorithm that failed
+    with open(out, 'a', newline='') as fh:
+        csv.DictWriter(fh, fieldnames=benchmark_matrix.FIELDS).writerow(
+            dict(dataset='iris', algorithm='DPC', k=7, T=1.1, d=3, threshold=1.45, error='MemoryError'))
+    table = benchmark_matrix.summary(out)
+    assert table.loc['iris', ('ameliorated_ami', 'DPC')] == float(done[0]['ameliorated_ami'])
+
+
+def test_stage_peak_starts_from_the_stage():
+    if not os.path.exists('/proc/self/clear_refs'):
+        pytest.skip('the peak RSS can only be reset on Linux')
+    before = benchmark_matrix._peak_kb(reset=True)
+    block = np.ones(2 ** 24)  # 128 MB
+    assert benchmark_matrix._peak_kb() - before > 100 * 1024
+    del block
+    # the next stage does not inherit the peak of the previous one
+    before = benchmark_matrix._peak_kb(reset=True)
+    assert benchmark_matrix._peak_kb() - before < 16 * 1024
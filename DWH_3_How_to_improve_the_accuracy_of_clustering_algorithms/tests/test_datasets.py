@@ -0,0 +1,103 @@
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+HERE = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(HERE.parent))
+sys.path.insert(0, str(HERE))
+import datasets  # noqa: E402
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(datasets, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(datasets, "CACHE_DIR", str(tmp_path / ".cache"))
+    datasets.registry.cache_clear()
+    yield tmp_path
+    datasets.registry.cache_clear()
+
+
+def test_cache_survives_touch_and_follows_content(data_dir, monkeypatch):
+    parsed = []
+    loadtxt = np.loadtxt
+    monkeypatch.setattr(np, "loadtxt", lambda *args, **kwargs: parsed.append(args[0]) or loadtxt(*args, **kwargs))
+    src = data_dir / "points.txt"
+    src.write_text("1 2\n3 4\n")
+    np.testing.assert_array_equal(datasets.cached_loadtxt(src), [[1, 2], [3, 4]])
+    assert isinstance(datasets.cached_loadtxt(src), np.memmap) and len(parsed) == 1
+
+    # a new mtime with the same content: the cache is kept and only its recorded mtime is updated
+    stat = os.stat(src)
+    os.utime(src, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    np.testing.assert_array_equal(datasets.cached_loadtxt(src), [[1, 2], [3, 4]])
+    datasets.cached_loadtxt(src)
+    assert len(parsed) == 1
+
+    # new content: parsed again
+    src.write_text("5 6\n7 8\n9 10\n")
+    os.utime(src, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2 * 10 ** 9))
+    np.testing.assert_array_equal(datasets.cached_loadtxt(src), [[5, 6], [7, 8], [9, 10]])
+    assert len(parsed) == 2
+    assert datasets.cached_loadtxt(src, mmap=False).flags.writeable
+
+
+def test_registry_pairs_each_layout(data_dir):
+    (data_dir / "S-set").mkdir()
+    (data_dir / "S-set" / "s1.txt").write_text("0 0\n1 1\n2 2\n")
+    (data_dir / "S-set" / "s1-label.txt").write_text("1\n1\n2\n")
+    (data_dir / "S-set" / "dim8-label.txt").write_text("1\n")  # a label file without its data file
+    (data_dir / "shapes").mkdir()
+    (data_dir / "shapes" / "flame.txt").write_text("0 0 1\n1 1 2\n")
+    (data_dir / "shapes" / "Ls3.txt").write_text("4 0 0\n5 1 1\n")
+    (data_dir / "Teaching_assistant_evaluation .txt").write_text("0 0 3\n")
+    (data_dir / "Asymmetric-outlier.txt").write_text("0 5\n1 6\n")
+    entries = datasets.registry()
+    assert sorted(set(entries) - set(datasets.SKLEARN)) == ["Asymmetric-outlier", "Ls3",
+                                                            "Teaching_assistant_evaluation", "flame", "s1"]
+    assert entries["s1"][1] == str(data_dir / "S-set" / "s1-label.txt")
+    assert entries["flame"][1] == entries["Teaching_assistant_evaluation"][1] == "last"
+    assert entries["Ls3"][1] == "first"
+    assert entries["Asymmetric-outlier"][1] is None and entries["iris"] == (None, None)
+
+    data, labels = datasets.load("s1")
+    assert data.shape == (3, 2) and labels.tolist() == [1, 1, 2]
+    data, labels = datasets.load("flame")
+    assert data.tolist() == [[0, 0], [1, 1]] and labels.tolist() == [1, 2]
+    data, labels = datasets.load("Ls3")
+    assert data.tolist() == [[0, 0], [1, 1]] and labels.tolist() == [4, 5]
+    assert datasets.load("Teaching_assistant_evaluation")[1].tolist() == [3]
+    data, labels = datasets.load("Asymmetric-outlier")
+    assert data.shape == (2, 2) and labels is None
+    data, labels = datasets.load("iris")
+    assert data.shape == (150, 4) and labels.dtype == np.int32
+    with pytest.raises(KeyError):
+        datasets.load("s2")
+
+
+def test_shipped_data_sets_are_paired():
+    datasets.registry.cache_clear()
+    for name in ("s1", "a1", "dim512", "T7.10k", "Aggregation", "Seeds", "Teaching_assistant_evaluation",
+                 "Asymmetric-outlier"):
+        data, labels = datasets.load(name)
+        assert labels is None if name == "Asymmetric-outlier" else labels.shape == (data.shape[0],)
+
+
+# the number of classes of every labeled data set (T7.10k and R15-outlier count their noise as a class)
+CLASSES = {"Adj-1": 2, "Adj-2": 3, "Adj-3": 2, "Aggregation": 7, "Banknote_authentication": 2, "Heartshapes": 3,
+           "Ls3": 6, "R15": 15, "R15-outlier": 16, "Seeds": 3, "T7.10k": 9, "Teaching_assistant_evaluation": 3,
+           "Wireless_indoor_location": 4, "a1": 20, "a2": 35, "a3": 50, "breast_cancer": 2, "compound-part": 2,
+           "digits": 10, "dim32": 16, "dim64": 16, "dim128": 16, "dim256": 16, "dim512": 16, "flame": 2, "iris": 3,
+           "s1": 15, "s2": 15, "s3": 15, "s4": 15, "wine": 3}
+
+
+def test_labeled_data_sets_have_their_classes():
+    datasets.registry.cache_clear()
+    labeled = {name for name, (path, labels) in datasets.registry().items() if path is None or labels is not None}
+    assert labeled == set(CLASSES)
+    for name in sorted(labeled):
+        data, labels = datasets.load(name)
+        assert len(np.unique(labels)) == CLASSES[name], name
+        assert labels.shape == (data.shape[0],) and np.isfinite(data).all()
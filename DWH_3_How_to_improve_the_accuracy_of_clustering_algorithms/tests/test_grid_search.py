@@ -0,0 +1,30 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+HERE = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(HERE.parent))
+sys.path.insert(0, str(HERE))
+from datasets import load  # noqa: E402
+from grid_search import candidates, naive, search  # noqa: E402
+from normalization import MinMaxScaling  # noqa: E402
+
+
+@pytest.mark.parametrize("algorithm, n_iter", [("DPC", None), ("KMeans", 12)])
+def test_search_matches_naive_reruns(algorithm, n_iter):
+    data, labels = load("iris")
+    data = MinMaxScaling().fit_transform(data)
+    grid = dict(k=[5, 9], T=[0.6, 1.1], d=[1, 2, 4], threshold=[1.3, 1.45, 1.6])
+    rows, timing = search(data, labels, grid, algorithm, n_iter=n_iter, n_jobs=1)
+    cells = candidates(grid, n_iter)
+    assert len(rows) == timing['candidates'] == len(cells)
+    # the candidates share chains (one per distinct valid-neighbour matrix) and each chain is shrunk once
+    assert timing['chains'] < len(cells) and timing['shrink_steps'] < sum(cell[2] for cell in cells)
+
+    expected, _ = naive(data, labels, cells, algorithm)
+    found = {(row['k'], row['T'], row['d'], row['threshold']): row['score'] for row in rows}
+    assert found.keys() == expected.keys()
+    for cell in cells:
+        assert found[cell] == pytest.approx(expected[cell], abs=1e-12), cell
+    assert [row['score'] for row in rows] == sorted(found.values(), reverse=True)
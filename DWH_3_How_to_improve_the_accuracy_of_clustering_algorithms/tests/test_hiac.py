@@ -0,0 +1,174 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+import scipy.spatial.distance as dis
+
+HERE = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(HERE.parent))
+sys.path.insert(0, str(HERE))
+from HIAC import TGP, auto_threshold, gravitation, prune, shrink  # noqa: E402
+from datasets import load  # noqa: E402
+from normalization import MinMaxScaling  # noqa: E402
+
+
+def baseline_tgp(data):
+    distance = dis.pdist(data)
+    distance_matrix = -dis.squareform(distance) + np.max(distance)
+    return -np.sort(-distance_matrix, axis=1)
+
+
+def baseline_prune(data, knn, threshold, distanceTGP):
+    pointNum = data.shape[0]
+    distance_matrix = dis.squareform(dis.pdist(data))
+    disIndex = np.argsort(distance_matrix, axis=1)
+    distance_sort = np.sort(distance_matrix, axis=1)
+    area = np.mean(distance_sort[:, round(pointNum * 0.015)])
+    density = np.zeros(pointNum)
+    for i in range(pointNum):
+        num = 1
+        while (distance_sort[i, num] < area):
+            num += 1
+        density[i] = num
+    densityThreshold = np.mean(density)
+    for i in range(pointNum):
+        if density[i] < densityThreshold:
+            for j in range(knn + 1):
+                if (data[disIndex[i][j]] == data[i]).all():
+                    continue
+                else:
+                    if distanceTGP[i, j] < threshold:
+                        disIndex[i][j] = -1
+    return disIndex
+
+
+def baseline_shrink(data, knn, T, disIndex):
+    bata = data.copy()
+    pointNum = data.shape[0]
+    distance_matrix = dis.squareform(dis.pdist(data))
+    distance_sort = np.sort(distance_matrix, axis=1)
+    area = np.mean(distance_sort[:, round(pointNum * 0.015)])
+    density = np.zeros(pointNum)
+    for i in range(pointNum):
+        num = 1
+        while (distance_sort[i, num] < area):
+            num += 1
+        density[i] = num
+    densityThreshold = np.mean(density)
+    G = np.mean(distance_sort[:, 1])
+    for i in range(pointNum):
+        if density[i] < densityThreshold:
+            displacement = np.zeros(data.shape[1], dtype=np.float32)
+            for j in range(knn + 1):
+                if (data[disIndex[i][j]] == data[i]).all():
+                    continue
+                else:
+                    if disIndex[i][j] != -1:
+                        ff = (data[disIndex[i][j]] - data[i])
+                        fff = (distance_sort[i, 1] / (
+                                    distance_matrix[i, disIndex[i, j]] * distance_matrix[i, disIndex[i, j]]))
+                        displacement += G * ff * fff
+            bata[i] = data[i] + displacement * T
+    return bata
+
+
+# Aggregation and flame have tied distances at the k-th neighbour of a few objects, Ls3 of a third
+@pytest.mark.parametrize("name, k, T, d, threshold", [("Aggregation", 35, 1.8, 4, 1.1822),
+                                                      ("flame", 12, 0.9, 3, 1.18),
+                                                      ("Ls3", 10, 0.5, 2, 1.4)])
+def test_prune_shrink_match_baseline(name, k, T, d, threshold):
+    data = MinMaxScaling().fit_transform(load(name)[0])
+    weight = TGP(data, k, None, threshold)
+    reference = baseline_tgp(data)
+    np.testing.assert_allclose(weight, reference[:, :k + 1], rtol=0, atol=1e-12)
+    neighbor_index = prune(data, k, threshold, weight)
+    expected_index = baseline_prune(data, k, threshold, reference)
+    np.testing.assert_array_equal(neighbor_index, expected_index[:, :k + 1])
+    moved, expected = data, data
+    for _ in range(d):
+        moved = shrink(moved, k, T, neighbor_index)
+        expected = baseline_shrink(expected, k, T, expected_index)
+    np.testing.assert_allclose(moved, expected, rtol=0, atol=1e-9)
+
+
+# hand-picked thresholds of parameter-config.xls, (data set, k): threshold
+CONFIG_THRESHOLDS = {("Aggregation", 35): 1.1822, ("s1", 30): 1.15284}
+
+
+@pytest.mark.parametrize("name, k", sorted(CONFIG_THRESHOLDS))
+def test_auto_threshold_near_config(name, k):
+    data = MinMaxScaling().fit_transform(load(name)[0])
+    threshold, confidence = auto_threshold(TGP(data, k, None, None), k)
+    assert threshold == pytest.approx(CONFIG_THRESHOLDS[name, k], rel=0.02)
+    assert confidence > 0.3
+    assert prune(data, k, "auto", TGP(data, k, None, "auto")).tolist() == prune(data, k, threshold,
+                                                                                 TGP(data, k, None, None)).tolist()
+
+
+def test_config_thresholds_match_sheet():
+    pytest.importorskip("xlrd")
+    from benchmark_matrix import read_config
+    sheet = {(c[0], c[2]): c[5] for c in read_config()}
+    assert {key: sheet[key] for key in CONFIG_THRESHOLDS} == pytest.approx(CONFIG_THRESHOLDS)
+
+
+def weights(pointWeight, k=5):
+    # a TGP weight matrix whose point weights (the mean over the k neighbours) are pointWeight
+    return np.repeat(np.asarray(pointWeight)[:, None], k + 1, axis=1)
+
+
+def test_auto_threshold_confidence():
+    N = 5000
+    # weights whose density rises linearly: the decision-graph is a straight ramp without a division
+    _, confidence = auto_threshold(weights(np.sqrt((np.arange(N) + 0.5) / N)), 5)
+    assert confidence == pytest.approx(0, abs=0.03)
+    # a flat sparse tail up to 0.5, then the bulk: the knee is at the division
+    tail = np.linspace(0, 0.5, N // 10)
+    bulk = 0.5 + 0.5 * np.sqrt(np.linspace(0, 1, N - N // 10))
+    threshold, confidence = auto_threshold(weights(np.concatenate([tail, bulk])), 5)
+    assert threshold == pytest.approx(0.5, abs=0.03) and confidence > 0.4
+    # all weights equal: nothing is clipped
+    assert auto_threshold(weights(np.ones(N)), 5) == (1.0, 0.0)
+
+
+def brute_gravitation(data, targets, radius=None):
+    d = data[None, :, :] - data[targets, None, :]
+    d2 = np.einsum('ijk,ijk->ij', d, d)
+    ok = (d2 > 0) & (d2 <= (np.inf if radius is None else radius) ** 2)
+    return (d * np.where(ok, 1 / np.where(ok, d2, 1), 0)[:, :, None]).sum(axis=1)
+
+
+def brute_global_shrink(data, T, radius=None):
+    distance_sort = np.sort(dis.squareform(dis.pdist(data)), axis=1)
+    nearest = distance_sort[:, 1]
+    area = np.mean(distance_sort[:, round(data.shape[0] * 0.015)])
+    density = (distance_sort < area).sum(axis=1)  # the object itself included
+    moved = np.flatnonzero(density < np.mean(density))
+    bata = data.copy()
+    bata[moved] = data[moved] + np.mean(nearest) * brute_gravitation(data, moved, radius) * nearest[moved, None] * T
+    return bata
+
+
+@pytest.mark.parametrize("name", ["Aggregation", "s1", "dim32"])
+@pytest.mark.parametrize("radius", [None, 0.1])
+def test_gravitation_matches_brute_force(name, radius):
+    data = MinMaxScaling().fit_transform(load(name)[0])
+    targets = np.arange(0, data.shape[0], 3)
+    reference = brute_gravitation(data, targets, radius)
+    np.testing.assert_allclose(gravitation(data, targets, 0, radius), reference, rtol=1e-10, atol=1e-10)
+    # theta=0.5: about 0.2% of the total pull, at most 10% on any object
+    approx = gravitation(data, targets, 0.5, radius)
+    assert np.linalg.norm(approx - reference) <= 0.01 * np.linalg.norm(reference)
+    error = np.linalg.norm(approx - reference, axis=1)
+    assert (error <= 0.1 * np.linalg.norm(reference, axis=1) + 1e-12).all()
+
+
+@pytest.mark.parametrize("radius", [None, 0.1])
+def test_global_shrink_matches_brute_force(radius):
+    data = MinMaxScaling().fit_transform(load("Aggregation")[0])
+    expected = brute_global_shrink(data, 0.6, radius)
+    np.testing.assert_allclose(shrink(data, 10, 0.6, None, kernel='exact', radius=radius), expected,
+                               rtol=0, atol=1e-12)
+    moved = shrink(data, 10, 0.6, None, kernel='barnes_hut', theta=0.5, radius=radius)
+    assert np.linalg.norm(moved - expected) <= 0.01 * np.linalg.norm(expected - data)